@@ -7,26 +7,32 @@ from flask_jwt_extended import (create_access_token,
 from flask_dance.contrib.google import google
 
 
-from werkzeug.security import check_password_hash, generate_password_hash
 from werkzeug.utils import secure_filename
 import validators
 from http_status_code import *
-from models import User, db, Order, OrderItem, Product, ProductImage
+from models import User, db, Order, OrderStatus
+from sqlalchemy.orm import selectinload
+from fieldsets import Fieldset
 from blacklist import blacklist
 from social_logins import google_bp
 from utils import generate_token, send_email, confirm_token, ALLOWED_EXTENSIONS, allowed_file
+from touch_buffer import touch_buffer
+from passwords import password_hasher, PasswordHashingBusy
 
 import os
-from dotenv import load_dotenv
 
-from datetime import datetime
-
-# Load environment variables from the .env file
-load_dotenv()
 
 account = Blueprint('account', __name__, url_prefix='/api/account')
 
 
+@account.errorhandler(PasswordHashingBusy)
+def handle_password_hashing_busy(e):
+    response = jsonify({'error': 'Too many requests are being processed, try again shortly.'})
+    response.status_code = HTTP_503_SERVICE_UNAVAILABLE
+    response.headers['Retry-After'] = '1'
+    return response
+
+
 @account.post('/register')
 def register():
     username = request.json['username']
@@ -49,14 +55,13 @@ def register():
     if User.query.filter_by(username=username).first() is not None:
         return jsonify({'error': 'username is taken'}), HTTP_409_CONFLICT
     
-    hashed_password = generate_password_hash(password, salt_length=8)
+    hashed_password = password_hasher.hash(password)
     user = User(username=username, email=email, password=hashed_password)
 
     db.session.add(user)
-    db.session.commit()
-
     token = generate_token(email)
-    send_email(to=email, subject="Activate account", body=f'Click the link the activate your account: {request.host_url}api/account/activate/{token}')
+    send_email.delay(to=email, subject="Activate account", body=f'Click the link the activate your account: {request.host_url}api/account/activate/{token}')
+    db.session.commit()
 
     return jsonify({'message': 'Account created. A verification link has been sent to your email address to activate your account.', 'user': {'username': username, 'email': email}}), HTTP_201_CREATED
 
@@ -81,7 +86,8 @@ def activate_account(token):
 def send_password_reset_link():
     email = request.json['email']
     token = generate_token(email)
-    send_email(to=email, subject="Reset Password", body=f'Click the link to reset your password: {request.host_url}api/account/change-password/{token}')
+    send_email.delay(to=email, subject="Reset Password", body=f'Click the link to reset your password: {request.host_url}api/account/change-password/{token}')
+    db.session.commit()
     return jsonify({'detail': 'A link has been sent to your email address to reset your password.'})
 
 
@@ -104,7 +110,7 @@ def change_password(token):
         return jsonify({'error': 'Password must match'}), HTTP_400_BAD_REQUEST
     
     user = User.query.filter_by(email=email).first_or_404()
-    user.password = generate_password_hash(password, salt_length=8)
+    user.password = password_hasher.hash(password)
     db.session.commit()
     return jsonify({'detail': 'password changed successfully'}), HTTP_200_OK
 
@@ -118,13 +124,18 @@ def login():
         return jsonify({'detail': 'Invalid Credentials'})
     if user.password == 'google':
         return jsonify({'detail': 'Invalid Credentials try logging in with google.'})
-    elif not check_password_hash(user.password, password):
+    user_id, hashed, is_active = user.id, user.password, user.is_active
+    db.session.rollback()  # Give the connection back to the pool while the hash is checked
+    if not password_hasher.verify(hashed, password):
         return jsonify({'detail': 'Invalid Credentials'})
-    if not user.is_active:
+    if not is_active:
         return jsonify({'detail': 'Account not activated'})
     else:
-        user.last_login = datetime.utcnow()
-        db.session.commit()
+        if password_hasher.needs_rehash(hashed):
+            # Hash parameters changed since this hash was made; upgrade it unless the password changed meanwhile
+            User.query.filter_by(id=user_id, password=hashed).update({'password': password_hasher.hash(password)})
+            db.session.commit()
+        touch_buffer.touch(User.last_login, user_id)
         access_token = create_access_token(identity=email)
         return jsonify(access_token=access_token), HTTP_200_OK
     
@@ -166,8 +177,7 @@ def google_login_success():
 
     # Generate a JWT token for the user
     access_token = create_access_token(identity=user.email)
-    user.last_login = datetime.utcnow()
-    db.session.commit()
+    touch_buffer.touch(User.last_login, user.id)
 
     # Return the token along with user info
     return jsonify({
@@ -240,32 +250,90 @@ def edit_account():
     return jsonify({'detail': 'Account updated'}), 200
     
 
+def serialize_purchases(order, context):
+    return [{
+        'name': order_item.name,
+        'price': order_item.price,
+        'image': order_item.image_url,
+        'quantity': order_item.quantity,
+        'order_id': order_item.order_id,
+        'product_id': order_item.product_id
+    } for order_item in order.items]
+
+
+ORDER_FIELDS = Fieldset(Order, {
+    'order_number': 'order_number',
+    'order_status': 'order_status',
+    'order_placed': 'created_at',
+    'total_price': 'total_price',
+    'purchases': serialize_purchases,
+}, name='order')
+
+
+def order_load_options(fields):
+    """Load only the requested order columns, and the items only when purchases are requested."""
+    options = [ORDER_FIELDS.load_options(fields)]
+    if 'purchases' in fields:
+        options.append(selectinload(Order.items))
+    return options
+
+
 @account.get('/my-orders')
 @jwt_required()
 def get_my_orders():
     email = get_jwt_identity()
+    try:
+        fields = ORDER_FIELDS.select(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
     user = User.query.filter_by(email=email).first()
-    orders = Order.query.filter_by(user_id=user.id).all()
-    if orders is None:
+    orders = Order.query.filter_by(user_id=user.id).options(*order_load_options(fields)).all()
+    if not orders:
         return jsonify({'detail': 'You have not placed an order yet.'}), HTTP_204_NO_CONTENT
-    my_orders = [
-            {
-                'order_number': order.order_number,
-                'order_status': order.order_status.value,
-                'order_placed': order.created_at,
-                'total_price': order.total_price,
-                'purchases': [{
-                    'name': order_item.name,
-                    'price': order_item.price,
-                    'image': ProductImage.query.filter_by(product_id=order_item.product_id) \
-                               .order_by(ProductImage.id.desc()) \
-                               .first().image_path,
-                    'quantity': order_item.quantity,
-                    'order_id': order_item.order_id,
-                    'product_id': order_item.product_id
-                } for order_item in OrderItem.query.filter_by(order_id=order.id)
-                ]
-
-            } for order in orders
-        ]
-    return jsonify(my_orders=my_orders), HTTP_200_OK
\ No newline at end of file
+    my_orders = ORDER_FIELDS.serialize_many(orders, fields)
+    return jsonify(my_orders=my_orders), HTTP_200_OK
+
+
+@account.get('/order-history')
+@jwt_required()
+def get_order_history():
+    """
+    A page of the user's orders, newest first, in three queries (user, orders, items).
+
+    Query params:
+        status: Optional order status (e.g. Processing, Shipped, Delivered).
+        cursor: The `next_cursor` of the previous page.
+        limit: Page size (max 100).
+        fields: Optional comma separated subset of the order fields.
+    """
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    cursor = request.args.get('cursor', type=int)
+    status = request.args.get('status')
+    try:
+        fields = ORDER_FIELDS.select(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
+
+    email = get_jwt_identity()
+    user = User.query.filter_by(email=email).first_or_404()
+
+    query = Order.query.filter(Order.user_id == user.id)
+    if status:
+        try:
+            status = OrderStatus(status.capitalize())
+        except ValueError:
+            return jsonify({'error': f'status must be one of {", ".join(s.value for s in OrderStatus)}'}), HTTP_400_BAD_REQUEST
+        query = query.filter(Order.order_status == status)
+    if cursor:
+        query = query.filter(Order.id < cursor)
+
+    # Fetch one extra row to know whether there is a next page
+    orders = query.order_by(Order.id.desc()).options(*order_load_options(fields)).limit(limit + 1).all()
+    has_next = len(orders) > limit
+    orders = orders[:limit]
+
+    return jsonify({
+        'orders': ORDER_FIELDS.serialize_many(orders, fields),
+        'next_cursor': orders[-1].id if has_next else None,
+        'has_next': has_next
+    }), HTTP_200_OK
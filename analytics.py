@@ -0,0 +1,190 @@
+from flask import Blueprint, request, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import func
+
+from http_status_code import *
+from models import db, Order, OrderItem, Product, PaymentStatus, SalesRollup, upsert_add
+from utils import check_if_user_is_admin
+
+import click
+
+GRANULARITIES = ('hour', 'day')
+DIMENSIONS = ('total', 'product', 'category', 'status')
+ROLLUP_BATCH_SIZE = 1000
+
+analytics_bp = Blueprint('analytics', __name__, url_prefix='/api/analytics')
+
+
+def bucket_start(moment, granularity):
+    if granularity == 'hour':
+        return moment.replace(minute=0, second=0, microsecond=0)
+    return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def _increment(deltas):
+    """Add `deltas` {(granularity, bucket, dimension, value): [revenue, units, orders]} to the rollups."""
+    rows = [{'granularity': granularity, 'bucket': bucket, 'dimension': dimension,
+             'dimension_value': value, 'revenue': revenue, 'units': units, 'orders': orders}
+            for (granularity, bucket, dimension, value), (revenue, units, orders) in deltas.items()]
+    upsert_add(SalesRollup.__table__, ('granularity', 'dimension', 'dimension_value', 'bucket'),
+               rows, ('revenue', 'units', 'orders'))
+
+
+def _order_deltas(order, items, categories, sign=1, deltas=None):
+    deltas = deltas if deltas is not None else defaultdict(lambda: [0, 0, 0])
+    placed_at = order.created_at or datetime.utcnow()
+    for granularity in GRANULARITIES:
+        bucket = bucket_start(placed_at, granularity)
+
+        def add(dimension, value, revenue, units, orders):
+            delta = deltas[(granularity, bucket, dimension, value)]
+            delta[0] += sign * revenue
+            delta[1] += sign * units
+            delta[2] += sign * orders
+
+        units = sum(item.quantity for item in items)
+        add('total', '', order.total_price, units, 1)
+        add('status', order.order_status.value, order.total_price, units, 1)
+
+        seen_categories = set()
+        for item in items:
+            category = categories.get(item.product_id, 'unknown')
+            if item.product_id is not None:
+                # The product was deleted; its sales still count toward the totals and category
+                add('product', str(item.product_id), item.price, item.quantity, 1)
+            add('category', category, item.price, item.quantity, 0 if category in seen_categories else 1)
+            seen_categories.add(category)
+    return deltas
+
+
+def _categories_for(items):
+    product_ids = {item.product_id for item in items if item.product_id}
+    if not product_ids:
+        return {}
+    return dict(db.session.query(Product.id, Product.category_slug).filter(Product.id.in_(product_ids)))
+
+
+def record_order_paid(order, items):
+    """Add a newly paid order to the rollups; runs inside the caller's transaction."""
+    _increment(_order_deltas(order, items, _categories_for(items)))
+
+
+def record_status_change(order, old_status):
+    """Move a paid order's numbers from its old status to its current one."""
+    if order.payment_status != PaymentStatus.PAID or old_status == order.order_status:
+        return
+    units = sum(item.quantity for item in order.items)
+    deltas = {}
+    for granularity in GRANULARITIES:
+        bucket = bucket_start(order.created_at or datetime.utcnow(), granularity)
+        deltas[(granularity, bucket, 'status', old_status.value)] = [-order.total_price, -units, -1]
+        deltas[(granularity, bucket, 'status', order.order_status.value)] = [order.total_price, units, 1]
+    _increment(deltas)
+
+
+def backfill(batch_size=ROLLUP_BATCH_SIZE, echo=None):
+    """Rebuild every rollup from paid orders, reading `batch_size` orders at a time."""
+    db.session.execute(SalesRollup.__table__.delete())
+    last_id = 0
+    total = 0
+    while True:
+        orders = Order.query.filter(Order.payment_status == PaymentStatus.PAID, Order.id > last_id) \
+                            .order_by(Order.id).limit(batch_size).all()
+        if not orders:
+            break
+        items_by_order = defaultdict(list)
+        for item in OrderItem.query.filter(OrderItem.order_id.in_([order.id for order in orders])):
+            items_by_order[item.order_id].append(item)
+        categories = _categories_for([item for items in items_by_order.values() for item in items])
+
+        deltas = defaultdict(lambda: [0, 0, 0])
+        for order in orders:
+            _order_deltas(order, items_by_order[order.id], categories, deltas=deltas)
+        _increment(deltas)
+        last_id = orders[-1].id
+        total += len(orders)
+        db.session.commit()
+        db.session.expunge_all()
+
+        if echo:
+            echo(f'{total} orders rolled up')
+    db.session.commit()
+    return total
+
+
+def _parse_range():
+    end = request.args.get('end')
+    start = request.args.get('start')
+    end = datetime.fromisoformat(end) if end else datetime.utcnow()
+    start = datetime.fromisoformat(start) if start else end - timedelta(days=30)
+    return start, end
+
+
+@analytics_bp.get('/timeseries')
+@jwt_required()
+def get_timeseries():
+    if not check_if_user_is_admin(get_jwt_identity()):
+        return jsonify({'detail': 'You dont have permission to perform this command.'}), HTTP_403_FORBIDDEN
+
+    granularity = request.args.get('granularity', 'day')
+    dimension = request.args.get('dimension', 'total')
+    value = request.args.get('value', '')
+    if granularity not in GRANULARITIES or dimension not in DIMENSIONS:
+        return jsonify({'error': f'granularity must be one of {GRANULARITIES}, dimension one of {DIMENSIONS}'}), HTTP_400_BAD_REQUEST
+    try:
+        start, end = _parse_range()
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO 8601 datetimes'}), HTTP_400_BAD_REQUEST
+
+    rows = SalesRollup.query.filter(SalesRollup.granularity == granularity,
+                                    SalesRollup.dimension == dimension,
+                                    SalesRollup.dimension_value == value,
+                                    SalesRollup.bucket >= bucket_start(start, granularity),
+                                    SalesRollup.bucket <= end) \
+                            .order_by(SalesRollup.bucket)
+    return jsonify({
+        'granularity': granularity,
+        'dimension': dimension,
+        'value': value,
+        'series': [{'bucket': row.bucket, 'revenue': row.revenue,
+                    'units': row.units, 'orders': row.orders} for row in rows]
+    }), HTTP_200_OK
+
+
+@analytics_bp.get('/top-products')
+@jwt_required()
+def get_top_products():
+    if not check_if_user_is_admin(get_jwt_identity()):
+        return jsonify({'detail': 'You dont have permission to perform this command.'}), HTTP_403_FORBIDDEN
+
+    by = request.args.get('by', 'revenue')
+    limit = min(request.args.get('limit', 10, type=int), 100)
+    if by not in ('revenue', 'units', 'orders'):
+        return jsonify({'error': 'by must be revenue, units or orders'}), HTTP_400_BAD_REQUEST
+    try:
+        start, end = _parse_range()
+    except ValueError:
+        return jsonify({'error': 'start and end must be ISO 8601 datetimes'}), HTTP_400_BAD_REQUEST
+
+    metric = func.sum(getattr(SalesRollup, by))
+    rows = db.session.query(SalesRollup.dimension_value, func.sum(SalesRollup.revenue),
+                            func.sum(SalesRollup.units), func.sum(SalesRollup.orders)) \
+                     .filter(SalesRollup.granularity == 'day', SalesRollup.dimension == 'product',
+                             SalesRollup.bucket >= bucket_start(start, 'day'), SalesRollup.bucket <= end) \
+                     .group_by(SalesRollup.dimension_value) \
+                     .order_by(metric.desc()) \
+                     .limit(limit)
+    return jsonify({
+        'by': by,
+        'products': [{'product_id': int(product_id), 'revenue': revenue, 'units': units, 'orders': orders}
+                     for product_id, revenue, units, orders in rows if product_id.isdigit()]
+    }), HTTP_200_OK
+
+
+@analytics_bp.cli.command('backfill')
+@click.option('--batch-size', default=ROLLUP_BATCH_SIZE, show_default=True)
+def backfill_command(batch_size):
+    """Rebuild the sales rollups from Order/OrderItem."""
+    backfill(batch_size, echo=click.echo)
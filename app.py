@@ -1,88 +1,120 @@
 from flask import Flask, send_from_directory, jsonify
-from flask_migrate import Migrate
-
-from dotenv import load_dotenv
-from models import db
-from account import account
-from product import product_bp
-from cart import cart_bp
-from order import order_bp
-from blacklist import jwt
-from social_logins import google_bp
-from http_status_code import *
 
-from datetime import timedelta
+from config import Config
+from http_status_code import *
 
-from utils import mail
 import os
 
-# Load environment variables from the .env file
-load_dotenv()
-
 # Allow insecure transport for development (HTTP instead of HTTPS)
 os.environ["OAUTHLIB_INSECURE_TRANSPORT"] = "1"
 
 
-
-app = Flask(__name__)
-
-UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER')
-
-# CONNECT TO DB
-app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('SQLALCHEMY_DATABASE_URI')
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY')
-app.config["UPLOAD_FOLDER"] = UPLOAD_FOLDER
-
-app.config["JWT_SECRET_KEY"] = os.getenv('JWT_SECRET_KEY')
-app.config["JWT_ACCESS_TOKEN_EXPIRES"] = timedelta(days=3)
-
-app.config['PERMANENT_SESSION_LIFETIME'] = timedelta(days=1)  # Optional
-
-# Configuration for Flask-Mail
-app.config['MAIL_SERVER'] = os.getenv('EMAIL_HOST')
-app.config['MAIL_PORT'] = os.getenv('EMAIL_PORT')
-app.config['MAIL_USERNAME'] = os.getenv('EMAIL_HOST_USER') 
-app.config['MAIL_USE_TLS'] = os.getenv('EMAIL_USE_TLS')
-app.config['MAIL_PASSWORD'] = os.getenv('EMAIL_HOST_PASSWORD')
-
-# Ensure the folder exists
-os.makedirs(UPLOAD_FOLDER, exist_ok=True)
-
-db.init_app(app)
-mail.init_app(app)
-
-migrate = Migrate(app, db, render_as_batch=True)
-jwt.init_app(app)
-
-
-app.register_blueprint(account)
-app.register_blueprint(product_bp)
-app.register_blueprint(cart_bp)
-app.register_blueprint(order_bp)
-
-
-app.register_blueprint(google_bp, url_prefix="/login")
-
-with app.app_context():
-    db.create_all()
-
-# Route to serve profile pictures
-@app.route('/media/profile-pictures/<filename>')
-def serve_profile_pictures(filename):
-    return send_from_directory('media/profile-pictures', filename)
-
-# Route to serve product images
-@app.route('/media/product-images/<filename>')
-def serve_product_images(filename):
-    return send_from_directory('media/product-images', filename)
-
-@app.errorhandler(HTTP_404_NOT_FOUND)
-def handle_404(e):
-    return jsonify({'error': 'Not found'}), HTTP_404_NOT_FOUND
+def create_app(config=None):
+    """
+    Build and configure the Flask application.
+
+    Args:
+        config: Optional config object/class or dict of overrides applied on top of `Config`.
+
+    Blueprints and extensions are imported here rather than at module level so that
+    importing this module stays cheap. No schema work happens at boot; use
+    `flask db upgrade` (or `flask init-db` on an empty database) instead.
+    """
+    app = Flask(__name__)
+    app.config.from_object(Config)
+    if isinstance(config, dict):
+        app.config.update(config)
+    elif config is not None:
+        app.config.from_object(config)
+
+    # Ensure the folder exists
+    if app.config.get('UPLOAD_FOLDER'):
+        os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    register_extensions(app)
+    register_blueprints(app)
+    register_routes(app)
+    register_commands(app)
+
+    return app
+
+
+def register_extensions(app):
+    from flask_migrate import Migrate
+
+    from models import db
+    from blacklist import jwt
+    from utils import mail
+    from json_provider import FastJSONProvider
+    import catalog_cache
+    import autocomplete
+    import compression
+    import touch_buffer
+    import passwords
+
+    app.json = FastJSONProvider(app)
+    if not (app.config['SQLALCHEMY_DATABASE_URI'] or '').startswith('sqlite'):
+        app.config.setdefault('SQLALCHEMY_ENGINE_OPTIONS', {
+            'pool_size': app.config['DB_POOL_SIZE'],
+            'max_overflow': app.config['DB_MAX_OVERFLOW'],
+            'pool_timeout': app.config['DB_POOL_TIMEOUT'],
+            'pool_recycle': app.config['DB_POOL_RECYCLE'],
+            'pool_pre_ping': True,
+        })
+    db.init_app(app)
+    mail.init_app(app)
+    catalog_cache.init_app(app)
+    autocomplete.init_app(app)
+    compression.init_app(app)
+    touch_buffer.init_app(app)
+    passwords.init_app(app)
+
+    Migrate(app, db, render_as_batch=True)
+    jwt.init_app(app)
+
+
+def register_blueprints(app):
+    from account import account
+    from product import product_bp
+    from cart import cart_bp
+    from order import order_bp
+    from social_logins import google_bp
+    from analytics import analytics_bp
+    from jobs import jobs_bp
+
+    app.register_blueprint(account)
+    app.register_blueprint(product_bp)
+    app.register_blueprint(cart_bp)
+    app.register_blueprint(order_bp)
+    app.register_blueprint(analytics_bp)
+    app.register_blueprint(jobs_bp)
+
+    app.register_blueprint(google_bp, url_prefix="/login")
+
+
+def register_routes(app):
+    # Route to serve profile pictures
+    @app.route('/media/profile-pictures/<filename>')
+    def serve_profile_pictures(filename):
+        return send_from_directory('media/profile-pictures', filename)
+
+    # Route to serve product images
+    @app.route('/media/product-images/<filename>')
+    def serve_product_images(filename):
+        return send_from_directory('media/product-images', filename)
+
+    @app.errorhandler(HTTP_404_NOT_FOUND)
+    def handle_404(e):
+        return jsonify({'error': 'Not found'}), HTTP_404_NOT_FOUND
+
+
+def register_commands(app):
+    @app.cli.command('init-db')
+    def init_db():
+        """Create all tables on an empty database."""
+        from models import db
+        db.create_all()
 
 
 if __name__ == '__main__':
-    app.run(debug=os.getenv('DEBUG'))
+    create_app().run(debug=os.getenv('DEBUG'))
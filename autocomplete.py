@@ -0,0 +1,205 @@
+from bisect import bisect_left, insort
+from sqlalchemy import event, func
+from sqlalchemy.orm import Session
+
+import threading
+import time
+
+MAX_TERM_LENGTH = 32
+MAX_WORDS_PER_NAME = 8
+SHORT_PREFIX_LENGTH = 3  # Results for prefixes this short are memoized until the index changes
+
+
+def _terms(name, brand, category):
+    """Lower-cased keys a product can be found by: the name from each word on, brand and category."""
+    words = (name or '').lower().split()[:MAX_WORDS_PER_NAME]
+    terms = {' '.join(words[i:])[:MAX_TERM_LENGTH] for i in range(len(words))}
+    terms.update(term.lower()[:MAX_TERM_LENGTH] for term in (brand, category) if term)
+    return tuple(term for term in terms if term)
+
+
+class AutocompleteIndex:
+    """
+    In-memory prefix index over product names, brands and categories.
+
+    Keys are kept in a sorted list of (term, product_id) so a lookup is a binary search
+    followed by a short forward scan; matches are ranked by popularity (units sold).
+    The index is per process: it applies this process's own catalog commits as they
+    happen and rebuilds itself from the database every `refresh_seconds`, which bounds
+    how far behind other workers' changes it can be.
+
+    Only the first build runs on the request that needs it. Later rebuilds, periodic
+    or after `mark_stale()`, run on a background thread, one at a time, while requests
+    keep searching the current index. Commits applied during a rebuild are replayed
+    onto the new index, so they are not lost when it replaces the old one.
+    """
+
+    def __init__(self, max_products=200000, refresh_seconds=300, max_scan=5000):
+        self.app = None
+        self.max_products = max_products
+        self.refresh_seconds = refresh_seconds
+        self.max_scan = max_scan
+        self._keys = []
+        self._products = {}  # product id -> (terms, suggestion, popularity)
+        self._memo = {}
+        self._built_at = None
+        self._stale = False
+        self._replay = None  # Changes applied while a rebuild is reading the database
+        self._lock = threading.RLock()
+        self._rebuilding = threading.Lock()
+
+    def ensure_fresh(self):
+        if self._built_at is None:
+            with self._rebuilding:
+                # Requests that waited here find the index another one just built
+                if self._built_at is None:
+                    self.rebuild()
+        elif self._stale or time.monotonic() - self._built_at > self.refresh_seconds:
+            if self._rebuilding.acquire(blocking=False):
+                threading.Thread(target=self._rebuild_in_background, name='autocomplete-rebuild', daemon=True).start()
+
+    def mark_stale(self):
+        self._stale = True
+
+    def _rebuild_in_background(self):
+        try:
+            with self.app.app_context():
+                self.rebuild()
+        except Exception:
+            self.app.logger.exception('Autocomplete index rebuild failed')
+            with self._lock:
+                # Wait a full interval before trying again rather than retrying on every request
+                self._built_at = time.monotonic()
+        finally:
+            self._rebuilding.release()
+
+    def rebuild(self):
+        from models import db, Product, OrderItem
+        with self._lock:
+            self._stale = False
+            self._replay = []
+        popularity = dict(db.session.query(OrderItem.product_id, func.sum(OrderItem.quantity))
+                                    .filter(OrderItem.product_id.isnot(None))
+                                    .group_by(OrderItem.product_id))
+        products = {}
+        for id, name, brand, category in db.session.query(Product.id, Product.name, Product.brand, Product.category) \
+                                                   .execution_options(yield_per=5000):
+            products[id] = (_terms(name, brand, category),
+                            {'id': id, 'name': name, 'brand': brand, 'category': category},
+                            int(popularity.get(id) or 0))
+        if len(products) > self.max_products:
+            # Keep the memory footprint bounded: drop the least popular products
+            keep = sorted(products, key=lambda id: products[id][2], reverse=True)[:self.max_products]
+            products = {id: products[id] for id in keep}
+        keys = sorted((term, id) for id, (terms, _, _) in products.items() for term in terms)
+        with self._lock:
+            replay, self._replay = self._replay or [], None
+            self._products = products
+            self._keys = keys
+            self._memo = {}
+            self._built_at = time.monotonic()
+            for method, args in replay:
+                getattr(self, method)(*args)
+
+    def _record(self, method, *args):
+        # Called with the lock held
+        if self._replay is not None:
+            self._replay.append((method, args))
+
+    def upsert(self, id, name, brand, category):
+        with self._lock:
+            self._record('upsert', id, name, brand, category)
+            popularity = self._products[id][2] if id in self._products else 0
+            self._remove_keys(id)
+            terms = _terms(name, brand, category)
+            self._products[id] = (terms, {'id': id, 'name': name, 'brand': brand, 'category': category}, popularity)
+            for term in terms:
+                insort(self._keys, (term, id))
+            self._memo = {}
+
+    def remove(self, id):
+        with self._lock:
+            self._record('remove', id)
+            self._remove_keys(id)
+            self._products.pop(id, None)
+            self._memo = {}
+
+    def bump(self, id, units):
+        """Add sold units to a product's popularity."""
+        with self._lock:
+            self._record('bump', id, units)
+            if id in self._products:
+                terms, suggestion, popularity = self._products[id]
+                self._products[id] = (terms, suggestion, popularity + units)
+                self._memo = {}
+
+    def _remove_keys(self, id):
+        if id not in self._products:
+            return
+        for term in self._products[id][0]:
+            position = bisect_left(self._keys, (term, id))
+            if position < len(self._keys) and self._keys[position] == (term, id):
+                del self._keys[position]
+
+    def search(self, prefix, limit=8):
+        prefix = prefix.strip().lower()[:MAX_TERM_LENGTH]
+        if not prefix:
+            return []
+        with self._lock:
+            memo_key = (prefix, limit)
+            if memo_key in self._memo:
+                return self._memo[memo_key]
+
+            matches = set()
+            position = bisect_left(self._keys, (prefix,))
+            end = min(position + self.max_scan, len(self._keys))
+            while position < end:
+                term, id = self._keys[position]
+                if not term.startswith(prefix):
+                    break
+                matches.add(id)
+                position += 1
+
+            ranked = sorted(matches, key=lambda id: (-self._products[id][2], self._products[id][1]['name']))
+            results = [self._products[id][1] for id in ranked[:limit]]
+            if len(prefix) <= SHORT_PREFIX_LENGTH:
+                self._memo[memo_key] = results
+            return results
+
+
+autocomplete_index = AutocompleteIndex()
+
+
+def init_app(app):
+    autocomplete_index.app = app
+    autocomplete_index.max_products = app.config['AUTOCOMPLETE_MAX_PRODUCTS']
+    autocomplete_index.refresh_seconds = app.config['AUTOCOMPLETE_REFRESH_SECONDS']
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_product_changes(session, flush_context):
+    from models import Product
+    changes = session.info.setdefault('autocomplete_changes', {})
+    for obj in (*session.new, *session.dirty):
+        if isinstance(obj, Product):
+            changes[obj.id] = (obj.name, obj.brand, obj.category)
+    for obj in session.deleted:
+        if isinstance(obj, Product):
+            changes[obj.id] = None
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_product_changes(session):
+    changes = session.info.pop('autocomplete_changes', None)
+    if not changes or (autocomplete_index._built_at is None and autocomplete_index._replay is None):
+        return  # Not built yet, nor being built
+    for id, product in changes.items():
+        if product is None:
+            autocomplete_index.remove(id)
+        else:
+            autocomplete_index.upsert(id, *product)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _discard_product_changes(session):
+    session.info.pop('autocomplete_changes', None)
@@ -0,0 +1,88 @@
+"""
+End-to-end checkout load test through the PayPal webhook pipeline.
+
+Start the mock PayPal with webhooks pointed at the app, the app with PAYPAL_WEBHOOK_ID
+set, and at least one payment worker:
+    python mock_paypal.py --port 5001 --latency-ms 150 --webhook-url http://127.0.0.1:5000/api/order/paypal-webhook
+    PAYPAL_API_BASE=http://127.0.0.1:5001 PAYPAL_WEBHOOK_ID=WH-LOCAL gunicorn -w 4 "app:create_app()"
+    PAYPAL_API_BASE=http://127.0.0.1:5001 PAYPAL_WEBHOOK_ID=WH-LOCAL flask --app "app:create_app()" order process-payment-events
+
+Then:
+    python benchmarks/checkout_webhooks.py --app-url http://127.0.0.1:5000 --product-id 1 --checkouts 200 --concurrency 20
+
+Each virtual buyer adds the product to an anonymous cart, creates the payment, approves
+it at the mock (which redirects to execute-payment) and polls after-payment until the
+worker has finalized the order. Reports the synchronous request time and the time from
+execution to the order being paid.
+"""
+import argparse
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+SHIPPING = dict(full_name='Load Test', street='1 Main St', city='Springfield', state='IL', zip_code='62701',
+                country='US', phone_number='5550100', email='loadtest@example.com')
+
+
+def checkout(app_url, product_id, timeout):
+    session = requests.Session()
+    start = time.perf_counter()
+    response = session.post(f'{app_url}/api/cart/add', json={'product_id': product_id, 'quantity': 1})
+    response.raise_for_status()
+    response = session.post(f'{app_url}/api/order/create-payment', json=SHIPPING)
+    response.raise_for_status()
+    # The mock approves instantly and redirects back to execute-payment
+    response = session.get(response.json()['redirect_url'])
+    response.raise_for_status()
+    executed = time.perf_counter()
+    order_number = response.json()['order_number']
+
+    deadline = executed + timeout
+    while time.perf_counter() < deadline:
+        response = session.get(f'{app_url}/api/order/after-payment/{order_number}')
+        if response.status_code == 200:
+            return executed - start, time.perf_counter() - executed
+        time.sleep(0.05)
+    raise TimeoutError(f'Order {order_number} not paid after {timeout}s')
+
+
+def percentile(values, pct):
+    return sorted(values)[min(int(len(values) * pct / 100), len(values) - 1)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--app-url', default='http://127.0.0.1:5000')
+    parser.add_argument('--product-id', type=int, required=True, help='A product with enough stock')
+    parser.add_argument('--checkouts', type=int, default=100)
+    parser.add_argument('--concurrency', type=int, default=10)
+    parser.add_argument('--timeout', type=float, default=30, help='Seconds to wait for each order to be paid')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(args.concurrency) as pool:
+        futures = [pool.submit(checkout, args.app_url.rstrip('/'), args.product_id, args.timeout)
+                   for _ in range(args.checkouts)]
+    results, errors = [], []
+    for future in futures:
+        try:
+            results.append(future.result())
+        except Exception as e:
+            errors.append(e)
+    elapsed = time.perf_counter() - start
+
+    print(f'{len(results)} checkouts paid, {len(errors)} failed, in {elapsed:.1f}s '
+          f'({len(results) / elapsed:.1f} checkouts/s at concurrency {args.concurrency})')
+    if results:
+        for label, values in (('request path', [r[0] for r in results]), ('execute -> paid', [r[1] for r in results])):
+            values = [value * 1000 for value in values]
+            print(f'{label:16} p50 {statistics.median(values):8.1f} ms   p95 {percentile(values, 95):8.1f} ms   '
+                  f'max {max(values):8.1f} ms')
+    for error in errors[:5]:
+        print(f'error: {error}')
+
+
+if __name__ == '__main__':
+    main()
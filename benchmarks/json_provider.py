@@ -0,0 +1,110 @@
+"""
+JSON benchmark: Flask's default provider with hand-written dicts vs compiled fieldsets and FastJSONProvider.
+
+Usage:
+    python benchmarks/json_provider.py --orders 2000 --items 5 --products 5000 --runs 5
+
+Builds large order-history and product-listing payloads from in-memory model objects
+(no database needed) and times serialize + encode for each combination.
+"""
+import argparse
+import os
+import statistics
+import sys
+import time
+from datetime import datetime
+from decimal import Decimal
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_objects(orders, items, products):
+    from models import Order, OrderItem, OrderStatus, Product
+    now = datetime.utcnow()
+    order_objs = []
+    for i in range(orders):
+        order = Order(order_number=f'20261019000000000-{i:012d}', order_status=OrderStatus.PROCESSING,
+                      total_price=Decimal('199.99'))
+        order.created_at = now
+        order.items = [OrderItem(name=f'Product {j}', price=Decimal('39.99'), image_url=f'http://img/{j}.jpg',
+                                 quantity=j + 1, order_id=i, product_id=j) for j in range(items)]
+        order_objs.append(order)
+    product_objs = [Product(id=i, name=f'Product {i}', price=Decimal('19.99') + i, avg_rating=Decimal('4.25'),
+                            quantity=i % 50, category='phones', brand='sony') for i in range(products)]
+    return order_objs, product_objs
+
+
+def hand_written(orders, products, images):
+    # What the endpoints built before fieldsets; Flask's default provider can't encode Enums
+    return {
+        'orders': [{
+            'order_number': order.order_number,
+            'order_status': order.order_status.value,
+            'order_placed': order.created_at,
+            'total_price': order.total_price,
+            'purchases': [{
+                'name': item.name, 'price': item.price, 'image': item.image_url,
+                'quantity': item.quantity, 'order_id': item.order_id, 'product_id': item.product_id
+            } for item in order.items]
+        } for order in orders],
+        'products': [{
+            'id': product.id, 'name': product.name, 'price': float(product.price),
+            'rating': product.avg_rating, 'quantity': product.quantity, 'category': product.category,
+            'brand': product.brand, 'image': images.get(product.id)
+        } for product in products],
+    }
+
+
+def compiled(orders, products, images):
+    from fieldsets import registry
+    order_fields, listing_fields = registry['order'], registry['product_listing']
+    return {
+        'orders': order_fields.serialize_many(orders, order_fields.default),
+        'products': listing_fields.serialize_many(products, listing_fields.default, images=images),
+    }
+
+
+def timed(fn, runs):
+    samples = []
+    for _ in range(runs):
+        start = time.perf_counter()
+        size = len(fn())
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples), size
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--orders', type=int, default=2000)
+    parser.add_argument('--items', type=int, default=5)
+    parser.add_argument('--products', type=int, default=5000)
+    parser.add_argument('--runs', type=int, default=5)
+    args = parser.parse_args()
+
+    from flask.json.provider import DefaultJSONProvider
+    from app import create_app
+    from json_provider import FastJSONProvider, orjson
+
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'UPLOAD_FOLDER': 'media'})
+    with app.app_context():
+        orders, products = make_objects(args.orders, args.items, args.products)
+        images = {product.id: f'http://img/{product.id}.jpg' for product in products}
+        default, fast = DefaultJSONProvider(app), FastJSONProvider(app)
+
+        cases = [
+            ('default provider, hand-written dicts', lambda: default.response(hand_written(orders, products, images)).data),
+            ('fast provider, hand-written dicts', lambda: fast.response(hand_written(orders, products, images)).data),
+            ('fast provider, compiled fieldsets', lambda: fast.response(compiled(orders, products, images)).data),
+        ]
+        print(f'{args.orders} orders x {args.items} items, {args.products} products, '
+              f'backend: {"orjson " + orjson.__version__ if orjson else "json (orjson not installed)"}')
+        baseline = None
+        for label, fn in cases:
+            ms, size = timed(fn, args.runs)
+            baseline = baseline or ms
+            print(f'{label:40} {ms:8.1f} ms  {size / 1024:8.0f} KiB  x{baseline / ms:.1f}')
+
+
+if __name__ == '__main__':
+    main()
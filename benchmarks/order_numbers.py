@@ -0,0 +1,76 @@
+"""
+Stress test for order number generation across many threads and processes.
+
+Usage:
+    python benchmarks/order_numbers.py --processes 8 --threads 8 --per-thread 5000
+    python benchmarks/order_numbers.py --database-url postgresql://... --per-thread 500
+
+Numbers come from the real `Order.order_number` validator. With --database-url every
+order is also committed, so the unique constraint on `order.order_number` is exercised.
+Exits with status 1 if any collision is found.
+"""
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def generate(count):
+    from models import Order
+    return [Order(order_number=None).order_number for _ in range(count)]
+
+
+def insert(app, count):
+    from models import db, Order
+    numbers = []
+    with app.app_context():
+        for _ in range(count):
+            order = Order(full_name='Load Test', street='-', city='-', state='-', zip_code='-', country='-',
+                          phone_number='-', email='load@test.local', total_price=0, order_number=None)
+            db.session.add(order)
+            db.session.commit()
+            numbers.append(order.order_number)
+        db.session.remove()
+    return numbers
+
+
+def run_process(threads, per_thread, database_url):
+    app = None
+    if database_url:
+        from app import create_app
+        app = create_app({'SQLALCHEMY_DATABASE_URI': database_url})
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        futures = [pool.submit(insert, app, per_thread) if app else pool.submit(generate, per_thread)
+                   for _ in range(threads)]
+        return [number for future in futures for number in future.result()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--processes', type=int, default=4)
+    parser.add_argument('--threads', type=int, default=8)
+    parser.add_argument('--per-thread', type=int, default=5000)
+    parser.add_argument('--database-url', help='Commit every order to this database (tables must exist)')
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=args.processes) as pool:
+        futures = [pool.submit(run_process, args.threads, args.per_thread, args.database_url)
+                   for _ in range(args.processes)]
+        numbers = [number for future in futures for number in future.result()]
+    elapsed = time.perf_counter() - start
+
+    collisions = len(numbers) - len(set(numbers))
+    print(f'orders:     {len(numbers)}')
+    print(f'elapsed:    {elapsed:.2f} s ({len(numbers) / elapsed:,.0f} orders/s)')
+    print(f'collisions: {collisions}')
+    if collisions:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+"""
+Login throughput under different password hashing settings.
+
+Usage:
+    python benchmarks/password_hashing.py --seconds 5 --clients 8
+    python benchmarks/password_hashing.py --methods scrypt:16384:8:1 pbkdf2:sha256:600000 --workers 0 4
+
+For each hash method and pool size, creates a user in a throwaway SQLite database and
+has `--clients` threads log in through the real /api/account/login endpoint for
+`--seconds`. Reports logins per second, per core used for hashing, and the p95 latency;
+503s are requests turned away by the pool's backpressure. Workers 0 hashes on the
+request thread, as a sync gunicorn worker did before.
+"""
+import argparse
+import os
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_METHODS = ('pbkdf2:sha256:600000', 'pbkdf2:sha256:1000000', 'scrypt:16384:8:1', 'scrypt:32768:8:1')
+PASSWORD = 'correct horse battery'
+
+
+def run(method, workers, clients, seconds):
+    from app import create_app
+    from models import db, User
+    from passwords import password_hasher
+
+    with tempfile.TemporaryDirectory() as tmp:
+        app = create_app({
+            'SQLALCHEMY_DATABASE_URI': f'sqlite:///{tmp}/bench.db', 'SECRET_KEY': 'bench', 'JWT_SECRET_KEY': 'bench' * 8,
+            'PASSWORD_HASH_METHOD': method, 'PASSWORD_HASH_WORKERS': workers,
+            'PASSWORD_HASH_MAX_PENDING': max(workers, 1) * 4, 'TOUCH_FLUSH_INTERVAL': 5,
+        })
+        with app.app_context():
+            db.create_all()
+            db.session.add(User(username='bench', email='bench@example.com', is_active=True,
+                                password=password_hasher.hash(PASSWORD)))
+            db.session.commit()
+            password_hasher.verify(User.query.one().password, PASSWORD)  # Start the pool outside the timing
+
+        latencies, rejected = [], [0]
+        lock = threading.Lock()
+        deadline = time.perf_counter() + seconds
+
+        def client():
+            test_client = app.test_client()
+            while time.perf_counter() < deadline:
+                start = time.perf_counter()
+                response = test_client.post('/api/account/login', json={'email': 'bench@example.com', 'password': PASSWORD})
+                with lock:
+                    if response.status_code == 200:
+                        latencies.append(time.perf_counter() - start)
+                    else:
+                        rejected[0] += 1
+
+        threads = [threading.Thread(target=client) for _ in range(clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+        password_hasher.shutdown()
+
+    cores = min(workers or 1, os.cpu_count() or 1)
+    rate = len(latencies) / elapsed
+    p95 = sorted(latencies)[int(len(latencies) * 0.95)] * 1000 if latencies else float('nan')
+    median = statistics.median(latencies) * 1000 if latencies else float('nan')
+    print(f'{method:24} workers {workers:2}  {rate:8.1f} logins/s  {rate / cores:8.1f} /core  '
+          f'p50 {median:7.1f} ms  p95 {p95:7.1f} ms  503s {rejected[0]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--methods', nargs='+', default=DEFAULT_METHODS)
+    parser.add_argument('--workers', nargs='+', type=int, default=[0, os.cpu_count() or 1])
+    parser.add_argument('--clients', type=int, default=8)
+    parser.add_argument('--seconds', type=float, default=5)
+    args = parser.parse_args()
+
+    print(f'{os.cpu_count()} cores, {args.clients} concurrent clients, {args.seconds}s per setting')
+    for method in args.methods:
+        for workers in args.workers:
+            run(method, workers, args.clients, args.seconds)
+
+
+if __name__ == '__main__':
+    main()
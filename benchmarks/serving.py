@@ -0,0 +1,153 @@
+"""
+Serving benchmark: sync vs gevent gunicorn workers on a mixed workload.
+
+Usage:
+    python benchmarks/serving.py --workers 2 --clients 50 --seconds 15 --paypal-latency-ms 300
+
+Seeds a throwaway SQLite database (or uses --database-uri), starts the mock PayPal server
+with the given latency, then for each worker class starts gunicorn with gunicorn.conf.py
+and the same number of processes, and has `--clients` threads send a mix of catalog reads
+and checkouts. The reads are get-product and all-products. A checkout is create-payment,
+which waits on the mock PayPal. Reports requests per second and latency per endpoint;
+errors include timeouts.
+"""
+import argparse
+import os
+import random
+import signal
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import requests
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+PRODUCTS = 200
+SHIPPING = dict(full_name='Load Test', street='1 Main St', city='Springfield', state='IL', zip_code='62701',
+                country='US', phone_number='5550100', email='loadtest@example.com')
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def seed(database_uri):
+    from app import create_app
+    from models import db, Product
+    app = create_app({'SQLALCHEMY_DATABASE_URI': database_uri, 'SECRET_KEY': 'bench', 'JWT_SECRET_KEY': 'bench' * 8})
+    with app.app_context():
+        db.create_all()
+        if not Product.query.count():
+            db.session.add_all(Product(name=f'Product {i}', description='A product. ' * 20, quantity=10 ** 6,
+                                       price=10 + i, category='phones', brand='sony') for i in range(PRODUCTS))
+            db.session.commit()
+
+
+def wait_for(url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(url, timeout=5)
+            return
+        except requests.RequestException:
+            time.sleep(0.2)
+    raise RuntimeError(f'{url} did not come up')
+
+
+def client(base_url, deadline, checkout_ratio, results, lock):
+    session = requests.Session()
+    session.post(f'{base_url}/api/cart/add', json={'product_id': 1, 'quantity': 1}, timeout=30)
+    while time.monotonic() < deadline:
+        roll = random.random()
+        if roll < checkout_ratio:
+            name, call = 'create-payment', lambda: session.post(f'{base_url}/api/order/create-payment', json=SHIPPING, timeout=30)
+        elif roll < (1 + checkout_ratio) / 2:
+            name, call = 'get-product', lambda: session.get(f'{base_url}/api/product/get-product/{random.randint(1, PRODUCTS)}', timeout=30)
+        else:
+            name, call = 'all-products', lambda: session.get(f'{base_url}/api/product/all-products', timeout=30)
+        start = time.perf_counter()
+        try:
+            ok = call().status_code < 500
+        except requests.RequestException:
+            ok = False
+        with lock:
+            results.setdefault(name, ([], [0]))
+            if ok:
+                results[name][0].append(time.perf_counter() - start)
+            else:
+                results[name][1][0] += 1
+
+
+def run(worker_class, args, env):
+    port = free_port()
+    env = dict(env, GUNICORN_WORKER_CLASS=worker_class, GUNICORN_WORKERS=str(args.workers),
+               GUNICORN_BIND=f'127.0.0.1:{port}')
+    server = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'app:create_app()'],
+                              cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    base_url = f'http://127.0.0.1:{port}'
+    try:
+        wait_for(f'{base_url}/api/product/get-product/1')
+        results, lock = {}, threading.Lock()
+        deadline = time.monotonic() + args.seconds
+        threads = [threading.Thread(target=client, args=(base_url, deadline, args.checkout_ratio, results, lock))
+                   for _ in range(args.clients)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - start
+    finally:
+        server.send_signal(signal.SIGTERM)
+        server.wait(30)
+
+    total = sum(len(latencies) for latencies, _ in results.values())
+    print(f'{worker_class:7} {args.workers} workers: {total / elapsed:8.1f} req/s')
+    for name, (latencies, errors) in sorted(results.items()):
+        latencies = sorted(value * 1000 for value in latencies) or [float('nan')]
+        print(f'    {name:15} {len(latencies) / elapsed:8.1f} req/s   p50 {statistics.median(latencies):8.1f} ms   '
+              f'p95 {latencies[int(len(latencies) * 0.95)]:8.1f} ms   errors {errors[0]}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--worker-classes', nargs='+', default=['sync', 'gevent'])
+    parser.add_argument('--workers', type=int, default=2, help='Gunicorn processes for every worker class')
+    parser.add_argument('--clients', type=int, default=50)
+    parser.add_argument('--seconds', type=float, default=15)
+    parser.add_argument('--checkout-ratio', type=float, default=0.2, help='Share of requests that are create-payment')
+    parser.add_argument('--paypal-latency-ms', type=int, default=300)
+    parser.add_argument('--database-uri', help='Defaults to a throwaway SQLite file')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        database_uri = args.database_uri or f'sqlite:///{tmp}/serving.db'
+        seed(database_uri)
+        paypal_port = free_port()
+        paypal = subprocess.Popen([sys.executable, 'mock_paypal.py', '--port', str(paypal_port),
+                                   '--latency-ms', str(args.paypal_latency_ms)],
+                                  cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        env = dict(os.environ, SQLALCHEMY_DATABASE_URI=database_uri, SECRET_KEY='bench', JWT_SECRET_KEY='bench' * 8,
+                   PAYPAL_API_BASE=f'http://127.0.0.1:{paypal_port}', PAYPAL_CLIENT_ID='bench', PAYPAL_SECRET_KEY='bench',
+                   UPLOAD_FOLDER=tmp)
+        try:
+            wait_for(f'http://127.0.0.1:{paypal_port}/')
+            print(f'{args.clients} clients, {args.checkout_ratio:.0%} checkouts, PayPal latency {args.paypal_latency_ms} ms, '
+                  f'{args.seconds}s per worker class')
+            for worker_class in args.worker_classes:
+                run(worker_class, args, env)
+        finally:
+            paypal.terminate()
+            paypal.wait(10)
+
+
+if __name__ == '__main__':
+    main()
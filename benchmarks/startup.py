@@ -0,0 +1,55 @@
+"""
+Cold start benchmark: time to import `app` and build the application in a fresh interpreter.
+
+Usage:
+    python benchmarks/startup.py --runs 10 --target-ms 1000
+
+Exits with status 1 when the median cold start exceeds the target.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNIPPET = """
+import time
+start = time.perf_counter()
+from app import create_app
+imported = time.perf_counter()
+create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'UPLOAD_FOLDER': 'media'})
+built = time.perf_counter()
+print((imported - start) * 1000, (built - start) * 1000)
+"""
+
+
+def run_once():
+    out = subprocess.run([sys.executable, '-c', SNIPPET], cwd=ROOT, check=True,
+                         capture_output=True, text=True).stdout.split()
+    return float(out[0]), float(out[1])
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--target-ms', type=float, default=1000)
+    args = parser.parse_args()
+
+    results = [run_once() for _ in range(args.runs)]
+    import_ms = statistics.median(r[0] for r in results)
+    total_ms = statistics.median(r[1] for r in results)
+
+    print(f'import app:   {import_ms:8.1f} ms (median of {args.runs})')
+    print(f'create_app(): {total_ms:8.1f} ms (median of {args.runs})')
+    print(f'target:       {args.target_ms:8.1f} ms')
+
+    if total_ms > args.target_ms:
+        print('FAIL: cold start above target')
+        sys.exit(1)
+    print('OK')
+
+
+if __name__ == '__main__':
+    main()
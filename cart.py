@@ -1,15 +1,33 @@
-from flask import Blueprint, request, jsonify, session
+from flask import Blueprint, request, jsonify, session, current_app
 from flask_jwt_extended import get_jwt_identity, jwt_required
 from http_status_code import *
 import os
  
-from models import User, Product, Cart, CartItem, ProductImage
+from models import User, Product, Cart, CartItem, primary_images
 from models import db
-
+from fieldsets import Fieldset
+from sqlalchemy.orm import joinedload
+from utils import check_if_user_is_admin
+from cart_expiry import purge_expired_carts, purge_expired_carts_job, expiry_backlog, cleanup_metrics
+from jobs import last_result
+from touch_buffer import touch_buffer
+
+import click
+import time
 import uuid
 
 cart_bp = Blueprint('cart', __name__, url_prefix='/api/cart')
 
+CART_ITEM_FIELDS = Fieldset(CartItem, {
+    'product_id': 'product_id',
+    'product_name': lambda item, context: item.product.name,
+    'quantity': 'quantity',
+    'price': lambda item, context: item.product.price,
+    'avg_rating': lambda item, context: item.product.avg_rating,
+    'image': lambda item, context: context['images'].get(item.product_id),
+}, columns={'product_name': ['product_id'], 'price': ['product_id'], 'avg_rating': ['product_id'],
+            'image': ['product_id']}, name='cart_item')
+
 @cart_bp.post('/add')
 @jwt_required(optional=True)
 def add_to_cart():
@@ -157,26 +175,50 @@ def view_cart():
     if current_user:
         cart = Cart.query.filter_by(user_id=user.id).first_or_404()
     else:
-        # Non-authenticated user: use session_id
+        # Non-authenticated user: use session_id. Without one there is no cart to find,
+        # and minting one here would only hand out ids that never get a cart
         if 'session_id' not in session:
-            session['session_id'] = str(uuid.uuid4())
-        session_id = session['session_id']
-        cart = Cart.query.filter_by(session_id=session_id).first_or_404()
-    
-    cart_items = CartItem.query.filter_by(cart_id=cart.id).all()
-    cart_items_serializer = [
-        {
-            'product_id': item.product_id,
-            'product_name': item.product.name,
-            'quantity': item.quantity,
-            'price': item.product.price,
-            'avg_rating': item.product.avg_rating,
-            'image': ProductImage.query.filter_by(product_id=item.product_id).first().image_path
-        } for item in cart_items
-    ]
+            return jsonify({'error': 'Cart not found'}), HTTP_404_NOT_FOUND
+        cart = Cart.query.filter_by(session_id=session['session_id']).first_or_404()
+    # Viewing counts as activity for the anonymous cart expiry, without a write per view
+    touch_buffer.touch(Cart.updated_at, cart.id)
+
+    cart_items = CartItem.query.filter_by(cart_id=cart.id).options(joinedload(CartItem.product)).all()
+    images = primary_images(item.product_id for item in cart_items)
+    cart_items_serializer = CART_ITEM_FIELDS.serialize_many(cart_items, CART_ITEM_FIELDS.default, images=images)
 
     return jsonify({
         'cart_id': cart.id,
         'total_price': cart.total_price,
         'cart_items': cart_items_serializer if cart_items_serializer else "Your cart is empty."
     })
+
+
+@cart_bp.get('/expiry-metrics')
+@jwt_required()
+def get_expiry_metrics():
+    if not check_if_user_is_admin(get_jwt_identity()):
+        return jsonify({'detail': 'You dont have permission to perform this command.'}), HTTP_403_FORBIDDEN
+    return jsonify({
+        'ttl_seconds': current_app.config['ANONYMOUS_CART_TTL'],
+        'backlog': expiry_backlog(),
+        'cleanup': cleanup_metrics.snapshot(),  # Runs of `purge-expired` in this process
+        'last_scheduled_run': last_result(purge_expired_carts_job)
+    }), HTTP_200_OK
+
+
+@cart_bp.cli.command('purge-expired')
+@click.option('--batch-size', type=int, help='Carts per transaction; defaults to CART_CLEANUP_BATCH_SIZE.')
+@click.option('--max-batches', type=int, help='Stop after this many batches.')
+@click.option('--pause', default=0.05, show_default=True, help='Seconds to sleep between batches.')
+@click.option('--every', type=int, help='Keep running, once every this many seconds.')
+def purge_expired_command(batch_size, max_batches, pause, every):
+    """Delete anonymous carts (and their items) untouched for ANONYMOUS_CART_TTL seconds."""
+    batch_size = batch_size or current_app.config['CART_CLEANUP_BATCH_SIZE']
+    while True:
+        run = purge_expired_carts(batch_size, max_batches, pause)
+        click.echo(f"deleted {run['carts_deleted']} carts and {run['items_deleted']} items "
+                   f"in {run['batches']} batches, {run['seconds']}s")
+        if not every:
+            break
+        time.sleep(every)
@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+from flask import current_app
+
+from models import db, Cart, CartItem
+from jobs import periodic
+
+import threading
+import time
+
+CLEANUP_BATCH_SIZE = 500
+
+
+class CleanupMetrics:
+    """Counters for the expired-cart cleanup in this process, reported by `snapshot()`."""
+
+    def __init__(self):
+        self.runs = 0
+        self.carts_deleted = 0
+        self.items_deleted = 0
+        self.last_run = None
+        self._lock = threading.Lock()
+
+    def record(self, run):
+        with self._lock:
+            self.runs += 1
+            self.carts_deleted += run['carts_deleted']
+            self.items_deleted += run['items_deleted']
+            self.last_run = run
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'runs': self.runs,
+                'carts_deleted': self.carts_deleted,
+                'items_deleted': self.items_deleted,
+                'last_run': self.last_run,
+            }
+
+
+cleanup_metrics = CleanupMetrics()
+
+
+def expiry_cutoff(now=None):
+    return (now or datetime.utcnow()) - timedelta(seconds=current_app.config['ANONYMOUS_CART_TTL'])
+
+
+def _expired(cutoff):
+    return db.and_(Cart.user_id.is_(None), Cart.updated_at < cutoff)
+
+
+def purge_expired_carts(batch_size=CLEANUP_BATCH_SIZE, max_batches=None, pause=0.0):
+    """
+    Delete anonymous carts untouched for ANONYMOUS_CART_TTL seconds, and their items.
+
+    Works oldest first, in batches of `batch_size` carts, each in its own short
+    transaction, so no lock is held for longer than one batch. On PostgreSQL the batch is
+    claimed with FOR UPDATE SKIP LOCKED, so carts being written right now are skipped
+    rather than waited on; the expiry condition is re-checked in the DELETE, so a cart
+    touched after it was selected survives. Returns the run's metrics, which are also recorded in
+    `cleanup_metrics`.
+    """
+    started_at = datetime.utcnow()
+    start = time.perf_counter()
+    cutoff = expiry_cutoff(started_at)
+    run = {'carts_deleted': 0, 'items_deleted': 0, 'batches': 0}
+
+    while max_batches is None or run['batches'] < max_batches:
+        ids = [id for id, in db.session.query(Cart.id).filter(_expired(cutoff))
+                                       .order_by(Cart.user_id, Cart.updated_at).limit(batch_size)
+                                       .with_for_update(skip_locked=True)]
+        if not ids:
+            db.session.rollback()
+            break
+        expired_ids = db.select(Cart.id).where(Cart.id.in_(ids), _expired(cutoff))
+        items = db.session.execute(CartItem.__table__.delete().where(CartItem.cart_id.in_(expired_ids)))
+        carts = db.session.execute(Cart.__table__.delete().where(Cart.id.in_(ids), _expired(cutoff)))
+        db.session.commit()
+        run['carts_deleted'] += carts.rowcount
+        run['items_deleted'] += items.rowcount
+        run['batches'] += 1
+        if len(ids) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)  # Let other writers in between batches
+
+    run['started_at'] = started_at.isoformat()
+    run['seconds'] = round(time.perf_counter() - start, 3)
+    cleanup_metrics.record(run)
+    current_app.logger.info('Expired cart cleanup: %(carts_deleted)d carts, %(items_deleted)d items '
+                            'in %(batches)d batches, %(seconds).3fs', run)
+    return run
+
+
+@periodic('CART_CLEANUP_INTERVAL', queue='maintenance')
+def purge_expired_carts_job():
+    return purge_expired_carts(current_app.config['CART_CLEANUP_BATCH_SIZE'], pause=0.05)
+
+
+def expiry_backlog():
+    """Anonymous carts in total and how many of them are already past the TTL (both index scans)."""
+    return {
+        'anonymous_carts': db.session.query(Cart.id).filter(Cart.user_id.is_(None)).count(),
+        'expired_carts': db.session.query(Cart.id).filter(_expired(expiry_cutoff())).count(),
+    }
@@ -0,0 +1,77 @@
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+import threading
+import time
+
+
+class CatalogCache:
+    """
+    Small per-process cache for read-mostly catalog payloads (products, categories).
+
+    Entries expire after `ttl` seconds, which bounds how stale another worker's copy
+    can get. Writes in this process drop the whole cache in one step through
+    `invalidate()`, called automatically after a commit that touched catalog rows.
+    """
+
+    def __init__(self, ttl=30, max_entries=10000):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            self._entries.pop(key, None)
+            return None
+        return value
+
+    def get_many(self, keys):
+        found = {}
+        for key in keys:
+            value = self.get(key)
+            if value is not None:
+                found[key] = value
+        return found
+
+    def set(self, key, value):
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                # Cheap bound on memory: start over rather than tracking recency
+                self._entries.clear()
+            self._entries[key] = (time.monotonic() + self.ttl, value)
+
+    def invalidate(self):
+        with self._lock:
+            self._entries.clear()
+
+
+catalog_cache = CatalogCache()
+
+
+def init_app(app):
+    catalog_cache.ttl = app.config['CATALOG_CACHE_TTL']
+    catalog_cache.max_entries = app.config['CATALOG_CACHE_MAX_ENTRIES']
+
+
+@event.listens_for(Session, 'before_flush')
+def _track_catalog_changes(session, flush_context, instances):
+    from models import Product, ProductImage, Category
+    catalog_models = (Product, ProductImage, Category)
+    if any(isinstance(obj, catalog_models) for obj in (*session.new, *session.dirty, *session.deleted)):
+        session.info['catalog_changed'] = True
+
+
+@event.listens_for(Session, 'after_commit')
+def _invalidate_after_commit(session):
+    if session.info.pop('catalog_changed', False):
+        catalog_cache.invalidate()
+
+
+@event.listens_for(Session, 'after_rollback')
+def _reset_after_rollback(session):
+    session.info.pop('catalog_changed', None)
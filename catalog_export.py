@@ -0,0 +1,118 @@
+from sqlalchemy import func, select
+from xml.sax.saxutils import escape
+
+from models import db, Product, ProductImage
+
+import csv
+import io
+import json
+import zlib
+
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FIELDS = ('id', 'sku', 'name', 'description', 'price', 'quantity', 'category', 'brand',
+                 'rating', 'image', 'link', 'updated_at')
+
+EXPORT_MIMETYPES = {
+    'ndjson': 'application/x-ndjson',
+    'csv': 'text/csv',
+    'xml': 'application/xml',
+}
+
+
+def export_rows(base_url, since=None, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Yield one dict per product, read through a server-side cursor in `batch_size` chunks.
+
+    Args:
+        base_url: Used to build each product's link.
+        since: Optional datetime; only products created or updated at or after it are exported.
+    """
+    primary_image = select(ProductImage.image_path) \
+        .where(ProductImage.product_id == Product.id) \
+        .order_by(ProductImage.id) \
+        .limit(1) \
+        .correlate(Product) \
+        .scalar_subquery()
+    changed_at = func.coalesce(Product.updated_at, Product.created_at)
+
+    statement = select(Product.id, Product.sku, Product.name, Product.description, Product.price,
+                       Product.quantity, Product.category, Product.brand, Product.avg_rating,
+                       primary_image.label('image'), changed_at.label('changed_at')) \
+        .order_by(Product.id) \
+        .execution_options(yield_per=batch_size)
+    if since is not None:
+        statement = statement.where(changed_at >= since)
+
+    for row in db.session.execute(statement):
+        yield {
+            'id': row.id,
+            'sku': row.sku,
+            'name': row.name,
+            'description': row.description or '',
+            'price': f'{row.price:.2f}',
+            'quantity': row.quantity,
+            'category': row.category,
+            'brand': row.brand or '',
+            'rating': float(row.avg_rating or 0),
+            'image': row.image,
+            'link': f'{base_url}api/product/get-product/{row.id}',
+            'updated_at': row.changed_at.isoformat() if row.changed_at else None,
+        }
+
+
+def to_ndjson(rows):
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+def to_csv(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def to_google_shopping_xml(rows, title='Product feed', link=''):
+    yield ('<?xml version="1.0" encoding="UTF-8"?>\n'
+           '<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n<channel>\n'
+           f'<title>{escape(title)}</title>\n<link>{escape(link)}</link>\n')
+    for row in rows:
+        yield ('<item>'
+               f'<g:id>{escape(row["sku"] or str(row["id"]))}</g:id>'
+               f'<title>{escape(row["name"])}</title>'
+               f'<description>{escape(row["description"])}</description>'
+               f'<link>{escape(row["link"])}</link>'
+               + (f'<g:image_link>{escape(row["image"])}</g:image_link>' if row['image'] else '') +
+               f'<g:price>{row["price"]} USD</g:price>'
+               f'<g:availability>{"in stock" if row["quantity"] > 0 else "out of stock"}</g:availability>'
+               f'<g:brand>{escape(row["brand"])}</g:brand>'
+               f'<g:product_type>{escape(row["category"])}</g:product_type>'
+               '</item>\n')
+    yield '</channel>\n</rss>\n'
+
+
+def gzip_stream(chunks, level=6):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip container
+    for chunk in chunks:
+        data = compressor.compress(chunk.encode('utf-8'))
+        if data:
+            yield data
+    yield compressor.flush()
+
+
+def export_catalog(fmt, base_url, since=None, gzip=False):
+    """Return an iterator over the encoded feed (str chunks, or bytes when gzipped)."""
+    rows = export_rows(base_url, since)
+    if fmt == 'csv':
+        chunks = to_csv(rows)
+    elif fmt == 'xml':
+        chunks = to_google_shopping_xml(rows, link=base_url)
+    else:
+        chunks = to_ndjson(rows)
+    return gzip_stream(chunks) if gzip else chunks
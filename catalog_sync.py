@@ -0,0 +1,107 @@
+from datetime import datetime
+from decimal import Decimal, InvalidOperation
+from sqlalchemy import Integer, Numeric, bindparam, cast, column, func, values
+
+from models import db, Product, Category, ProductView
+from catalog_cache import catalog_cache
+
+SYNC_CHUNK_SIZE = 1000
+
+
+def _chunks(items, size=SYNC_CHUNK_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def _parse_update(update):
+    if not isinstance(update, dict) or not ({'quantity', 'price'} & update.keys()):
+        raise ValueError('expected an object with quantity and/or price')
+    quantity = update.get('quantity')
+    price = update.get('price')
+    try:
+        quantity = int(quantity) if quantity is not None else None
+        price = Decimal(str(price)).quantize(Decimal('0.01')) if price is not None else None
+    except (InvalidOperation, TypeError, ValueError):
+        raise ValueError('quantity and price must be numbers')
+    if (quantity is not None and quantity < 0) or (price is not None and price < 0):
+        raise ValueError('quantity and price must not be negative')
+    return quantity, price
+
+
+def _apply_updates(rows):
+    """Apply (id, quantity, price) rows with set-based UPDATEs; None keeps the current value."""
+    table = Product.__table__
+    now = datetime.utcnow()
+    if db.engine.dialect.name == 'postgresql':
+        # UPDATE product SET ... FROM (VALUES ...) AS v (id, quantity, price) WHERE product.id = v.id
+        for chunk in _chunks(rows):
+            v = values(column('id', Integer), column('quantity', Integer), column('price', Numeric(10, 2)),
+                       name='v').data(chunk)
+            db.session.execute(table.update().where(table.c.id == v.c.id).values(
+                quantity=func.coalesce(cast(v.c.quantity, Integer), table.c.quantity),
+                price=func.coalesce(cast(v.c.price, Numeric(10, 2)), table.c.price),
+                updated_at=now))
+        return
+
+    # Databases without UPDATE ... FROM (VALUES): one prepared statement, executemany
+    statement = table.update().where(table.c.id == bindparam('_id')).values(
+        quantity=func.coalesce(bindparam('_quantity', type_=Integer), table.c.quantity),
+        price=func.coalesce(bindparam('_price', type_=Numeric(10, 2)), table.c.price),
+        updated_at=now)
+    for chunk in _chunks(rows):
+        db.session.execute(statement, [{'_id': id, '_quantity': quantity, '_price': price}
+                                       for id, quantity, price in chunk])
+
+
+def sync_products(updates, key='id'):
+    """
+    Apply a batch of stock/price updates in one transaction.
+
+    Args:
+        updates: {id or sku: {'quantity': int, 'price': number}}; either field may be omitted.
+        key: 'id' or 'sku', what the keys of `updates` refer to.
+
+    Returns a dict with a per-item status ('updated', 'not_found' or 'invalid') and totals.
+    """
+    results = {}
+    parsed = {}
+    for item_key, update in updates.items():
+        if key == 'id' and not str(item_key).isdigit():
+            results[item_key] = {'status': 'invalid', 'error': 'id must be an integer'}
+            continue
+        try:
+            lookup = int(item_key) if key == 'id' else str(item_key)
+            parsed[lookup] = (item_key, *_parse_update(update))
+        except ValueError as e:
+            results[item_key] = {'status': 'invalid', 'error': str(e)}
+
+    key_column = Product.id if key == 'id' else Product.sku
+    found = {}
+    for chunk in _chunks(list(parsed)):
+        for row in db.session.query(key_column, Product.id, Product.category_slug).filter(key_column.in_(chunk)):
+            found[row[0]] = (row.id, row.category_slug)
+
+    rows = []
+    for lookup, (item_key, quantity, price) in parsed.items():
+        if lookup not in found:
+            results[item_key] = {'status': 'not_found'}
+            continue
+        rows.append((found[lookup][0], quantity, price))
+        results[item_key] = {'status': 'updated'}
+
+    if rows:
+        _apply_updates(rows)
+        # In-stock counts and price ranges may have moved; the UPDATEs bypassed the ORM
+        Category.rebuild({category_slug for _, category_slug in found.values()})
+        for chunk in _chunks([row[0] for row in rows]):
+            ProductView.refresh(chunk)
+        db.session.commit()
+        catalog_cache.invalidate()
+
+    statuses = [result['status'] for result in results.values()]
+    return {
+        'results': results,
+        'updated': statuses.count('updated'),
+        'not_found': statuses.count('not_found'),
+        'invalid': statuses.count('invalid'),
+    }
@@ -0,0 +1,51 @@
+from flask import current_app
+
+from models import Cart, CartItem, db, Order, OrderItem, PaymentStatus, primary_images
+from analytics import record_order_paid
+from recommendations import record_order as record_order_cooccurrence
+from autocomplete import autocomplete_index
+from utils import send_email
+
+
+def finalize_order(order_id):
+    """
+    Turn the buyer's cart into the paid order's items: stock, cart, rollups and email.
+
+    The order row is locked for the transaction (FOR UPDATE on PostgreSQL), so the
+    webhook worker and a client calling after-payment can't both finalize it. Returns the
+    order, or None when it was already paid.
+    """
+    order = Order.query.filter_by(id=order_id).with_for_update().one()
+    if order.payment_status == PaymentStatus.PAID:
+        db.session.rollback()
+        return None
+
+    cart = Cart.query.filter_by(user_id=order.user_id).first() if order.user_id \
+        else Cart.query.filter_by(session_id=order.session_id).first()
+    cart_items = CartItem.query.filter_by(cart_id=cart.id).all() if cart else []
+    if cart is None:
+        current_app.logger.warning('Order %s was paid but its cart is gone', order.order_number)
+    images = primary_images(item.product_id for item in cart_items)
+    order_items = []
+    for item in cart_items:
+        order_item = OrderItem(
+            name=item.product.name,
+            order_id=order.id,
+            product_id=item.product.id,
+            quantity=item.quantity,
+            price=item.product.price * item.quantity,
+            image_url=images.get(item.product_id)
+        )
+        item.product.quantity -= item.quantity
+        cart.total_price -= item.product.price * item.quantity
+        db.session.add(order_item)
+        order_items.append(order_item)
+        db.session.delete(item)
+    order.payment_status = PaymentStatus.PAID
+    record_order_paid(order, order_items)
+    record_order_cooccurrence(order_items)
+    send_email.delay(to=order.email, subject="Order", body=f'Your order is being processed we will update you on it. your order number is {order.order_number}')
+    db.session.commit()
+    for order_item in order_items:
+        autocomplete_index.bump(order_item.product_id, order_item.quantity)
+    return order
@@ -0,0 +1,190 @@
+from flask import request
+
+import time
+import zlib
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Bodies of these types are already compressed; compressing them again only costs CPU
+COMPRESSED_MIMETYPES = ('image/', 'video/', 'audio/', 'application/zip', 'application/gzip',
+                        'application/x-gzip', 'application/zstd', 'application/pdf', 'font/woff')
+
+
+class GzipEncoder:
+    name = 'gzip'
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 31)  # wbits=31: gzip container
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        # Sync flush: everything so far can be decoded, and the stream stays open
+        return self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+class BrotliEncoder:
+    name = 'br'
+
+    def __init__(self, level):
+        self._compressor = brotli.Compressor(quality=level)
+
+    def compress(self, data):
+        return self._compressor.process(data)
+
+    def flush(self):
+        return self._compressor.flush()
+
+    def finish(self):
+        return self._compressor.finish()
+
+
+class ZstdEncoder:
+    name = 'zstd'
+
+    def __init__(self, level):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data):
+        return self._compressor.compress(data)
+
+    def flush(self):
+        return self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+ENCODERS = {'gzip': GzipEncoder}
+if brotli is not None:
+    ENCODERS['br'] = BrotliEncoder
+if zstandard is not None:
+    ENCODERS['zstd'] = ZstdEncoder
+
+
+def choose_encoding(accept_encodings, preferred):
+    """Pick the first of `preferred` that is available here and that the client accepts (q > 0)."""
+    for name in preferred:
+        if name in ENCODERS and accept_encodings.quality(name) > 0:
+            return name
+    return None
+
+
+def compress_stream(chunks, encoder, buffer_size=16384, max_delay=1.0, flush_each_chunk=False):
+    """
+    Compress a streamed body chunk by chunk.
+
+    A flush ends the current compressed block, so flushing after every small chunk
+    costs most of the compression. Output is flushed once `buffer_size` bytes have gone
+    in since the last flush, or when a chunk arrives more than `max_delay` seconds after
+    it, so a slow stream is not held back for long. Streams whose every chunk must reach
+    the client at once (see `flush_each_chunk()`) are flushed after each one.
+    """
+    pending = 0
+    flushed_at = time.monotonic()
+    try:
+        for chunk in chunks:
+            if isinstance(chunk, str):
+                chunk = chunk.encode('utf-8')
+            data = encoder.compress(chunk)
+            pending += len(chunk)
+            if flush_each_chunk or pending >= buffer_size or time.monotonic() - flushed_at >= max_delay:
+                data += encoder.flush()
+                pending = 0
+                flushed_at = time.monotonic()
+            if data:
+                yield data
+        yield encoder.finish()
+    finally:
+        if hasattr(chunks, 'close'):
+            chunks.close()
+
+
+def flush_each_chunk(response):
+    """Mark a streamed response, e.g. a progress feed, whose chunks must not wait in the compressor."""
+    response.compress_flush_each_chunk = True
+    return response
+
+
+class Compressor:
+    """
+    Response compression negotiated on Accept-Encoding: brotli or zstd when the
+    library is installed, gzip otherwise.
+
+    Buffered responses smaller than COMPRESS_MIN_SIZE, already compressed media, files
+    sent with `send_from_directory` and responses that already have a Content-Encoding
+    are left alone. Streamed responses are compressed as they are sent.
+
+    Config:
+        COMPRESS_ALGORITHMS: Server preference order, e.g. "br,zstd,gzip".
+        COMPRESS_LEVEL: gzip level (1-9); higher trades CPU for bandwidth.
+        COMPRESS_BROTLI_QUALITY: brotli quality (0-11).
+        COMPRESS_ZSTD_LEVEL: zstd level (1-22).
+        COMPRESS_MIN_SIZE: Smallest buffered body, in bytes, worth compressing.
+        COMPRESS_STREAM_BUFFER_SIZE: Bytes of a streamed body compressed between flushes.
+        COMPRESS_STREAM_MAX_DELAY: Seconds after which a streamed body is flushed anyway.
+    """
+
+    def init_app(self, app):
+        self.preferred = [name.strip() for name in app.config['COMPRESS_ALGORITHMS'].split(',') if name.strip()]
+        self.levels = {'gzip': app.config['COMPRESS_LEVEL'],
+                       'br': app.config['COMPRESS_BROTLI_QUALITY'],
+                       'zstd': app.config['COMPRESS_ZSTD_LEVEL']}
+        self.min_size = app.config['COMPRESS_MIN_SIZE']
+        self.stream_buffer_size = app.config['COMPRESS_STREAM_BUFFER_SIZE']
+        self.stream_max_delay = app.config['COMPRESS_STREAM_MAX_DELAY']
+        app.after_request(self.after_request)
+
+    def _compressible(self, response):
+        if response.status_code < 200 or response.status_code in (204, 206, 304):
+            return False
+        if request.method == 'HEAD' or response.direct_passthrough:
+            return False
+        if 'Content-Encoding' in response.headers:
+            return False
+        return not (response.mimetype or '').startswith(COMPRESSED_MIMETYPES)
+
+    def after_request(self, response):
+        if not self._compressible(response):
+            return response
+        response.vary.add('Accept-Encoding')
+
+        encoding = choose_encoding(request.accept_encodings, self.preferred)
+        if encoding is None:
+            return response
+        encoder = ENCODERS[encoding](self.levels[encoding])
+
+        if response.is_streamed:
+            response.response = compress_stream(response.response, encoder, self.stream_buffer_size, self.stream_max_delay,
+                                                getattr(response, 'compress_flush_each_chunk', False))
+            response.headers.pop('Content-Length', None)
+        else:
+            data = response.get_data()
+            if len(data) < self.min_size:
+                return response
+            response.set_data(encoder.compress(data) + encoder.finish())
+
+        response.headers['Content-Encoding'] = encoding
+        if response.headers.get('ETag'):
+            # Different bytes than the identity body, so the validator can only be weak
+            response.headers['ETag'] = 'W/' + response.headers['ETag'].removeprefix('W/')
+        return response
+
+
+compressor = Compressor()
+
+
+def init_app(app):
+    compressor.init_app(app)
@@ -0,0 +1,98 @@
+from dotenv import load_dotenv
+from datetime import timedelta
+import os
+
+# Load environment variables from the .env file (once, for the whole app)
+load_dotenv()
+
+
+class Config:
+    # CONNECT TO DB
+    SQLALCHEMY_DATABASE_URI = os.getenv('SQLALCHEMY_DATABASE_URI')
+    SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Connection pool per process; gunicorn.conf.py sets defaults to match the worker class.
+    # Ignored for SQLite
+    DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.getenv('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 10))  # Seconds a request waits for a free connection
+    DB_POOL_RECYCLE = int(os.getenv('DB_POOL_RECYCLE', 1800))
+
+    SECRET_KEY = os.getenv('SECRET_KEY')
+    UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER')
+
+    JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
+    JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=3)
+
+    PERMANENT_SESSION_LIFETIME = timedelta(days=1)  # Optional
+
+    # Configuration for Flask-Mail
+    MAIL_SERVER = os.getenv('EMAIL_HOST')
+    MAIL_PORT = os.getenv('EMAIL_PORT')
+    MAIL_USERNAME = os.getenv('EMAIL_HOST_USER')
+    MAIL_USE_TLS = os.getenv('EMAIL_USE_TLS')
+    MAIL_PASSWORD = os.getenv('EMAIL_HOST_PASSWORD')
+
+    # Catalog
+    CATALOG_CACHE_TTL = int(os.getenv('CATALOG_CACHE_TTL', 30))  # Seconds another worker's copy may lag behind
+    CATALOG_CACHE_MAX_ENTRIES = int(os.getenv('CATALOG_CACHE_MAX_ENTRIES', 10000))
+    BULK_SYNC_MAX_ITEMS = int(os.getenv('BULK_SYNC_MAX_ITEMS', 10000))
+    AUTOCOMPLETE_MAX_PRODUCTS = int(os.getenv('AUTOCOMPLETE_MAX_PRODUCTS', 200000))
+    AUTOCOMPLETE_REFRESH_SECONDS = int(os.getenv('AUTOCOMPLETE_REFRESH_SECONDS', 300))
+
+    # Anonymous carts untouched for this long are deleted by `flask cart purge-expired`
+    ANONYMOUS_CART_TTL = int(os.getenv('ANONYMOUS_CART_TTL', 7 * 24 * 3600))  # Seconds
+    CART_CLEANUP_BATCH_SIZE = int(os.getenv('CART_CLEANUP_BATCH_SIZE', 500))
+
+    # Idempotency-Key handling on the order endpoints (seconds)
+    IDEMPOTENCY_TTL = int(os.getenv('IDEMPOTENCY_TTL', 24 * 3600))  # How long responses are replayed
+    IDEMPOTENCY_WAIT = float(os.getenv('IDEMPOTENCY_WAIT', 10))  # How long a duplicate waits for the first request
+    IDEMPOTENCY_LOCK_TIMEOUT = int(os.getenv('IDEMPOTENCY_LOCK_TIMEOUT', 60))  # After this, an unfinished request is presumed dead
+
+    # Password hashing, done in a process pool per web worker (0 workers: on the request thread)
+    PASSWORD_HASH_METHOD = os.getenv('PASSWORD_HASH_METHOD', 'scrypt')  # Werkzeug method, e.g. 'scrypt:16384:8:1' or 'pbkdf2:sha256:600000'
+    PASSWORD_SALT_LENGTH = int(os.getenv('PASSWORD_SALT_LENGTH', 16))  # Changing either rehashes passwords at next login
+    PASSWORD_HASH_WORKERS = int(os.getenv('PASSWORD_HASH_WORKERS', 0))  # Hashing processes per web worker; 0 hashes inline. gunicorn.conf.py sizes it
+    PASSWORD_HASH_MAX_PENDING = int(os.getenv('PASSWORD_HASH_MAX_PENDING', 16))  # Queued or running hashes per web worker
+    PASSWORD_HASH_WAIT = float(os.getenv('PASSWORD_HASH_WAIT', 2))  # Seconds to wait for a queue slot before a 503
+
+    # Write-behind buffer for User.last_login and Cart.updated_at touches
+    TOUCH_FLUSH_INTERVAL = float(os.getenv('TOUCH_FLUSH_INTERVAL', 5))  # Seconds a touch may lag; 0 writes through
+    TOUCH_MAX_PENDING = int(os.getenv('TOUCH_MAX_PENDING', 10000))  # Rows buffered before an early flush
+
+    # Background jobs, run by `flask jobs work`
+    JOB_QUEUES = os.getenv('JOB_QUEUES', 'default:2,email:2,payments:2,maintenance:1')  # Threads per queue, per worker process
+    JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 1))  # Seconds a worker thread waits when its queue is empty
+    JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 5))
+    JOB_TIMEOUT = int(os.getenv('JOB_TIMEOUT', 300))  # Seconds before a running job is presumed dead and run again
+    JOB_RETRY_BACKOFF = int(os.getenv('JOB_RETRY_BACKOFF', 10))  # Seconds before the first retry, doubled on each one
+    JOB_RETRY_BACKOFF_MAX = int(os.getenv('JOB_RETRY_BACKOFF_MAX', 3600))
+    JOB_RETENTION = int(os.getenv('JOB_RETENTION', 7 * 24 * 3600))  # Seconds finished jobs are kept
+    JOB_PURGE_INTERVAL = int(os.getenv('JOB_PURGE_INTERVAL', 3600))
+    CART_CLEANUP_INTERVAL = int(os.getenv('CART_CLEANUP_INTERVAL', 600))
+    IDEMPOTENCY_PURGE_INTERVAL = int(os.getenv('IDEMPOTENCY_PURGE_INTERVAL', 3600))
+
+    # Response compression
+    COMPRESS_ALGORITHMS = os.getenv('COMPRESS_ALGORITHMS', 'br,zstd,gzip')  # Preference order; br/zstd need brotli/zstandard
+    COMPRESS_LEVEL = int(os.getenv('COMPRESS_LEVEL', 6))  # gzip, 1 (fast) - 9 (small)
+    COMPRESS_BROTLI_QUALITY = int(os.getenv('COMPRESS_BROTLI_QUALITY', 4))
+    COMPRESS_ZSTD_LEVEL = int(os.getenv('COMPRESS_ZSTD_LEVEL', 3))
+    COMPRESS_MIN_SIZE = int(os.getenv('COMPRESS_MIN_SIZE', 1024))  # Bytes; smaller buffered bodies are sent as is
+    COMPRESS_STREAM_BUFFER_SIZE = int(os.getenv('COMPRESS_STREAM_BUFFER_SIZE', 16384))  # Bytes between flushes of a streamed body
+    COMPRESS_STREAM_MAX_DELAY = float(os.getenv('COMPRESS_STREAM_MAX_DELAY', 1.0))  # Seconds a streamed chunk may wait for a flush
+
+    # PayPal
+    PAYMENT_MODE = os.getenv('PAYMENT_MODE')
+    PAYPAL_CLIENT_ID = os.getenv('PAYPAL_CLIENT_ID')
+    PAYPAL_SECRET_KEY = os.getenv('PAYPAL_SECRET_KEY')
+    PAYPAL_API_BASE = os.getenv('PAYPAL_API_BASE')  # Overrides PAYMENT_MODE, e.g. the local mock server
+    PAYPAL_CONNECT_TIMEOUT = float(os.getenv('PAYPAL_CONNECT_TIMEOUT', 3.05))
+    PAYPAL_READ_TIMEOUT = float(os.getenv('PAYPAL_READ_TIMEOUT', 10))
+    PAYPAL_POOL_SIZE = int(os.getenv('PAYPAL_POOL_SIZE', 10))
+    PAYPAL_BACKGROUND_WORKERS = int(os.getenv('PAYPAL_BACKGROUND_WORKERS', 4))
+    # Execute approved payments in the background and answer execute-payment with 202
+    PAYPAL_ASYNC_EXECUTE = os.getenv('PAYPAL_ASYNC_EXECUTE', '').lower() in ('1', 'true', 'yes')
+    # With a webhook id set, orders are finalized by the payment worker from verified webhook
+    # events, and after-payment only reports the order's payment status
+    PAYPAL_WEBHOOK_ID = os.getenv('PAYPAL_WEBHOOK_ID')
+    PAYMENT_EVENT_MAX_ATTEMPTS = int(os.getenv('PAYMENT_EVENT_MAX_ATTEMPTS', 5))
+    PAYMENT_EVENT_SWEEP_INTERVAL = int(os.getenv('PAYMENT_EVENT_SWEEP_INTERVAL', 60))
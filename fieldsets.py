@@ -0,0 +1,85 @@
+from operator import attrgetter
+from sqlalchemy.orm import load_only
+
+# Every named Fieldset, e.g. registry['product'], so each model's serializers are defined once
+registry = {}
+
+
+class Fieldset:
+    """
+    The fields an endpoint can return, and how to load and serialize them.
+
+    Each field maps to either a column attribute name on `model` (loaded with `load_only`,
+    so unrequested columns never leave the database) or to a callable `(obj, context)`
+    for computed values such as images. `columns` lists what a computed field needs loaded.
+    A fieldset with `model` None only serializes rows a view selected itself, e.g. joined
+    columns; it has no `load_options`.
+
+    Serializers are built once per field selection from `attrgetter`s and the computed
+    fields' callables, and cached. Values are returned as they are (Decimal, datetime,
+    Enum); the JSON provider encodes them.
+
+    Usage:
+        fields = PRODUCT_FIELDS.select(request.args.get('fields'))
+        query = query.options(PRODUCT_FIELDS.load_options(fields))
+        PRODUCT_FIELDS.serialize_many(query, fields, images=images)
+    """
+
+    def __init__(self, model, fields, default=None, columns=None, name=None):
+        if model is not None:
+            unknown = [spec for spec in fields.values() if isinstance(spec, str) and not hasattr(model, spec)]
+            if unknown:
+                raise ValueError(f'{model.__name__} has no columns {", ".join(unknown)}')
+        self.model = model
+        self.fields = fields
+        self.default = tuple(default or fields)
+        self.columns = columns or {}
+        self._compiled = {}
+        if name is not None:
+            registry[name] = self
+
+    def select(self, raw):
+        """Parse a `fields=a,b` query value; None or empty means the default fields."""
+        if not raw:
+            return self.default
+        names = tuple(dict.fromkeys(name.strip() for name in raw.split(',') if name.strip()))
+        unknown = [name for name in names if name not in self.fields]
+        if unknown:
+            raise ValueError(f'Unknown fields: {", ".join(unknown)}. Available: {", ".join(self.fields)}')
+        return names
+
+    def column_names(self, names):
+        columns = []
+        for name in names:
+            spec = self.fields[name]
+            columns.extend([spec] if isinstance(spec, str) else self.columns.get(name, ()))
+        return list(dict.fromkeys(columns))
+
+    def load_options(self, names):
+        # The primary key is always loaded by load_only, which needs at least one column;
+        # a selection of computed fields only (e.g. images) loads just the primary key
+        if self.model is None:
+            raise TypeError('A fieldset without a model only serializes rows; select the columns in the query')
+        columns = self.column_names(names) or ['id']
+        return load_only(*(getattr(self.model, column) for column in columns))
+
+    def compile(self, names):
+        """Return a `(obj, context) -> dict` function for these fields, built once and cached."""
+        names = tuple(names)
+        serializer = self._compiled.get(names)
+        if serializer is None:
+            getters = tuple((name, attrgetter(spec), False) if isinstance(spec, str) else (name, spec, True)
+                            for name, spec in ((name, self.fields[name]) for name in names))
+
+            def serializer(obj, context):
+                return {name: get(obj, context) if computed else get(obj) for name, get, computed in getters}
+
+            self._compiled[names] = serializer
+        return serializer
+
+    def serialize(self, obj, names, **context):
+        return self.compile(names)(obj, context)
+
+    def serialize_many(self, objs, names, **context):
+        serializer = self.compile(names)
+        return [serializer(obj, context) for obj in objs]
@@ -0,0 +1,58 @@
+"""
+Gunicorn settings, picked by GUNICORN_WORKER_CLASS:
+
+    sync    One request per process at a time. Fine when every request is short.
+    gthread GUNICORN_THREADS requests per process.
+    gevent  Up to GUNICORN_WORKER_CONNECTIONS requests per process as greenlets. Use it when
+            requests spend their time waiting on PayPal, Google or the database. Needs
+            gevent, plus psycogreen on PostgreSQL.
+
+Each process holds at most DB_POOL_SIZE + DB_MAX_OVERFLOW database connections, and
+requests beyond that wait up to DB_POOL_TIMEOUT seconds for one. Defaults are set here
+to suit each worker class. Keep GUNICORN_WORKERS x (DB_POOL_SIZE + DB_MAX_OVERFLOW),
+plus the job workers, below the database's max_connections.
+
+PASSWORD_HASH_WORKERS defaults to 0 under sync: the process has nothing else to run while
+it hashes, and the processes already fill the cores. Under gthread and gevent a hash on the
+request thread would stall every other request of the process, so each process gets a
+hashing pool, with the cores split between the processes' pools.
+"""
+import multiprocessing
+import os
+
+worker_class = os.getenv('GUNICORN_WORKER_CLASS', 'sync')
+workers = int(os.getenv('GUNICORN_WORKERS', os.getenv('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1)))
+hash_workers = max(multiprocessing.cpu_count() // workers, 1)
+bind = os.getenv('GUNICORN_BIND', f"0.0.0.0:{os.getenv('PORT', '8000')}")
+timeout = int(os.getenv('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.getenv('GUNICORN_GRACEFUL_TIMEOUT', 30))
+keepalive = int(os.getenv('GUNICORN_KEEPALIVE', 5))
+max_requests = int(os.getenv('GUNICORN_MAX_REQUESTS', 0))
+max_requests_jitter = int(os.getenv('GUNICORN_MAX_REQUESTS_JITTER', 0))
+accesslog = os.getenv('GUNICORN_ACCESS_LOG')
+
+if worker_class == 'gthread':
+    threads = int(os.getenv('GUNICORN_THREADS', 8))
+    os.environ.setdefault('DB_POOL_SIZE', str(threads))
+    os.environ.setdefault('DB_MAX_OVERFLOW', '0')
+    os.environ.setdefault('PASSWORD_HASH_WORKERS', str(hash_workers))
+elif worker_class == 'gevent':
+    worker_connections = int(os.getenv('GUNICORN_WORKER_CONNECTIONS', 1000))
+    # Most greenlets are waiting on other services, not holding a connection; the rest queue for one
+    os.environ.setdefault('DB_POOL_SIZE', '20')
+    os.environ.setdefault('DB_MAX_OVERFLOW', '10')
+    os.environ.setdefault('PASSWORD_HASH_WORKERS', str(hash_workers))
+else:
+    os.environ.setdefault('DB_POOL_SIZE', '1')
+    os.environ.setdefault('DB_MAX_OVERFLOW', '1')
+    os.environ.setdefault('PASSWORD_HASH_WORKERS', '0')
+
+
+def post_fork(server, worker):
+    if worker_class == 'gevent':
+        try:
+            from psycogreen.gevent import patch_psycopg
+        except ImportError:
+            server.log.warning('psycogreen is not installed: PostgreSQL queries will block the whole gevent worker')
+        else:
+            patch_psycopg()
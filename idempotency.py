@@ -0,0 +1,152 @@
+from datetime import datetime, timedelta
+from functools import wraps
+from flask import current_app, jsonify, request, session
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy.exc import IntegrityError
+
+from http_status_code import *
+from models import db, IdempotencyKey
+from jobs import periodic
+
+import hashlib
+import time
+
+MAX_KEY_LENGTH = 255
+POLL_INTERVAL = 0.1  # Seconds between checks while a duplicate waits for the first request
+
+
+def request_fingerprint():
+    digest = hashlib.sha256()
+    for part in (request.method, request.path, request.query_string, request.get_data()):
+        digest.update(part if isinstance(part, bytes) else part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+def _replay(row):
+    response = current_app.response_class(row.response_body, status=row.response_status,
+                                          mimetype=row.response_mimetype)
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _claim(scope, key, fingerprint):
+    """
+    Take ownership of (scope, key), or settle the request from an earlier one.
+
+    Returns (row id, None) when this request owns the key and must run, or
+    (None, response) when it must not: a replayed response, a 422 for a key reused with a
+    different request, or a 409 when the first request is still running after the wait.
+    """
+    table = IdempotencyKey.__table__
+    config = current_app.config
+    deadline = time.monotonic() + config['IDEMPOTENCY_WAIT']
+    while True:
+        now = datetime.utcnow()
+        try:
+            result = db.session.execute(table.insert().values(
+                scope=scope, key=key, fingerprint=fingerprint, locked_at=now, created_at=now,
+                expires_at=now + timedelta(seconds=config['IDEMPOTENCY_TTL'])))
+            db.session.commit()
+            return result.inserted_primary_key[0], None
+        except IntegrityError:
+            db.session.rollback()
+
+        row = db.session.execute(db.select(table).where(table.c.scope == scope, table.c.key == key)).first()
+        if row is None:
+            continue  # Purged in the meantime
+        if row.expires_at <= now:
+            db.session.execute(table.delete().where(table.c.id == row.id, table.c.expires_at <= now))
+            db.session.commit()
+            continue
+        if row.fingerprint != fingerprint:
+            return None, (jsonify({'error': 'Idempotency-Key was already used for a different request'}),
+                          HTTP_422_UNPROCESSABLE_ENTITY)
+        if row.response_status is not None:
+            return None, _replay(row)
+
+        # Still running. A lock older than the timeout belongs to a request that died; take it over
+        if row.locked_at < now - timedelta(seconds=config['IDEMPOTENCY_LOCK_TIMEOUT']):
+            taken = db.session.execute(table.update()
+                                       .where(table.c.id == row.id, table.c.locked_at == row.locked_at,
+                                              table.c.response_status.is_(None))
+                                       .values(locked_at=now))
+            db.session.commit()
+            if taken.rowcount:
+                return row.id, None
+            continue
+        if time.monotonic() >= deadline:
+            response = jsonify({'error': 'A request with this Idempotency-Key is still being processed'})
+            response.status_code = HTTP_409_CONFLICT
+            response.headers['Retry-After'] = '1'
+            return None, response
+        db.session.rollback()  # End the transaction so the next read sees the other request's commit
+        time.sleep(POLL_INTERVAL)
+
+
+def idempotent(view):
+    """
+    Honour an `Idempotency-Key` request header on a view.
+
+    The first request with a given key runs the view and stores its response; retries
+    with the same key and the same request get that response replayed (with an
+    `Idempotent-Replayed: true` header) without running the view again. A duplicate that
+    arrives while the first is still running waits for it, up to IDEMPOTENCY_WAIT
+    seconds. Server errors are not stored, so the client can retry them.
+    Requests without the header are not affected.
+
+    Keys are scoped to the JWT identity, or to the session of a guest. A key sent with
+    neither is rejected: a shared scope would replay one caller's response to another.
+    """
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        key = request.headers.get('Idempotency-Key')
+        if not key:
+            return view(*args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return jsonify({'error': f'Idempotency-Key must be at most {MAX_KEY_LENGTH} characters'}), HTTP_400_BAD_REQUEST
+
+        scope = get_jwt_identity() or session.get('session_id')
+        if not scope:
+            return jsonify({'error': 'Idempotency-Key requires a logged-in user or a session'}), HTTP_400_BAD_REQUEST
+        row_id, response = _claim(scope, key, request_fingerprint())
+        if response is not None:
+            return response
+
+        table = IdempotencyKey.__table__
+        try:
+            response = current_app.make_response(view(*args, **kwargs))
+        except Exception:
+            db.session.rollback()
+            db.session.execute(table.delete().where(table.c.id == row_id))
+            db.session.commit()
+            raise
+
+        # Anything the view left uncommitted would be discarded at teardown anyway
+        db.session.rollback()
+        if response.status_code >= 500 or response.is_streamed:
+            db.session.execute(table.delete().where(table.c.id == row_id))
+        else:
+            db.session.execute(table.update().where(table.c.id == row_id).values(
+                response_status=response.status_code,
+                response_body=response.get_data(as_text=True),
+                response_mimetype=response.mimetype,
+                expires_at=datetime.utcnow() + timedelta(seconds=current_app.config['IDEMPOTENCY_TTL'])))
+        db.session.commit()
+        return response
+    return wrapper
+
+
+@periodic('IDEMPOTENCY_PURGE_INTERVAL', queue='maintenance')
+def purge_expired_keys(batch_size=1000):
+    """Delete expired idempotency keys in batches. Returns how many were deleted."""
+    table = IdempotencyKey.__table__
+    deleted = 0
+    while True:
+        now = datetime.utcnow()
+        ids = db.select(table.c.id).where(table.c.expires_at <= now).limit(batch_size)
+        result = db.session.execute(table.delete().where(table.c.id.in_(ids.scalar_subquery())))
+        db.session.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
@@ -0,0 +1,317 @@
+from datetime import datetime, timedelta
+from flask import Blueprint, current_app, jsonify
+from flask_jwt_extended import jwt_required, get_jwt_identity
+from sqlalchemy import func
+from sqlalchemy.exc import IntegrityError
+
+from http_status_code import *
+from models import db, Job, User
+
+import click
+import os
+import signal
+import socket
+import threading
+import time
+
+jobs_bp = Blueprint('jobs', __name__, url_prefix='/api/jobs')
+
+registry = {}  # Job name -> JobSpec
+schedule = []  # Periodic jobs, as (JobSpec, every)
+
+
+class JobSpec:
+    def __init__(self, fn, name, queue, max_attempts, timeout):
+        self.fn = fn
+        self.name = name
+        self.queue = queue
+        self.max_attempts = max_attempts
+        self.timeout = timeout
+
+
+def job(name=None, queue='default', max_attempts=None, timeout=None):
+    """
+    Register a function as a background job.
+
+    The function stays callable as is and gains `delay(*args, **kwargs)`, which adds a
+    job to the session to run as soon as a worker is free, and `schedule(run_at, *args,
+    **kwargs)`. Neither commits: the job is enqueued with the caller's transaction, so
+    it only runs if that transaction commits. Arguments must be JSON serializable.
+    A job can run more than once (retries, a worker dying mid-job), so keep it idempotent.
+
+    `max_attempts` and `timeout` (seconds a worker may hold the job before another one
+    takes it over) default to JOB_MAX_ATTEMPTS and JOB_TIMEOUT.
+    """
+    def decorator(fn):
+        spec = JobSpec(fn, name or f'{fn.__module__}.{fn.__name__}', queue, max_attempts, timeout)
+        registry[spec.name] = spec
+        fn.job_name = spec.name
+        fn.delay = lambda *args, **kwargs: enqueue(spec.name, args, kwargs)
+        fn.schedule = lambda run_at, *args, **kwargs: enqueue(spec.name, args, kwargs, run_at=run_at)
+        return fn
+    return decorator
+
+
+def periodic(every, name=None, queue='default', max_attempts=1, timeout=None):
+    """
+    Register a job the workers enqueue once every `every` seconds.
+
+    `every` may also be the name of a config setting holding the interval. Runs are
+    aligned to multiples of the interval and deduplicated, so any number of workers
+    enqueue each run once. A missed run is not made up for; there is no retry by
+    default since the next run comes soon enough.
+    """
+    def decorator(fn):
+        fn = job(name, queue, max_attempts, timeout)(fn)
+        schedule.append((registry[fn.job_name], every))
+        return fn
+    return decorator
+
+
+def enqueue(name, args=(), kwargs=None, run_at=None, queue=None, dedupe_key=None):
+    spec = registry[name]
+    job = Job(name=name, queue=queue or spec.queue, args=list(args), kwargs=kwargs or {},
+              max_attempts=spec.max_attempts or current_app.config['JOB_MAX_ATTEMPTS'],
+              run_at=run_at or datetime.utcnow(), dedupe_key=dedupe_key)
+    db.session.add(job)
+    return job
+
+
+def parse_queues(spec):
+    """'default:2,email:4' -> {'default': 2, 'email': 4}; a queue without a count gets one thread."""
+    queues = {}
+    for part in spec.split(','):
+        name, _, count = part.strip().partition(':')
+        if name:
+            queues[name] = int(count or 1)
+    return queues
+
+
+def _claim(queue, worker_id):
+    """
+    Take the next due job of `queue`, or return None.
+
+    SKIP LOCKED keeps workers on PostgreSQL from queueing up behind each other's claims;
+    the UPDATE re-checks the row, which is what keeps two SQLite workers apart.
+
+    A `running` job whose lease has expired lost its worker mid-run. It is claimed
+    again only while it has attempts left; otherwise it is marked failed here, since
+    a job that kills its worker would never get to `run_job` to be failed there.
+    """
+    table = Job.__table__
+    while True:
+        now = datetime.utcnow()
+        candidate = db.session.query(Job.id, Job.name, Job.status, Job.run_at, Job.attempts, Job.max_attempts) \
+                              .filter(Job.queue == queue, Job.status.in_(('queued', 'running')), Job.run_at <= now) \
+                              .order_by(Job.run_at, Job.id) \
+                              .limit(1).with_for_update(skip_locked=True).first()
+        if candidate is None:
+            db.session.rollback()
+            return None
+        same_row = (table.c.id == candidate.id, table.c.status == candidate.status, table.c.run_at == candidate.run_at)
+
+        if candidate.status == 'running' and candidate.attempts >= candidate.max_attempts:
+            db.session.execute(table.update().where(*same_row).values(
+                status='failed', finished_at=now,
+                last_error=f'Worker lost during attempt {candidate.attempts} of {candidate.max_attempts}'))
+            db.session.commit()
+            current_app.logger.error('Job %s (%s) failed: its worker was lost on the last attempt',
+                                     candidate.id, candidate.name)
+            continue
+
+        spec = registry.get(candidate.name)
+        timeout = (spec and spec.timeout) or current_app.config['JOB_TIMEOUT']
+        claimed = db.session.execute(table.update().where(*same_row)
+                                     .values(status='running', attempts=table.c.attempts + 1, locked_by=worker_id,
+                                             run_at=now + timedelta(seconds=timeout)))
+        db.session.commit()
+        return db.session.get(Job, candidate.id) if claimed.rowcount else None
+
+
+def _retry_delay(attempts):
+    return min(current_app.config['JOB_RETRY_BACKOFF'] * 2 ** (attempts - 1), current_app.config['JOB_RETRY_BACKOFF_MAX'])
+
+
+def run_job(job):
+    """
+    Run a claimed job and record the outcome.
+
+    On success the job is marked done, with the function's return value (which must be
+    JSON serializable) as its result, in the same transaction as whatever the job left
+    uncommitted. On failure it is retried after an exponential backoff until
+    `max_attempts`, then marked failed.
+    """
+    job_id, name, attempts, max_attempts = job.id, job.name, job.attempts, job.max_attempts
+    table = Job.__table__
+    spec = registry.get(name)
+    start = time.perf_counter()
+    try:
+        if spec is None:
+            raise LookupError(f'No job named {name}')
+        result = spec.fn(*job.args, **job.kwargs)
+        db.session.execute(table.update().where(table.c.id == job_id)
+                           .values(status='done', result=result, last_error=None, finished_at=datetime.utcnow()))
+        db.session.commit()
+        current_app.logger.info('Job %s (%s) done in %.3fs', job_id, name, time.perf_counter() - start)
+        return 'done'
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.exception('Job %s (%s) failed (attempt %d of %d)', job_id, name, attempts, max_attempts)
+        if spec is None or attempts >= max_attempts:
+            values = dict(status='failed', finished_at=datetime.utcnow())
+        else:
+            values = dict(status='queued', run_at=datetime.utcnow() + timedelta(seconds=_retry_delay(attempts)))
+        db.session.execute(table.update().where(table.c.id == job_id).values(last_error=repr(e), **values))
+        db.session.commit()
+        return values['status']
+
+
+def last_result(fn):
+    """The most recent successful run of job `fn`, as {'finished_at', 'result'}, or None."""
+    row = db.session.query(Job.finished_at, Job.result) \
+                    .filter(Job.name == fn.job_name, Job.status == 'done') \
+                    .order_by(Job.finished_at.desc()).first()
+    return {'finished_at': row.finished_at, 'result': row.result} if row else None
+
+
+def _interval(every):
+    return current_app.config[every] if isinstance(every, str) else every
+
+
+def enqueue_periodic(last_runs):
+    """Enqueue the periodic jobs whose next run is due. `last_runs` remembers what this process enqueued."""
+    now = time.time()
+    for spec, every in schedule:
+        interval = _interval(every)
+        slot = int(now // interval * interval)
+        if last_runs.get(spec.name) == slot:
+            continue
+        enqueue(spec.name, dedupe_key=f'{spec.name}@{slot}')
+        try:
+            db.session.commit()
+        except IntegrityError:
+            db.session.rollback()  # Another worker got there first
+        last_runs[spec.name] = slot
+
+
+class Worker:
+    """
+    Run jobs from the given queues, `queues[name]` threads for each, plus the scheduler.
+
+    Concurrency limits are per worker process: a queue with two threads runs at most two
+    of its jobs at a time in this process. Run several processes for more.
+    """
+
+    def __init__(self, app, queues, poll_interval=1.0):
+        self.app = app
+        self.queues = queues
+        self.poll_interval = poll_interval
+        self.id = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self.threads = []
+
+    def _loop(self, queue):
+        while not self.stopping.is_set():
+            with self.app.app_context():
+                try:
+                    job = _claim(queue, self.id)
+                    if job is not None:
+                        run_job(job)
+                        continue
+                except Exception:
+                    db.session.rollback()
+                    current_app.logger.exception('Worker %s could not claim from %s', self.id, queue)
+            self.stopping.wait(self.poll_interval)
+
+    def _schedule_loop(self):
+        last_runs = {}
+        while not self.stopping.is_set():
+            with self.app.app_context():
+                try:
+                    enqueue_periodic(last_runs)
+                except Exception:
+                    db.session.rollback()
+                    current_app.logger.exception('Worker %s could not enqueue periodic jobs', self.id)
+            self.stopping.wait(self.poll_interval)
+
+    def start(self, scheduler=True):
+        targets = [(self._loop, (queue,), f'jobs-{queue}-{n}')
+                   for queue, count in self.queues.items() for n in range(count)]
+        if scheduler:
+            targets.append((self._schedule_loop, (), 'jobs-scheduler'))
+        for target, args, name in targets:
+            thread = threading.Thread(target=target, args=args, name=name, daemon=True)
+            thread.start()
+            self.threads.append(thread)
+
+    def stop(self, *_):
+        self.stopping.set()
+
+    def join(self):
+        for thread in self.threads:
+            while thread.is_alive():
+                thread.join(0.5)
+
+
+@jobs_bp.get('/stats')
+@jwt_required()
+def get_stats():
+    """Job counts per queue and status, and how late the oldest due job is."""
+    user = User.query.filter_by(email=get_jwt_identity()).first()
+    if not user or not user.is_admin:
+        return jsonify({'detail': 'You dont have permission to perform this command.'}), HTTP_403_FORBIDDEN
+
+    now = datetime.utcnow()
+    queues = {}
+    for queue, status, count in db.session.query(Job.queue, Job.status, func.count(Job.id)).group_by(Job.queue, Job.status):
+        queues.setdefault(queue, {})[status] = count
+    for queue, oldest in db.session.query(Job.queue, func.min(Job.run_at)) \
+                                   .filter(Job.status == 'queued', Job.run_at <= now).group_by(Job.queue):
+        queues[queue]['lag_seconds'] = round((now - oldest).total_seconds(), 3)
+    return jsonify({'queues': queues}), HTTP_200_OK
+
+
+@periodic('JOB_PURGE_INTERVAL', queue='maintenance')
+def purge_finished_jobs(batch_size=1000):
+    """Delete jobs that finished successfully more than JOB_RETENTION seconds ago. Failed jobs are kept."""
+    table = Job.__table__
+    cutoff = datetime.utcnow() - timedelta(seconds=current_app.config['JOB_RETENTION'])
+    deleted = 0
+    while True:
+        ids = db.select(table.c.id).where(table.c.status == 'done', table.c.finished_at < cutoff).limit(batch_size)
+        result = db.session.execute(table.delete().where(table.c.id.in_(ids.scalar_subquery())))
+        db.session.commit()
+        deleted += result.rowcount
+        if result.rowcount < batch_size:
+            return deleted
+
+
+@jobs_bp.cli.command('work')
+@click.option('--queues', help='Queues and threads per queue, e.g. "default:2,email:4"; defaults to JOB_QUEUES.')
+@click.option('--poll', type=float, help='Seconds to wait when a queue is empty; defaults to JOB_POLL_INTERVAL.')
+@click.option('--no-scheduler', is_flag=True, help="Don't enqueue periodic jobs from this process.")
+def work(queues, poll, no_scheduler):
+    """Run background jobs until SIGTERM/SIGINT, then finish the running ones and exit."""
+    app = current_app._get_current_object()
+    worker = Worker(app, parse_queues(queues or app.config['JOB_QUEUES']),
+                    poll if poll is not None else app.config['JOB_POLL_INTERVAL'])
+    signal.signal(signal.SIGTERM, worker.stop)
+    signal.signal(signal.SIGINT, worker.stop)
+    worker.start(scheduler=not no_scheduler)
+    click.echo(f"worker {worker.id}: {', '.join(f'{q} x{n}' for q, n in worker.queues.items())}"
+               f"{'' if no_scheduler else ', scheduler'}")
+    worker.join()
+
+
+@jobs_bp.cli.command('retry')
+@click.argument('job_ids', nargs=-1, type=int)
+@click.option('--all-failed', is_flag=True, help='Requeue every failed job.')
+def retry(job_ids, all_failed):
+    """Requeue failed jobs, with their attempts reset."""
+    query = Job.query.filter(Job.status == 'failed')
+    if not all_failed:
+        query = query.filter(Job.id.in_(job_ids))
+    count = query.update({'status': 'queued', 'attempts': 0, 'run_at': datetime.utcnow(), 'finished_at': None},
+                         synchronize_session=False)
+    db.session.commit()
+    click.echo(f'requeued {count} jobs')
@@ -0,0 +1,82 @@
+from datetime import date, time
+from decimal import Decimal
+from enum import Enum
+from flask.json.provider import DefaultJSONProvider
+
+import dataclasses
+import json
+import uuid
+
+try:
+    import orjson
+except ImportError:  # Fall back to the standard library encoder
+    orjson = None
+
+
+def encode_default(obj):
+    """
+    Encode the types our models return, the same way whichever backend is in use:
+    Decimal as a JSON number, dates and times as ISO 8601, Enums as their value.
+    """
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, (date, time)):
+        return obj.isoformat()
+    if isinstance(obj, Enum):
+        return obj.value
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, tuple):  # e.g. SQLAlchemy rows
+        return list(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """
+    JSON provider backed by orjson when it is installed.
+
+    orjson encodes datetimes, Enums, UUIDs and dataclasses natively and straight to
+    bytes, so responses skip the str round trip; everything else goes through
+    `encode_default`, which the standard library path shares, so values come out the
+    same with either backend. Anything orjson refuses (e.g. integers wider than
+    64 bits) is retried with the standard library encoder.
+    """
+
+    default = staticmethod(encode_default)
+
+    def _orjson_options(self, indent=False):
+        options = orjson.OPT_NON_STR_KEYS
+        if self.sort_keys:
+            options |= orjson.OPT_SORT_KEYS
+        if indent:
+            options |= orjson.OPT_INDENT_2
+        return options
+
+    def dump_bytes(self, obj, indent=False):
+        if orjson is not None:
+            try:
+                return orjson.dumps(obj, default=encode_default, option=self._orjson_options(indent))
+            except TypeError:
+                pass
+        return json.dumps(obj, default=encode_default, sort_keys=self.sort_keys, ensure_ascii=self.ensure_ascii,
+                          indent=2 if indent else None, separators=None if indent else (',', ':')).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        if orjson is None or kwargs:
+            kwargs.setdefault('default', encode_default)
+            return super().dumps(obj, **kwargs)
+        return self.dump_bytes(obj).decode('utf-8')
+
+    def loads(self, s, **kwargs):
+        if orjson is None or kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        indent = self.compact is False or (self.compact is None and self._app.debug)
+        return self._app.response_class(self.dump_bytes(obj, indent) + b'\n', mimetype=self.mimetype)
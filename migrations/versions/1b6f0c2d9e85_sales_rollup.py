@@ -0,0 +1,41 @@
+"""Sales rollup table for admin analytics
+
+Revision ID: 1b6f0c2d9e85
+Revises: e7b1f4a83c26
+Create Date: 2026-10-19 20:31:07.250114
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1b6f0c2d9e85'
+down_revision = 'e7b1f4a83c26'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sales_rollup',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('granularity', sa.String(length=8), nullable=False),
+        sa.Column('bucket', sa.DateTime(), nullable=False),
+        sa.Column('dimension', sa.String(length=16), nullable=False),
+        sa.Column('dimension_value', sa.String(length=255), nullable=False),
+        sa.Column('revenue', sa.Numeric(precision=14, scale=2), nullable=False),
+        sa.Column('units', sa.Integer(), nullable=False),
+        sa.Column('orders', sa.Integer(), nullable=False),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('granularity', 'dimension', 'dimension_value', 'bucket', name='uq_sales_rollup_key')
+    )
+    with op.batch_alter_table('sales_rollup', schema=None) as batch_op:
+        batch_op.create_index('ix_sales_rollup_dimension_bucket', ['granularity', 'dimension', 'bucket'], unique=False)
+    # Populate with `flask analytics backfill`
+
+
+def downgrade():
+    with op.batch_alter_table('sales_rollup', schema=None) as batch_op:
+        batch_op.drop_index('ix_sales_rollup_dimension_bucket')
+
+    op.drop_table('sales_rollup')
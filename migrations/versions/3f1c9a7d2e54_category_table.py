@@ -0,0 +1,53 @@
+"""Category table with product counts and facets
+
+Revision ID: 3f1c9a7d2e54
+Revises: 06d2a7ab1bfc
+Create Date: 2026-10-19 18:30:12.417902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f1c9a7d2e54'
+down_revision = '06d2a7ab1bfc'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    category = op.create_table('category',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(length=50), nullable=False),
+        sa.Column('slug', sa.String(length=255), nullable=False),
+        sa.Column('product_count', sa.Integer(), nullable=False),
+        sa.Column('in_stock_count', sa.Integer(), nullable=False),
+        sa.Column('brand_counts', sa.JSON(), nullable=False),
+        sa.Column('min_price', sa.Numeric(precision=10, scale=2), nullable=True),
+        sa.Column('max_price', sa.Numeric(precision=10, scale=2), nullable=True),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('slug')
+    )
+
+    # Backfill from the existing products
+    connection = op.get_bind()
+    brand_counts = {}
+    for slug, brand, count in connection.execute(sa.text(
+            'SELECT category_slug, brand, COUNT(*) FROM product GROUP BY category_slug, brand')):
+        brand_counts.setdefault(slug, {})[brand or ''] = count
+
+    rows = connection.execute(sa.text(
+        'SELECT category_slug, MAX(category), COUNT(*), '
+        'SUM(CASE WHEN quantity > 0 THEN 1 ELSE 0 END), MIN(price), MAX(price) '
+        'FROM product GROUP BY category_slug'))
+    op.bulk_insert(category, [
+        {'name': name, 'slug': slug, 'product_count': count, 'in_stock_count': in_stock or 0,
+         'brand_counts': brand_counts.get(slug, {}), 'min_price': min_price, 'max_price': max_price}
+        for slug, name, count, in_stock, min_price, max_price in rows
+    ])
+
+
+def downgrade():
+    op.drop_table('category')
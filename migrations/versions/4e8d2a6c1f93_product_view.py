@@ -0,0 +1,31 @@
+"""Denormalized product_view read model
+
+Revision ID: 4e8d2a6c1f93
+Revises: 9c3a5e1f7b40
+Create Date: 2026-10-19 21:47:12.403518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4e8d2a6c1f93'
+down_revision = '9c3a5e1f7b40'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('product_view',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('document', sa.Text(), nullable=False),
+        sa.Column('updated_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['product_id'], ['product.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id')
+    )
+    # Populate with `flask product rebuild-product-views`; until then documents are built on read
+
+
+def downgrade():
+    op.drop_table('product_view')
@@ -0,0 +1,59 @@
+"""Review summary columns on Product and review listing indexes
+
+Revision ID: 5d90b3e7f214
+Revises: c52d7e09a1f3
+Create Date: 2026-10-19 19:46:21.904377
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import json
+
+
+# revision identifiers, used by Alembic.
+revision = '5d90b3e7f214'
+down_revision = 'c52d7e09a1f3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('review_count', sa.Integer(), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('rating_total', sa.Numeric(precision=12, scale=2), nullable=False, server_default='0'))
+        batch_op.add_column(sa.Column('rating_histogram', sa.JSON(), nullable=False,
+                                      server_default='{"1": 0, "2": 0, "3": 0, "4": 0, "5": 0}'))
+
+    with op.batch_alter_table('product_review', schema=None) as batch_op:
+        batch_op.create_index('ix_product_review_product_created', ['product_id', 'created_at'], unique=False)
+        batch_op.create_index('ix_product_review_product_rating', ['product_id', 'rating'], unique=False)
+
+    # Backfill the summaries from the existing reviews
+    connection = op.get_bind()
+    summaries = {}
+    for product_id, rating, count in connection.execute(sa.text(
+            'SELECT product_id, rating, COUNT(*) FROM product_review '
+            'WHERE rating IS NOT NULL GROUP BY product_id, rating')):
+        summary = summaries.setdefault(product_id, {'count': 0, 'total': 0, 'histogram': dict.fromkeys('12345', 0)})
+        summary['count'] += count
+        summary['total'] += float(rating) * count
+        summary['histogram'][str(min(max(int(float(rating) + 0.5), 1), 5))] += count
+    for product_id, summary in summaries.items():
+        connection.execute(sa.text(
+            'UPDATE product SET review_count = :count, rating_total = :total, '
+            'rating_histogram = :histogram, avg_rating = :average WHERE id = :id'),
+            {'id': product_id, 'count': summary['count'], 'total': round(summary['total'], 2),
+             'histogram': json.dumps(summary['histogram']),
+             'average': round(summary['total'] / summary['count'], 2)})
+
+
+def downgrade():
+    with op.batch_alter_table('product_review', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_review_product_rating')
+        batch_op.drop_index('ix_product_review_product_created')
+
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_column('rating_histogram')
+        batch_op.drop_column('rating_total')
+        batch_op.drop_column('review_count')
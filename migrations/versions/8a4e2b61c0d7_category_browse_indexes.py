@@ -0,0 +1,35 @@
+"""Composite indexes for category browsing
+
+Revision ID: 8a4e2b61c0d7
+Revises: 3f1c9a7d2e54
+Create Date: 2026-10-19 18:52:40.118265
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '8a4e2b61c0d7'
+down_revision = '3f1c9a7d2e54'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.create_index('ix_product_category_price', ['category_slug', 'price'], unique=False)
+        batch_op.create_index('ix_product_category_rating', ['category_slug', 'avg_rating'], unique=False)
+        batch_op.create_index('ix_product_category_created', ['category_slug', 'created_at'], unique=False)
+        batch_op.create_index('ix_product_category_brand_price', ['category_slug', 'brand', 'price'], unique=False)
+        batch_op.create_index('ix_product_category_brand_rating', ['category_slug', 'brand', 'avg_rating'], unique=False)
+        batch_op.create_index('ix_product_category_brand_created', ['category_slug', 'brand', 'created_at'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_category_brand_created')
+        batch_op.drop_index('ix_product_category_brand_rating')
+        batch_op.drop_index('ix_product_category_brand_price')
+        batch_op.drop_index('ix_product_category_created')
+        batch_op.drop_index('ix_product_category_rating')
+        batch_op.drop_index('ix_product_category_price')
@@ -0,0 +1,37 @@
+"""Product co-occurrence table for recommendations
+
+Revision ID: 9c3a5e1f7b40
+Revises: 1b6f0c2d9e85
+Create Date: 2026-10-19 20:58:33.781045
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9c3a5e1f7b40'
+down_revision = '1b6f0c2d9e85'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('product_cooccurrence',
+        sa.Column('product_id', sa.Integer(), nullable=False),
+        sa.Column('other_product_id', sa.Integer(), nullable=False),
+        sa.Column('count', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['other_product_id'], ['product.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['product_id'], ['product.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('product_id', 'other_product_id')
+    )
+    with op.batch_alter_table('product_cooccurrence', schema=None) as batch_op:
+        batch_op.create_index('ix_product_cooccurrence_product_count', ['product_id', 'count'], unique=False)
+    # Populate with `flask product build-recommendations`
+
+
+def downgrade():
+    with op.batch_alter_table('product_cooccurrence', schema=None) as batch_op:
+        batch_op.drop_index('ix_product_cooccurrence_product_count')
+
+    op.drop_table('product_cooccurrence')
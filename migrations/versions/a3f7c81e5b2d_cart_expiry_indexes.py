@@ -0,0 +1,33 @@
+"""Indexes for cart lookups and anonymous cart expiry
+
+Revision ID: a3f7c81e5b2d
+Revises: 4e8d2a6c1f93
+Create Date: 2026-10-19 22:31:05.918274
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f7c81e5b2d'
+down_revision = '4e8d2a6c1f93'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.create_index('ix_cart_session_id', ['session_id'], unique=False)
+        batch_op.create_index('ix_cart_user_updated', ['user_id', 'updated_at'], unique=False)
+
+    with op.batch_alter_table('cart_item', schema=None) as batch_op:
+        batch_op.create_index('ix_cart_item_cart_product', ['cart_id', 'product_id'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('cart_item', schema=None) as batch_op:
+        batch_op.drop_index('ix_cart_item_cart_product')
+
+    with op.batch_alter_table('cart', schema=None) as batch_op:
+        batch_op.drop_index('ix_cart_user_updated')
+        batch_op.drop_index('ix_cart_session_id')
@@ -0,0 +1,28 @@
+"""Add sku to Product
+
+Revision ID: c52d7e09a1f3
+Revises: 8a4e2b61c0d7
+Create Date: 2026-10-19 19:10:05.530127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c52d7e09a1f3'
+down_revision = '8a4e2b61c0d7'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('sku', sa.String(length=100), nullable=True))
+        batch_op.create_unique_constraint('uq_product_sku', ['sku'])
+
+
+def downgrade():
+    with op.batch_alter_table('product', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_product_sku', type_='unique')
+        batch_op.drop_column('sku')
@@ -0,0 +1,52 @@
+"""PayPal webhook event queue and Order.payment_id
+
+Revision ID: d81c3f5a7e26
+Revises: 6b2e9d4f0a17
+Create Date: 2026-10-19 23:52:18.640912
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd81c3f5a7e26'
+down_revision = '6b2e9d4f0a17'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('payment_event',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('event_id', sa.String(length=100), nullable=False),
+        sa.Column('event_type', sa.String(length=100), nullable=False),
+        sa.Column('resource_id', sa.String(length=100), nullable=True),
+        sa.Column('payload', sa.Text(), nullable=False),
+        sa.Column('headers', sa.JSON(), nullable=False),
+        sa.Column('status', sa.String(length=16), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('last_error', sa.Text(), nullable=True),
+        sa.Column('available_at', sa.DateTime(), nullable=False),
+        sa.Column('received_at', sa.DateTime(), nullable=True),
+        sa.Column('processed_at', sa.DateTime(), nullable=True),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('event_id')
+    )
+    with op.batch_alter_table('payment_event', schema=None) as batch_op:
+        batch_op.create_index('ix_payment_event_status_available', ['status', 'available_at'], unique=False)
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('payment_id', sa.String(length=100), nullable=True))
+        batch_op.create_unique_constraint('uq_order_payment_id', ['payment_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_order_payment_id', type_='unique')
+        batch_op.drop_column('payment_id')
+
+    with op.batch_alter_table('payment_event', schema=None) as batch_op:
+        batch_op.drop_index('ix_payment_event_status_available')
+
+    op.drop_table('payment_event')
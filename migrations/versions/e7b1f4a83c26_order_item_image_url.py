@@ -0,0 +1,42 @@
+"""Denormalized image URL on OrderItem and order history indexes
+
+Revision ID: e7b1f4a83c26
+Revises: 5d90b3e7f214
+Create Date: 2026-10-19 20:05:48.661530
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b1f4a83c26'
+down_revision = '5d90b3e7f214'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('image_url', sa.String(), nullable=True))
+
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.create_index('ix_order_user_id_id', ['user_id', 'id'], unique=False)
+        batch_op.create_index('ix_order_user_status_id', ['user_id', 'order_status', 'id'], unique=False)
+
+    # Backfill with each product's primary (first uploaded) image
+    op.execute(
+        'UPDATE order_item SET image_url = ('
+        'SELECT product_image.image_path FROM product_image '
+        'WHERE product_image.product_id = order_item.product_id '
+        'ORDER BY product_image.id LIMIT 1)'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('order', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_user_status_id')
+        batch_op.drop_index('ix_order_user_id_id')
+
+    with op.batch_alter_table('order_item', schema=None) as batch_op:
+        batch_op.drop_column('image_url')
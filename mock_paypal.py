@@ -0,0 +1,179 @@
+"""
+Local stand-in for the PayPal REST API, for offline development and load testing.
+
+Run it and point the app at it:
+    python mock_paypal.py --port 5001 --latency-ms 150
+    PAYPAL_API_BASE=http://127.0.0.1:5001
+
+Implements the endpoints used by `payments.PayPalGateway`: OAuth token, create payment,
+buyer approval (redirects straight back to the return_url), execute payment and webhook
+signature verification.
+
+Webhook simulator: with --webhook-url, every executed payment is followed by a signed
+PAYMENT.SALE.COMPLETED delivery to that URL (after --webhook-delay-ms), like PayPal
+would send. POST /simulate/webhook {"payment_id": ..., "event_type": ...} sends one on
+demand, e.g. to replay or fake events while load testing:
+    python mock_paypal.py --webhook-url http://127.0.0.1:5000/api/order/paypal-webhook
+"""
+from flask import Flask, request, jsonify, redirect
+
+import argparse
+import hashlib
+import json
+import requests
+import threading
+import time
+import uuid
+
+TOKEN_TTL = 32400
+WEBHOOK_SECRET = b'mock-webhook-secret'
+
+
+def create_mock_app(latency_ms=0, webhook_url=None, webhook_delay_ms=0):
+    app = Flask(__name__)
+    payments = {}
+    lock = threading.Lock()
+    tokens = set()
+    deliveries = {}  # transmission id -> (signature, event id), for verify-webhook-signature
+    webhook_session = requests.Session()
+
+    def simulate_latency():
+        if latency_ms:
+            time.sleep(latency_ms / 1000)
+
+    def authorized():
+        header = request.headers.get('Authorization', '')
+        return header.startswith('Bearer ') and header[len('Bearer '):] in tokens
+
+    @app.post('/v1/oauth2/token')
+    def token():
+        simulate_latency()
+        if not request.authorization or request.form.get('grant_type') != 'client_credentials':
+            return jsonify({'error': 'invalid_client'}), 401
+        access_token = f'A21AA{uuid.uuid4().hex}'
+        tokens.add(access_token)
+        return jsonify({'access_token': access_token, 'token_type': 'Bearer', 'expires_in': TOKEN_TTL})
+
+    @app.post('/v1/payments/payment')
+    def create_payment():
+        simulate_latency()
+        if not authorized():
+            return jsonify({'name': 'AUTHENTICATION_FAILURE'}), 401
+        payment = dict(request.json, id=f'PAYID-{uuid.uuid4().hex[:20].upper()}', state='created')
+        payment['links'] = [
+            {'href': f"{request.host_url}v1/payments/payment/{payment['id']}", 'rel': 'self', 'method': 'GET'},
+            {'href': f"{request.host_url}approve?paymentId={payment['id']}", 'rel': 'approval_url', 'method': 'REDIRECT'},
+            {'href': f"{request.host_url}v1/payments/payment/{payment['id']}/execute", 'rel': 'execute', 'method': 'POST'},
+        ]
+        with lock:
+            payments[payment['id']] = payment
+        return jsonify(payment), 201
+
+    @app.get('/approve')
+    def approve():
+        # The buyer approves instantly; PayPal would normally show its checkout page here
+        payment = payments.get(request.args.get('paymentId'))
+        if payment is None:
+            return jsonify({'name': 'INVALID_RESOURCE_ID'}), 404
+        payer_id = uuid.uuid4().hex[:13].upper()
+        payment['payer_id'] = payer_id
+        return redirect(f"{payment['redirect_urls']['return_url']}?paymentId={payment['id']}&PayerID={payer_id}")
+
+    @app.post('/v1/payments/payment/<payment_id>/execute')
+    def execute_payment(payment_id):
+        simulate_latency()
+        if not authorized():
+            return jsonify({'name': 'AUTHENTICATION_FAILURE'}), 401
+        with lock:
+            payment = payments.get(payment_id)
+            if payment is None:
+                return jsonify({'name': 'INVALID_RESOURCE_ID'}), 404
+            if payment['state'] == 'approved':
+                return jsonify({'name': 'PAYMENT_ALREADY_DONE'}), 400
+            payment['state'] = 'approved'
+            payment['payer'] = dict(payment.get('payer', {}), payer_info={'payer_id': request.json.get('payer_id')})
+        if webhook_url:
+            threading.Thread(target=send_webhook, args=(webhook_url, payment, 'PAYMENT.SALE.COMPLETED',
+                                                        webhook_delay_ms), daemon=True).start()
+        return jsonify(payment)
+
+    def sign(transmission_id, transmission_time, body):
+        return hashlib.sha256(WEBHOOK_SECRET + f'{transmission_id}|{transmission_time}|'.encode() + body).hexdigest()
+
+    def send_webhook(url, payment, event_type, delay_ms=0):
+        if delay_ms:
+            time.sleep(delay_ms / 1000)
+        event = {
+            'id': f'WH-{uuid.uuid4().hex[:24].upper()}',
+            'event_type': event_type,
+            'create_time': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'resource_type': 'sale',
+            'resource': {
+                'id': uuid.uuid4().hex[:17].upper(),
+                'parent_payment': payment['id'],
+                'state': 'completed',
+                'amount': payment['transactions'][0]['amount'],
+            },
+        }
+        body = json.dumps(event).encode('utf-8')
+        transmission_id = str(uuid.uuid4())
+        transmission_time = event['create_time']
+        signature = sign(transmission_id, transmission_time, body)
+        with lock:
+            deliveries[transmission_id] = (signature, event['id'])
+        response = webhook_session.post(url, data=body, timeout=10, headers={
+            'Content-Type': 'application/json',
+            'Paypal-Transmission-Id': transmission_id,
+            'Paypal-Transmission-Time': transmission_time,
+            'Paypal-Transmission-Sig': signature,
+            'Paypal-Cert-Url': 'https://api.sandbox.paypal.com/v1/notifications/certs/CERT-MOCK',
+            'Paypal-Auth-Algo': 'SHA256withRSA',
+        })
+        return event, response.status_code
+
+    @app.post('/simulate/webhook')
+    def simulate_webhook():
+        data = request.json or {}
+        payment = payments.get(data.get('payment_id'))
+        if payment is None:
+            return jsonify({'name': 'INVALID_RESOURCE_ID'}), 404
+        url = data.get('url') or webhook_url
+        if not url:
+            return jsonify({'error': 'No webhook url; pass "url" or start with --webhook-url'}), 400
+        event, status = send_webhook(url, payment, data.get('event_type', 'PAYMENT.SALE.COMPLETED'))
+        return jsonify({'event': event, 'delivery_status': status})
+
+    @app.post('/v1/notifications/verify-webhook-signature')
+    def verify_webhook_signature():
+        simulate_latency()
+        if not authorized():
+            return jsonify({'name': 'AUTHENTICATION_FAILURE'}), 401
+        data = request.json
+        with lock:
+            delivery = deliveries.get(data.get('transmission_id'))
+        valid = delivery is not None and delivery == (data.get('transmission_sig'), (data.get('webhook_event') or {}).get('id'))
+        return jsonify({'verification_status': 'SUCCESS' if valid else 'FAILURE'})
+
+    @app.get('/v1/payments/payment/<payment_id>')
+    def get_payment(payment_id):
+        simulate_latency()
+        if not authorized():
+            return jsonify({'name': 'AUTHENTICATION_FAILURE'}), 401
+        payment = payments.get(payment_id)
+        if payment is None:
+            return jsonify({'name': 'INVALID_RESOURCE_ID'}), 404
+        return jsonify(payment)
+
+    return app
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Local mock PayPal REST API')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=5001)
+    parser.add_argument('--latency-ms', type=int, default=0, help='Artificial delay added to each API call')
+    parser.add_argument('--webhook-url', help='Deliver PAYMENT.SALE.COMPLETED here after each executed payment')
+    parser.add_argument('--webhook-delay-ms', type=int, default=0, help='Delay before each webhook delivery')
+    args = parser.parse_args()
+    create_mock_app(args.latency_ms, args.webhook_url, args.webhook_delay_ms) \
+        .run(host=args.host, port=args.port, threaded=True)
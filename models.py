@@ -1,15 +1,43 @@
 from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
 from slugify import slugify 
-from sqlalchemy.orm import validates
-from sqlalchemy import func
+from sqlalchemy.orm import validates, Session, attributes
+from sqlalchemy import func, event
+from decimal import Decimal
+from order_numbers import order_number_generator
 
 import enum
 
-import random
-
 db = SQLAlchemy()
 
+
+def upsert_add(table, key_columns, rows, add_columns):
+    """
+    Insert `rows` into `table`, or add their `add_columns` values onto the existing row
+    with the same `key_columns`. One INSERT ... ON CONFLICT on PostgreSQL and SQLite.
+    """
+    if not rows:
+        return
+    dialect = db.engine.dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert
+        statement = insert(table)
+        statement = statement.on_conflict_do_update(
+            index_elements=list(key_columns),
+            set_={column: table.c[column] + statement.excluded[column] for column in add_columns})
+        db.session.execute(statement, rows)
+        return
+
+    for row in rows:
+        key = db.and_(*(table.c[column] == row[column] for column in key_columns))
+        updated = db.session.execute(table.update().where(key).values(
+            **{column: table.c[column] + row[column] for column in add_columns}))
+        if not updated.rowcount:
+            db.session.execute(table.insert().values(**row))
+
 class PaymentStatus(enum.Enum):
     PAID = 'PAID'
     UNPAID = 'UNPAID'
@@ -33,8 +61,23 @@ class User(db.Model):
     product_review = db.relationship('ProductReview', backref='user', lazy=True)
     order = db.relationship('Order', backref='user', lazy=True)
 
+RATING_BUCKETS = ('1', '2', '3', '4', '5')
+
+
+def rating_bucket(rating):
+    """Histogram bucket ('1'..'5') for a rating, rounding half up."""
+    return str(min(max(int(Decimal(str(rating)) + Decimal('0.5')), 1), 5))
+
+def summarize_ratings(avg_rating, review_count, rating_histogram):
+    return {
+        'average': avg_rating or 0,
+        'count': review_count or 0,
+        'histogram': rating_histogram or dict.fromkeys(RATING_BUCKETS, 0),
+    }
+
 class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
+    sku = db.Column(db.String(100), nullable=True)  # External SKU used by bulk imports
     name = db.Column(db.String(255), nullable=False)
     description = db.Column(db.Text, nullable=True)
     quantity = db.Column(db.Integer, default=1, nullable=False)
@@ -43,34 +86,257 @@ class Product(db.Model):
     category_slug = db.Column(db.String(255), nullable=True, default='None')
     brand = db.Column(db.String(50), nullable=True, default='')
     avg_rating = db.Column(db.Numeric(3, 2), nullable=True, default=0)
+    # Precomputed review summary, kept in step with ProductReview by add_review_rating()
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_total = db.Column(db.Numeric(12, 2), nullable=False, default=0)
+    rating_histogram = db.Column(db.JSON, nullable=False, default=lambda: dict.fromkeys(RATING_BUCKETS, 0))
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, onupdate=datetime.utcnow) 
-    images = db.relationship('ProductImage', backref='product', lazy=True)
-    product_review = db.relationship('ProductReview', backref='product', lazy=True)
-    cart_items = db.relationship('CartItem', backref='product', lazy=True)
+    images = db.relationship('ProductImage', backref='product', lazy=True, cascade='all, delete-orphan')
+    product_review = db.relationship('ProductReview', backref='product', lazy=True, cascade='all, delete-orphan')
+    cart_items = db.relationship('CartItem', backref='product', lazy=True, cascade='all, delete-orphan')
     order_items = db.relationship('OrderItem', backref='product', lazy=True)
 
+    __table_args__ = (
+        db.UniqueConstraint('sku', name='uq_product_sku'),
+        # Category browsing: one index per supported sort, with and without a brand filter
+        db.Index('ix_product_category_price', 'category_slug', 'price'),
+        db.Index('ix_product_category_rating', 'category_slug', 'avg_rating'),
+        db.Index('ix_product_category_created', 'category_slug', 'created_at'),
+        db.Index('ix_product_category_brand_price', 'category_slug', 'brand', 'price'),
+        db.Index('ix_product_category_brand_rating', 'category_slug', 'brand', 'avg_rating'),
+        db.Index('ix_product_category_brand_created', 'category_slug', 'brand', 'created_at'),
+    )
+
     @validates('category')
     def generate_category_slug(self, key, value):
         """Automatically generate a slug when the category is updated or created."""
         self.category_slug = slugify(value)
         return value
     
+    def add_review_rating(self, rating):
+        """
+        Fold one new review's rating into the precomputed summary without reading the reviews.
+
+        The summary columns are re-read with the product row locked (FOR UPDATE on
+        PostgreSQL) until the caller commits, so concurrent reviews of the same product
+        apply one after the other instead of overwriting each other's counts.
+        """
+        db.session.refresh(self, attribute_names=['review_count', 'rating_total', 'rating_histogram', 'avg_rating'],
+                           with_for_update=True)
+        histogram = dict(self.rating_histogram or dict.fromkeys(RATING_BUCKETS, 0))
+        bucket = rating_bucket(rating)
+        histogram[bucket] = histogram.get(bucket, 0) + 1
+        self.rating_histogram = histogram
+        self.review_count = (self.review_count or 0) + 1
+        self.rating_total = Decimal(str(self.rating_total or 0)) + Decimal(str(rating))
+        self.avg_rating = round(self.rating_total / self.review_count, 2)  # Round to 2 decimal places
+
     def calculate_avg_rating(self):
-        # Fetch all reviews for this product
-        reviews = ProductReview.query.filter_by(product_id=self.id).all()
+        """Recompute the review summary from scratch (repairs drift; not needed on the hot path)."""
+        histogram = dict.fromkeys(RATING_BUCKETS, 0)
+        rows = db.session.query(ProductReview.rating, func.count(ProductReview.id)) \
+                         .filter(ProductReview.product_id == self.id, ProductReview.rating.isnot(None)) \
+                         .group_by(ProductReview.rating)
+        count, total = 0, Decimal(0)
+        for rating, rating_count in rows:
+            histogram[rating_bucket(rating)] += rating_count
+            count += rating_count
+            total += Decimal(str(rating)) * rating_count
+
+        self.rating_histogram = histogram
+        self.review_count = count
+        self.rating_total = total
+        # If there are no reviews, set avg_rating to 0
+        self.avg_rating = round(total / count, 2) if count else 0
+
+    def rating_summary(self):
+        return summarize_ratings(self.avg_rating, self.review_count, self.rating_histogram)
+
+class Category(db.Model):
+    """
+    Materialized category list with counters and facet summaries.
+
+    Rows are kept up to date incrementally by the flush listeners below whenever a
+    Product is created, edited or deleted through the ORM. Bulk statements that bypass
+    the ORM must call `Category.rebuild()` for the slugs they touched.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(50), nullable=False)
+    slug = db.Column(db.String(255), nullable=False, unique=True)
+    product_count = db.Column(db.Integer, nullable=False, default=0)
+    in_stock_count = db.Column(db.Integer, nullable=False, default=0)
+    brand_counts = db.Column(db.JSON, nullable=False, default=dict)  # {brand: number of products}
+    min_price = db.Column(db.Numeric(10, 2), nullable=True)
+    max_price = db.Column(db.Numeric(10, 2), nullable=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    def serialize(self):
+        return {
+            'name': self.name,
+            'slug': self.slug,
+            'product_count': self.product_count,
+            'in_stock_count': self.in_stock_count,
+            'brands': self.brand_counts,
+            'min_price': self.min_price,
+            'max_price': self.max_price,
+        }
+
+    @classmethod
+    def rebuild(cls, slugs=None):
+        """Recompute category rows from the product table (all categories, or only `slugs`)."""
+        query = db.session.query(Product.category_slug, func.max(Product.category), func.count(Product.id),
+                                 func.sum(db.case((Product.quantity > 0, 1), else_=0)),
+                                 func.min(Product.price), func.max(Product.price)) \
+                          .group_by(Product.category_slug)
+        brands_query = db.session.query(Product.category_slug, Product.brand, func.count(Product.id)) \
+                                 .group_by(Product.category_slug, Product.brand)
+        categories_query = cls.query
+        if slugs is not None:
+            slugs = list(slugs)
+            query = query.filter(Product.category_slug.in_(slugs))
+            brands_query = brands_query.filter(Product.category_slug.in_(slugs))
+            categories_query = categories_query.filter(cls.slug.in_(slugs))
 
-        if not reviews:
-            # If there are no reviews, set avg_rating to 0
-            self.avg_rating = 0
+        brand_counts = {}
+        for slug, brand, count in brands_query:
+            brand_counts.setdefault(slug, {})[brand or ''] = count
+
+        categories = {category.slug: category for category in categories_query}
+        seen = set()
+        for slug, name, count, in_stock, min_price, max_price in query:
+            category = categories.get(slug)
+            if category is None:
+                category = cls(slug=slug)
+                db.session.add(category)
+            category.name = name
+            category.product_count = count
+            category.in_stock_count = in_stock or 0
+            category.brand_counts = brand_counts.get(slug, {})
+            category.min_price = min_price
+            category.max_price = max_price
+            seen.add(slug)
+
+        for slug, category in categories.items():
+            if slug not in seen:
+                category.product_count = 0
+                category.in_stock_count = 0
+                category.brand_counts = {}
+                category.min_price = None
+                category.max_price = None
+
+
+_CATEGORY_ATTRIBUTES = ('category', 'category_slug', 'brand', 'quantity', 'price')
+
+
+def _category_snapshot(product, old=False):
+    """The category-relevant state of a product, either as it is now or as it was loaded."""
+    def value(key):
+        if old:
+            history = attributes.get_history(product, key)
+            if history.deleted:
+                return history.deleted[0]
+            if history.unchanged:
+                return history.unchanged[0]
+            return None
+        return getattr(product, key)
+
+    quantity = value('quantity')
+    price = value('price')
+    return {
+        'slug': value('category_slug'),
+        'name': value('category'),
+        'brand': value('brand') or '',
+        'in_stock': int(quantity or 0) > 0,
+        'price': Decimal(str(price)) if price is not None else None,
+    }
+
+
+def _insert_missing_categories(session, names):
+    """Create empty category rows for the `names` {slug: name} that do not exist yet."""
+    table = Category.__table__
+    rows = [{'slug': slug, 'name': name, 'product_count': 0, 'in_stock_count': 0, 'brand_counts': {}}
+            for slug, name in names.items()]
+    dialect = session.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        if dialect == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert
         else:
-            # Calculate the average rating
-            total_ratings = sum(review.rating for review in reviews)
-            avg_rating = total_ratings / len(reviews)
-            self.avg_rating = round(avg_rating, 2)  # Round to 2 decimal places
+            from sqlalchemy.dialects.sqlite import insert
+        # Two sessions adding the first product of a category both get past this without an IntegrityError
+        session.execute(insert(table).on_conflict_do_nothing(index_elements=['slug']), rows)
+        return
+
+    existing = set(session.scalars(db.select(table.c.slug).where(table.c.slug.in_(names))))
+    missing = [row for row in rows if row['slug'] not in existing]
+    if missing:
+        session.execute(table.insert(), missing)
+
+
+@event.listens_for(Session, 'before_flush')
+def _update_categories(session, flush_context, instances):
+    changes = []  # (sign, snapshot)
+    for obj in session.new:
+        if isinstance(obj, Product):
+            changes.append((1, _category_snapshot(obj)))
+    for obj in session.dirty:
+        if isinstance(obj, Product) and any(attributes.get_history(obj, key).has_changes()
+                                            for key in _CATEGORY_ATTRIBUTES):
+            changes.append((-1, _category_snapshot(obj, old=True)))
+            changes.append((1, _category_snapshot(obj)))
+    for obj in session.deleted:
+        if isinstance(obj, Product):
+            changes.append((-1, _category_snapshot(obj, old=True)))
+    if not changes:
+        return
+
+    names = {}
+    for _, snapshot in changes:
+        names.setdefault(snapshot['slug'], snapshot['name'])
+    with session.no_autoflush:
+        _insert_missing_categories(session, names)
+        # Lock the rows, in slug order, so concurrent flushes apply their deltas one after another
+        # instead of overwriting each other's counts; populate_existing rereads them under the lock
+        categories = {category.slug: category for category in
+                      session.query(Category).filter(Category.slug.in_(names)).order_by(Category.slug)
+                                             .with_for_update().populate_existing()}
+
+    stale_price_ranges = session.info.setdefault('stale_category_prices', set())
+    for sign, snapshot in changes:
+        category = categories[snapshot['slug']]
+        category.name = snapshot['name'] if sign > 0 else category.name
+        category.product_count += sign
+        category.in_stock_count += sign if snapshot['in_stock'] else 0
+        brands = dict(category.brand_counts or {})
+        brands[snapshot['brand']] = brands.get(snapshot['brand'], 0) + sign
+        category.brand_counts = {brand: count for brand, count in brands.items() if count > 0}
+
+        price = snapshot['price']
+        if price is None:
+            continue
+        if sign > 0:
+            category.min_price = price if category.min_price is None else min(category.min_price, price)
+            category.max_price = price if category.max_price is None else max(category.max_price, price)
+        elif price in (category.min_price, category.max_price):
+            # Removing a boundary price: the new range needs an aggregate after the flush
+            stale_price_ranges.add(category.slug)
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _refresh_category_price_ranges(session, flush_context):
+    slugs = session.info.pop('stale_category_prices', None)
+    if not slugs:
+        return
+    for slug in slugs:
+        min_price, max_price = session.execute(
+            db.select(func.min(Product.price), func.max(Product.price)).where(Product.category_slug == slug)
+        ).one()
+        session.execute(Category.__table__.update().where(Category.slug == slug)
+                        .values(min_price=min_price, max_price=max_price))
+    for obj in list(session.identity_map.values()):
+        if isinstance(obj, Category) and obj.slug in slugs:
+            session.expire(obj, ['min_price', 'max_price'])
 
-        # Save the updated avg_rating to the database
-        db.session.commit()
 
 class ProductImage(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -78,6 +344,18 @@ class ProductImage(db.Model):
     image_path = db.Column(db.String, nullable=False)  # Path to the image file
     uploaded_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+def primary_images(product_ids):
+    """Map product id -> path of its first uploaded image, using a single IN query."""
+    product_ids = set(product_ids)
+    if not product_ids:
+        return {}
+    images = {}
+    for product_id, image_path in db.session.query(ProductImage.product_id, ProductImage.image_path) \
+                                            .filter(ProductImage.product_id.in_(product_ids)) \
+                                            .order_by(ProductImage.id):
+        images.setdefault(product_id, image_path)
+    return images
+
 class ProductReview(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'), nullable=True)
@@ -86,6 +364,90 @@ class ProductReview(db.Model):
     rating = db.Column(db.Numeric(3, 2), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
+    __table_args__ = (
+        # Review listing sorted by newest or by rating
+        db.Index('ix_product_review_product_created', 'product_id', 'created_at'),
+        db.Index('ix_product_review_product_rating', 'product_id', 'rating'),
+    )
+
+class ProductView(db.Model):
+    """
+    Denormalized read model: the ready-to-send JSON body of each product.
+
+    Documents are rebuilt in the same transaction as the write, by the flush listeners
+    below, whenever a Product, ProductImage or ProductReview changes through the ORM.
+    Bulk statements that bypass the ORM must call `ProductView.refresh()` for the
+    products they touched.
+    """
+    __tablename__ = 'product_view'
+
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), primary_key=True)
+    document = db.Column(db.Text, nullable=False)  # Encoded JSON, served as is
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+    @classmethod
+    def build_documents(cls, product_ids):
+        """Encode the documents of `product_ids` (two queries). Missing products are left out."""
+        from flask import current_app
+        product_ids = set(product_ids)
+        if not product_ids:
+            return {}
+        images = {}
+        for product_id, image_path in db.session.execute(
+                db.select(ProductImage.product_id, ProductImage.image_path)
+                  .where(ProductImage.product_id.in_(product_ids)).order_by(ProductImage.id)):
+            images.setdefault(product_id, []).append(image_path)
+        rows = db.session.execute(
+            db.select(Product.id, Product.name, Product.description, Product.quantity, Product.price,
+                      Product.category, Product.category_slug, Product.brand, Product.avg_rating,
+                      Product.review_count, Product.rating_histogram)
+              .where(Product.id.in_(product_ids)))
+        return {row.id: current_app.json.dumps({
+            'id': row.id,
+            'name': row.name,
+            'description': row.description,
+            'quantity': row.quantity,
+            'price': row.price,
+            'category': row.category,
+            'category_slug': row.category_slug,
+            'brand': row.brand,
+            'rating': row.avg_rating,
+            'rating_summary': summarize_ratings(row.avg_rating, row.review_count, row.rating_histogram),
+            'images': images.get(row.id, []),
+        }) for row in rows}
+
+    @classmethod
+    def refresh(cls, product_ids):
+        """Rewrite the documents of `product_ids`, dropping those of deleted products."""
+        product_ids = set(product_ids)
+        if not product_ids:
+            return
+        documents = cls.build_documents(product_ids)
+        now = datetime.utcnow()
+        db.session.execute(cls.__table__.delete().where(cls.product_id.in_(product_ids)))
+        if documents:
+            db.session.execute(cls.__table__.insert(), [
+                {'product_id': product_id, 'document': document, 'updated_at': now}
+                for product_id, document in documents.items()])
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_product_view_changes(session, flush_context):
+    product_ids = session.info.setdefault('stale_product_views', set())
+    for obj in (*session.new, *session.dirty, *session.deleted):
+        if isinstance(obj, Product):
+            product_ids.add(obj.id)
+        elif isinstance(obj, (ProductImage, ProductReview)):
+            product_ids.add(obj.product_id)
+    product_ids.discard(None)
+
+
+@event.listens_for(Session, 'after_flush_postexec')
+def _refresh_product_views(session, flush_context):
+    product_ids = session.info.pop('stale_product_views', None)
+    if product_ids:
+        ProductView.refresh(product_ids)
+
 class Cart(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=True)
@@ -98,12 +460,22 @@ class Cart(db.Model):
     # Relationship to access the items in the cart
     items = db.relationship('CartItem', backref='cart', lazy=True)
 
+    __table_args__ = (
+        db.Index('ix_cart_session_id', 'session_id'),
+        # Lookup by user, and the expiry scan over anonymous carts (user_id IS NULL) by age
+        db.Index('ix_cart_user_updated', 'user_id', 'updated_at'),
+    )
+
 class CartItem(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     cart_id = db.Column(db.Integer, db.ForeignKey('cart.id', ondelete='CASCADE'), nullable=False)
     product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), nullable=False)
     quantity = db.Column(db.Integer, nullable=False, default=1)
 
+    __table_args__ = (
+        db.Index('ix_cart_item_cart_product', 'cart_id', 'product_id'),
+    )
+
 class Order(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     full_name = db.Column(db.String(255), nullable=False)
@@ -117,6 +489,7 @@ class Order(db.Model):
     order_status = db.Column(db.Enum(OrderStatus), default=OrderStatus.PROCESSING, nullable=False)  # Order status (Processing/Shipped/Delivered)
     total_price = db.Column(db.Numeric(10, 2), nullable=False)  # Total price of the order
     order_number = db.Column(db.String(100), nullable=True, unique=True)
+    payment_id = db.Column(db.String(100), nullable=True)  # PayPal payment id, matched by webhooks
     user_id = db.Column(db.Integer, db.ForeignKey('user.id', ondelete='CASCADE'), nullable=True)
     session_id = db.Column(db.String(255), nullable=True)  # For non-authenticated users
 
@@ -127,6 +500,13 @@ class Order(db.Model):
     
     items = db.relationship('OrderItem', backref='order', lazy=True)
 
+    __table_args__ = (
+        db.UniqueConstraint('payment_id', name='uq_order_payment_id'),
+        # Order history: a user's orders newest first, optionally by status
+        db.Index('ix_order_user_id_id', 'user_id', 'id'),
+        db.Index('ix_order_user_status_id', 'user_id', 'order_status', 'id'),
+    )
+
     @validates('order_number')
     def validate_order_number(self, key, value):
         # If a value is already provided, use it (e.g., during updates)
@@ -134,10 +514,7 @@ class Order(db.Model):
             return value
 
         # Generate a new order number if none is provided
-        now = datetime.now()
-        timestamp = now.strftime("%Y%m%d%H%M%S")
-        random_number = random.randint(1000, 9999)  # 4-digit random number
-        return f"{timestamp}-{random_number}"
+        return order_number_generator.generate()
 
 
 class OrderItem(db.Model):
@@ -147,3 +524,123 @@ class OrderItem(db.Model):
     product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='SET NULL'), nullable=True)  # Link to the Product model
     quantity = db.Column(db.Integer, nullable=False)  # Quantity of the product
     price = db.Column(db.Numeric(10, 2), nullable=False)  # Price of the product at the time of purchase
+    image_url = db.Column(db.String, nullable=True)  # Primary image at the time of purchase, survives product deletion
+
+
+class SalesRollup(db.Model):
+    """
+    Pre-aggregated sales per time bucket, maintained incrementally by `analytics`.
+
+    One row per (granularity, dimension, dimension_value, bucket), e.g.
+    ('day', 'product', '42', 2025-02-06 00:00) or ('hour', 'total', '', 2025-02-06 13:00).
+    Orders are bucketed by the time they were placed.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    granularity = db.Column(db.String(8), nullable=False)  # hour / day
+    bucket = db.Column(db.DateTime, nullable=False)  # Start of the hour or day (UTC)
+    dimension = db.Column(db.String(16), nullable=False)  # total / product / category / status
+    dimension_value = db.Column(db.String(255), nullable=False, default='')
+    revenue = db.Column(db.Numeric(14, 2), nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    orders = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.UniqueConstraint('granularity', 'dimension', 'dimension_value', 'bucket', name='uq_sales_rollup_key'),
+        db.Index('ix_sales_rollup_dimension_bucket', 'granularity', 'dimension', 'bucket'),
+    )
+
+
+class ProductCooccurrence(db.Model):
+    """
+    Sparse "frequently bought together" matrix: how many paid orders contained both products.
+
+    Built in batch by `recommendations.build()` (keeping the top-K neighbours per product)
+    and incremented as new orders are paid, trimming the products they touch back to top-K.
+    """
+    product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), primary_key=True)
+    other_product_id = db.Column(db.Integer, db.ForeignKey('product.id', ondelete='CASCADE'), primary_key=True)
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        # Serves the top-K neighbours of a product from the index alone
+        db.Index('ix_product_cooccurrence_product_count', 'product_id', 'count'),
+    )
+
+
+class IdempotencyKey(db.Model):
+    """
+    A client's Idempotency-Key and the response it produced, replayed to retries until `expires_at`.
+
+    `response_status` is NULL while the first request is still running; the unique
+    (scope, key) constraint is what serializes concurrent duplicates.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    scope = db.Column(db.String(255), nullable=False)  # Who sent it: user email or anonymous session id
+    key = db.Column(db.String(255), nullable=False)
+    fingerprint = db.Column(db.String(64), nullable=False)  # sha256 of method, path, query and body
+    response_status = db.Column(db.Integer, nullable=True)
+    response_body = db.Column(db.Text, nullable=True)
+    response_mimetype = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    expires_at = db.Column(db.DateTime, nullable=False)
+
+    __table_args__ = (
+        db.UniqueConstraint('scope', 'key', name='uq_idempotency_key_scope_key'),
+        db.Index('ix_idempotency_key_expires_at', 'expires_at'),
+    )
+
+
+class PaymentEvent(db.Model):
+    """
+    A PayPal webhook event as received, queued for the payment worker.
+
+    The receiver only stores the raw event; the worker verifies its signature with
+    PayPal and applies it. `event_id` is unique, so redelivered events are dropped.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    event_id = db.Column(db.String(100), nullable=False, unique=True)
+    event_type = db.Column(db.String(100), nullable=False)
+    resource_id = db.Column(db.String(100), nullable=True)  # The PayPal payment the event is about
+    payload = db.Column(db.Text, nullable=False)  # Raw request body
+    headers = db.Column(db.JSON, nullable=False, default=dict)  # PayPal transmission headers, for verification
+    status = db.Column(db.String(16), nullable=False, default='pending')  # pending / done / ignored / failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    last_error = db.Column(db.Text, nullable=True)
+    available_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Retries are pushed back
+    received_at = db.Column(db.DateTime, default=datetime.utcnow)
+    processed_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index('ix_payment_event_status_available', 'status', 'available_at'),
+    )
+
+
+class Job(db.Model):
+    """
+    A unit of background work for `flask jobs work` (see jobs.py).
+
+    Workers claim due rows with FOR UPDATE SKIP LOCKED and set `run_at` to the end of
+    their lease while the job runs, so the job of a worker that died is picked up again.
+    `dedupe_key` is unique; periodic jobs use it so each run is enqueued once.
+    """
+    id = db.Column(db.Integer, primary_key=True)
+    queue = db.Column(db.String(50), nullable=False, default='default')
+    name = db.Column(db.String(200), nullable=False)
+    args = db.Column(db.JSON, nullable=False, default=list)
+    kwargs = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(16), nullable=False, default='queued')  # queued / running / done / failed
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)  # Not before; lease end while running
+    locked_by = db.Column(db.String(100), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    result = db.Column(db.JSON, nullable=True)  # What the job function returned
+    dedupe_key = db.Column(db.String(255), nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.UniqueConstraint('dedupe_key', name='uq_job_dedupe_key'),
+        db.Index('ix_job_queue_status_run_at', 'queue', 'status', 'run_at'),
+    )
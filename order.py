@@ -1,26 +1,27 @@
-import paypalrestsdk
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from http_status_code import *
 
 from utils import get_user_and_session_id, send_email, check_if_user_is_admin
 
-import os
+import click
+import time
 
-from models import Cart, CartItem, db, Order, OrderItem, PaymentStatus
-
-# PayPal SDK configuration
-paypalrestsdk.configure({
-    "mode": os.getenv('PAYMENT_MODE'),  # Use "live" for production
-    "client_id": os.getenv('PAYPAL_CLIENT_ID'),
-    "client_secret": os.getenv('PAYPAL_SECRET_KEY')
-})
+from models import Cart, CartItem, db, Order, OrderStatus, PaymentStatus
+from analytics import record_status_change
+from checkout import finalize_order
+from payment_events import receive_event, process_events
+from payments import get_gateway, approval_url, PaymentError
+from fieldsets import Fieldset
+from idempotency import idempotent, purge_expired_keys
+from sqlalchemy.orm import selectinload
 
 order_bp = Blueprint('order', __name__, url_prefix='/api/order')
 
 @order_bp.post('/create-payment')
 @jwt_required(optional=True)
+@idempotent
 def create_payment():
     data = request.json
 
@@ -50,7 +51,7 @@ def create_payment():
     db.session.commit()
 
 
-    payment = paypalrestsdk.Payment({
+    payment = {
         "intent": "sale",
         "payer": {
             "payment_method": "paypal"
@@ -66,34 +67,52 @@ def create_payment():
             "return_url": f"{request.host_url}api/order/execute-payment/" + order.order_number,  # Replace with your frontend URL
             "cancel_url": f"{request.host_url}api/order/cancel-payment/" + order.order_number  # Replace with your frontend URL
         }
-    })
-
-    if payment.create():
-        # Redirect the user to PayPal for payment approval
-        for link in payment.links:
-            if link.method == "REDIRECT":
-                redirect_url = link.href
-                return jsonify({"redirect_url": redirect_url})
-    else:
-        return jsonify({"error": payment.error}), 400
+    }
+
+    try:
+        payment = get_gateway().create_payment(payment)
+    except PaymentError as e:
+        return jsonify({"error": e.details}), 400
+    # Webhook events refer to the payment, not to our order number
+    order.payment_id = payment['id']
+    db.session.commit()
+
+    # Redirect the user to PayPal for payment approval
+    return jsonify({"redirect_url": approval_url(payment)})
     
 
 @order_bp.get('/execute-payment/<string:order_number>')
 @jwt_required(optional=True)
+@idempotent
 def execute_payment(order_number):
     payment_id = request.args.get('paymentId')
     payer_id = request.args.get('PayerID')
 
-    payment = paypalrestsdk.Payment.find(payment_id)
+    gateway = get_gateway()
 
-    if payment.execute({"payer_id": payer_id}):
-        return jsonify({"message": "Payment successful!", "payment_id": payment.id, "order_number": order_number})
-    else:
-        return jsonify({"error": payment.error}), 400
+    if current_app.config['PAYPAL_ASYNC_EXECUTE']:
+        # Hand the PayPal round trip to the gateway's background pool and answer right away
+        future = gateway.submit(gateway.execute_payment, payment_id, payer_id)
+        future.add_done_callback(_log_execute_failure(current_app.logger, payment_id))
+        return jsonify({"message": "Payment is being processed.", "payment_id": payment_id, "order_number": order_number}), HTTP_202_ACCEPTED
+
+    try:
+        payment = gateway.execute_payment(payment_id, payer_id)
+    except PaymentError as e:
+        return jsonify({"error": e.details}), 400
+    return jsonify({"message": "Payment successful!", "payment_id": payment['id'], "order_number": order_number})
+
+
+def _log_execute_failure(logger, payment_id):
+    def callback(future):
+        if future.exception() is not None:
+            logger.error('Background execution of PayPal payment %s failed: %s', payment_id, future.exception())
+    return callback
     
 
 @order_bp.get('/after-payment/<string:order_number>')
 @jwt_required(optional=True)
+@idempotent
 def after_payment(order_number):
     email = get_jwt_identity()
 
@@ -102,28 +121,26 @@ def after_payment(order_number):
     order = Order.query.filter_by(order_number=order_number).first_or_404()
     if order.payment_status == PaymentStatus.PAID:
         return jsonify({'detail': 'order already paid'})
-    cart = Cart.query.filter_by(user_id=user.id).first() if email else Cart.query.filter_by(session_id=session_id).first()
-    cart_items = CartItem.query.filter_by(cart_id=cart.id)
-    for item in cart_items:
-        order_item = OrderItem(
-            name=item.product.name,
-            order_id=order.id,
-            product_id=item.product.id,
-            quantity=item.quantity,
-            price=item.product.price * item.quantity 
-        )
-        item.product.quantity -= item.quantity 
-        cart.total_price -= item.product.price * item.quantity 
-        db.session.add(order_item)
-        db.session.delete(item)
-    order.payment_status = PaymentStatus.PAID
-    send_email(to=order.email, subject="Order", body=f'Your order is being processed we will update you on it. your order number is {order_number}')
-    db.session.commit()
+    if current_app.config['PAYPAL_WEBHOOK_ID']:
+        # The payment worker finalizes the order once PayPal's event arrives; don't trust the client
+        return jsonify({'detail': 'Payment is being confirmed.', 'order_number': order_number}), HTTP_202_ACCEPTED
+    finalize_order(order.id)
     return jsonify({'detail': 'payment successfull'})
 
 
+@order_bp.post('/paypal-webhook')
+def paypal_webhook():
+    """Queue a PayPal webhook event for the payment worker and acknowledge it right away."""
+    try:
+        queued = receive_event(request.get_data(), request.headers)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
+    return jsonify({'detail': 'queued' if queued else 'duplicate'}), HTTP_200_OK
+
+
 @order_bp.get('/cancel-payment/<string:order_number>')
 @jwt_required(optional=True)
+@idempotent
 def cancel_payment(order_number):
     order = Order.query.filter_by(order_number=order_number).first_or_404()
     db.session.delete(order)
@@ -132,6 +149,7 @@ def cancel_payment(order_number):
 
 @order_bp.patch('/update-order/<string:order_number>')
 @jwt_required()
+@idempotent
 def update_order(order_number):
     email = get_jwt_identity()
     data = request.json
@@ -139,46 +157,81 @@ def update_order(order_number):
     is_admin = check_if_user_is_admin(email)
     if is_admin:
         if 'order_status' in data:
-            order.order_status = data['order_status']
-            send_email(to=order.email, subject='Update on order', body=f'Your order is being {order.order_status}.\norder number: {order.order_number}')
+            old_status = order.order_status
+            try:
+                order.order_status = OrderStatus(data['order_status'].capitalize())
+            except ValueError:
+                return jsonify({'error': f'order_status must be one of {", ".join(s.value for s in OrderStatus)}'}), HTTP_400_BAD_REQUEST
+            record_status_change(order, old_status)
+            send_email.delay(to=order.email, subject='Update on order', body=f'Your order is being {order.order_status.value}.\norder number: {order.order_number}')
+            db.session.commit()
             return jsonify({'detail': 'Order updated'})
 
     return jsonify({'detail': 'You dont have permission to perform this command.'}), HTTP_403_FORBIDDEN
 
 
+ADMIN_ORDER_FIELDS = Fieldset(Order, {
+    "id": "id",
+    "full_name": "full_name",
+    "street": "street",
+    "city": "city",
+    "state": "state",
+    "zip_code": "zip_code",
+    "country": "country",
+    "phone_number": "phone_number",
+    "payment_status": "payment_status",
+    "order_status": "order_status",
+    "total_price": "total_price",
+    "order_number": "order_number",
+    "email": "email",
+    "purchaes": lambda order, context: [
+        {
+            "name": order_item.name,
+            "quantity": order_item.quantity,
+            "price": order_item.price,
+            "product_id": order_item.product_id
+        } for order_item in order.items
+    ]
+}, name='admin_order')
+
 @order_bp.get('/all-orders')
 @jwt_required()
 def get_all_orders():
     email = get_jwt_identity()
     is_admin = check_if_user_is_admin(email)
     if is_admin:
-        orders = Order.query.all()
-        orders_list = [
-    {
-        "id": order.id,
-        "full_name": order.full_name,
-        "street": order.street,
-        "city": order.city,
-        "state": order.state,
-        "zip_code": order.zip_code,
-        "country": order.country,
-        "phone_number": order.phone_number,
-        "payment_status": order.payment_status.value,
-        "order_status": order.order_status.value,
-        "total_price": float(order.total_price),  # Convert Decimal to float for JSON serialization
-        "order_number": order.order_number,
-        "email": order.email,
-        "purchaes": [
-            {
-                "name": order_item.name,
-                "quantity": order_item.quantity,
-                "price": float(order_item.price), 
-                "product_id": order_item.product_id
-        } for order_item in OrderItem.query.filter_by(order_id=order.id)
-        ]
-    }
-    for order in orders
-        ]
+        try:
+            fields = ADMIN_ORDER_FIELDS.select(request.args.get('fields'))
+        except ValueError as e:
+            return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
+        options = [ADMIN_ORDER_FIELDS.load_options(fields)]
+        if 'purchaes' in fields:
+            options.append(selectinload(Order.items))
+        orders = Order.query.options(*options).all()
+        orders_list = ADMIN_ORDER_FIELDS.serialize_many(orders, fields)
         return jsonify({'orders_list': orders_list}), 200
     
-    return jsonify({'detail': 'You dont have permission to perform this command.'}), HTTP_403_FORBIDDEN
\ No newline at end of file
+    return jsonify({'detail': 'You dont have permission to perform this command.'}), HTTP_403_FORBIDDEN
+
+
+@order_bp.cli.command('purge-idempotency-keys')
+@click.option('--batch-size', default=1000, show_default=True)
+def purge_idempotency_keys(batch_size):
+    """Delete Idempotency-Key records past their TTL."""
+    click.echo(f'deleted {purge_expired_keys(batch_size)} expired idempotency keys')
+
+
+@order_bp.cli.command('process-payment-events')
+@click.option('--batch-size', default=50, show_default=True)
+@click.option('--poll', default=1.0, show_default=True, help='Seconds to wait when the queue is empty.')
+@click.option('--once', is_flag=True, help='Process one batch and exit.')
+def process_payment_events(batch_size, poll, once):
+    """Payment worker: verify queued PayPal webhook events and finalize their orders."""
+    while True:
+        counts = process_events(batch_size)
+        if counts:
+            click.echo(', '.join(f'{count} {status}' for status, count in sorted(counts.items())))
+        if once:
+            break
+        if not counts:
+            time.sleep(poll)
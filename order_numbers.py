@@ -0,0 +1,59 @@
+from datetime import datetime, timezone
+
+import os
+import threading
+import time
+
+
+class OrderNumberGenerator:
+    """
+    Snowflake-style order numbers that need no coordination through the database.
+
+    Format: `YYYYmmddHHMMSSfff-NNPPPPPPPSSS`
+        - YYYYmmddHHMMSSfff: UTC timestamp in milliseconds (keeps numbers sortable by time)
+        - NN: node id (ORDER_NODE_ID, unique per host, 0-99)
+        - PPPPPPP: process id of the worker
+        - SSS: per-millisecond sequence (0-999)
+
+    Within a process numbers are strictly increasing: the sequence is guarded by a lock,
+    the generator waits for the next millisecond when the sequence is exhausted and never
+    moves backwards if the system clock does. Node id + pid keep processes apart.
+    """
+
+    MAX_SEQUENCE = 999
+
+    def __init__(self, node_id=None):
+        self.node_id = int(os.getenv('ORDER_NODE_ID', 0)) if node_id is None else node_id
+        if not 0 <= self.node_id <= 99:
+            raise ValueError('ORDER_NODE_ID must be between 0 and 99')
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._last_ms = 0
+        self._sequence = 0
+
+    def generate(self):
+        with self._lock:
+            if os.getpid() != self._pid:
+                # Forked (e.g. a gunicorn worker); the new pid is a new worker id
+                self._reset()
+
+            now_ms = max(time.time_ns() // 1_000_000, self._last_ms)
+            if now_ms == self._last_ms:
+                self._sequence += 1
+                if self._sequence > self.MAX_SEQUENCE:
+                    while now_ms <= self._last_ms:
+                        time.sleep(0.0001)
+                        now_ms = time.time_ns() // 1_000_000
+                    self._sequence = 0
+            else:
+                self._sequence = 0
+            self._last_ms = now_ms
+
+            timestamp = datetime.fromtimestamp(now_ms / 1000, tz=timezone.utc)
+            return f"{timestamp:%Y%m%d%H%M%S}{now_ms % 1000:03d}-{self.node_id:02d}{self._pid:07d}{self._sequence:03d}"
+
+
+order_number_generator = OrderNumberGenerator()
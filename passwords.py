@@ -0,0 +1,104 @@
+from concurrent.futures import ProcessPoolExecutor
+from werkzeug.security import check_password_hash, generate_password_hash
+
+import multiprocessing
+import os
+import threading
+
+
+class PasswordHashingBusy(Exception):
+    """Raised when the hashing pool's queue stays full for longer than the allowed wait."""
+
+
+def _method_of(hashed):
+    # Werkzeug hashes look like 'scrypt:32768:8:1$<salt>$<hash>'
+    method, _, rest = hashed.partition('$')
+    return method, len(rest.partition('$')[0])
+
+
+def _mp_context():
+    methods = multiprocessing.get_all_start_methods()
+    return multiprocessing.get_context('forkserver' if 'forkserver' in methods else 'spawn')
+
+
+class PasswordHasher:
+    """
+    Hashes and checks passwords in a pool of worker processes, off the request thread.
+
+    Key stretching is CPU bound and holds the GIL, so running it on a request thread
+    stalls every other request of a threaded or gevent worker. Here the request only
+    waits on a future. At most `max_pending` hashes are queued or running per process;
+    past that a request waits up to `wait` seconds for a slot and then gets
+    `PasswordHashingBusy`, so a login burst sheds load instead of piling up requests.
+
+    `method` and `salt_length` are passed to Werkzeug. `needs_rehash()` tells whether a
+    stored hash was made with other parameters, so logins can upgrade it. With
+    `workers` 0 everything runs inline.
+
+    Pool processes are started by a forkserver (spawn where there is none), not forked
+    from the web worker, which by then is running threads and holds database connections.
+    As with any spawned process, a script that hashes through the pool needs an
+    `if __name__ == '__main__':` guard.
+    """
+
+    def __init__(self, method='scrypt', salt_length=16, workers=0, max_pending=8, wait=2.0):
+        self.method = method
+        self.salt_length = salt_length
+        self.workers = workers
+        self.max_pending = max_pending
+        self.wait = wait
+        self._current_method = None
+        self._pool = None
+        self._pid = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def _executor(self):
+        # One pool per process; a gunicorn worker forked from the master builds its own
+        with self._lock:
+            if self._pid != os.getpid():
+                self._pool = ProcessPoolExecutor(max_workers=self.workers, mp_context=_mp_context())
+                self._slots = threading.BoundedSemaphore(self.max_pending)
+                self._pid = os.getpid()
+            return self._pool, self._slots
+
+    def _run(self, fn, *args):
+        if not self.workers:
+            return fn(*args)
+        pool, slots = self._executor()
+        if not slots.acquire(timeout=self.wait):
+            raise PasswordHashingBusy()
+        try:
+            return pool.submit(fn, *args).result()
+        finally:
+            slots.release()
+
+    def hash(self, password):
+        return self._run(generate_password_hash, password, self.method, self.salt_length)
+
+    def verify(self, hashed, password):
+        return self._run(check_password_hash, hashed, password)
+
+    def needs_rehash(self, hashed):
+        if self._current_method is None:
+            # Werkzeug expands a bare 'scrypt' or 'pbkdf2' to its current defaults
+            self._current_method = _method_of(generate_password_hash('', self.method, 1))[0]
+        return _method_of(hashed) != (self._current_method, self.salt_length)
+
+    def shutdown(self):
+        with self._lock:
+            if self._pool is not None and self._pid == os.getpid():
+                self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool, self._pid = None, None
+
+
+password_hasher = PasswordHasher()
+
+
+def init_app(app):
+    password_hasher.method = app.config['PASSWORD_HASH_METHOD']
+    password_hasher.salt_length = app.config['PASSWORD_SALT_LENGTH']
+    password_hasher.workers = app.config['PASSWORD_HASH_WORKERS']
+    password_hasher.max_pending = app.config['PASSWORD_HASH_MAX_PENDING']
+    password_hasher.wait = app.config['PASSWORD_HASH_WAIT']
+    password_hasher._current_method = None
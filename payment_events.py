@@ -0,0 +1,140 @@
+from datetime import datetime, timedelta
+from decimal import Decimal
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from models import db, Order, PaymentEvent
+from payments import get_gateway
+from checkout import finalize_order
+from jobs import periodic
+
+import json
+
+# Headers PayPal signs a webhook delivery with; the worker needs all of them to verify it
+TRANSMISSION_HEADERS = ('Paypal-Transmission-Id', 'Paypal-Transmission-Time', 'Paypal-Transmission-Sig',
+                        'Paypal-Cert-Url', 'Paypal-Auth-Algo')
+
+SALE_COMPLETED = 'PAYMENT.SALE.COMPLETED'
+
+PROCESSING_LEASE = 300  # Seconds before an event claimed by a worker that died is picked up again
+
+
+def receive_event(body, headers):
+    """
+    Queue a webhook delivery. Only cheap checks happen here; verification is the worker's.
+
+    Returns False for a redelivery of an event that is already queued. Raises
+    ValueError when the body or headers are not a PayPal event.
+    """
+    try:
+        event = json.loads(body)
+    except ValueError:
+        raise ValueError('Body is not JSON')
+    if not isinstance(event, dict) or not event.get('id') or not event.get('event_type'):
+        raise ValueError('Not a PayPal event')
+    missing = [header for header in TRANSMISSION_HEADERS if not headers.get(header)]
+    if missing:
+        raise ValueError(f'Missing headers: {", ".join(missing)}')
+
+    resource = event.get('resource') or {}
+    db.session.add(PaymentEvent(event_id=event['id'], event_type=event['event_type'],
+                                resource_id=resource.get('parent_payment') or resource.get('id'),
+                                payload=body.decode('utf-8') if isinstance(body, bytes) else body,
+                                headers={header: headers[header] for header in TRANSMISSION_HEADERS}))
+    process_events.delay()
+    try:
+        db.session.commit()
+    except IntegrityError:
+        db.session.rollback()
+        return False
+    return True
+
+
+def _claim(batch_size):
+    """Lease up to `batch_size` due events to this worker; SKIP LOCKED keeps workers apart."""
+    now = datetime.utcnow()
+    events = PaymentEvent.query.filter(PaymentEvent.status.in_(('pending', 'processing')),
+                                       PaymentEvent.available_at <= now) \
+                               .order_by(PaymentEvent.available_at, PaymentEvent.id) \
+                               .limit(batch_size).with_for_update(skip_locked=True).all()
+    for event in events:
+        event.status = 'processing'
+        event.attempts += 1
+        event.available_at = now + timedelta(seconds=PROCESSING_LEASE)
+    db.session.commit()
+    return events
+
+
+def _verify(event, payload):
+    headers = event.headers
+    result = get_gateway().verify_webhook_signature({
+        'transmission_id': headers['Paypal-Transmission-Id'],
+        'transmission_time': headers['Paypal-Transmission-Time'],
+        'transmission_sig': headers['Paypal-Transmission-Sig'],
+        'cert_url': headers['Paypal-Cert-Url'],
+        'auth_algo': headers['Paypal-Auth-Algo'],
+        'webhook_id': current_app.config['PAYPAL_WEBHOOK_ID'],
+        'webhook_event': payload,
+    })
+    return result.get('verification_status') == 'SUCCESS'
+
+
+def _apply(event, payload):
+    """Act on a verified event. Returns the final status and an optional note."""
+    if event.event_type != SALE_COMPLETED:
+        return 'ignored', None
+    order = Order.query.filter_by(payment_id=event.resource_id).first()
+    if order is None:
+        return 'failed', f'No order for payment {event.resource_id}'
+    amount = (payload.get('resource') or {}).get('amount') or {}
+    if Decimal(str(amount.get('total', '0'))) != Decimal(str(order.total_price)):
+        return 'failed', f'Amount {amount.get("total")} does not match order total {order.total_price}'
+    finalize_order(order.id)
+    return 'done', None
+
+
+def _finish(event_id, status, error=None, retry_in=None):
+    event = db.session.get(PaymentEvent, event_id)
+    event.status = status
+    event.last_error = error
+    if retry_in is not None:
+        event.available_at = datetime.utcnow() + timedelta(seconds=retry_in)
+        process_events.schedule(event.available_at)
+    else:
+        event.processed_at = datetime.utcnow()
+    db.session.commit()
+
+
+@periodic('PAYMENT_EVENT_SWEEP_INTERVAL', queue='payments')
+def process_events(batch_size=50):
+    """
+    Verify and apply one batch of queued events. Returns {status: count}.
+
+    Runs as a job: one is enqueued with each event received and with each retry, and a
+    periodic sweep picks up events whose worker died mid-way.
+
+    Each event is handled in its own transaction. Events that can't be verified are
+    ignored; network and database errors are retried with exponential backoff until
+    PAYMENT_EVENT_MAX_ATTEMPTS, after which the event is marked failed.
+    """
+    counts = {}
+    for event in _claim(batch_size):
+        event_id, attempts = event.id, event.attempts
+        try:
+            payload = json.loads(event.payload)
+            if not _verify(event, payload):
+                status, error = 'ignored', 'Signature verification failed'
+            else:
+                status, error = _apply(event, payload)
+            _finish(event_id, status, error)
+        except Exception as e:
+            db.session.rollback()
+            current_app.logger.exception('Payment event %s failed (attempt %d)', event_id, attempts)
+            if attempts >= current_app.config['PAYMENT_EVENT_MAX_ATTEMPTS']:
+                status = 'failed'
+                _finish(event_id, status, str(e))
+            else:
+                status = 'pending'
+                _finish(event_id, status, str(e), retry_in=2 ** attempts)
+        counts[status] = counts.get(status, 0) + 1
+    return counts
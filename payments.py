@@ -0,0 +1,136 @@
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+from requests.adapters import HTTPAdapter
+
+import requests
+import threading
+import time
+
+PAYPAL_API_BASES = {
+    'sandbox': 'https://api.sandbox.paypal.com',
+    'live': 'https://api.paypal.com',
+}
+
+
+class PaymentError(Exception):
+    """Raised when PayPal rejects a request or cannot be reached."""
+
+    def __init__(self, message, details=None):
+        super().__init__(message)
+        self.details = details or {'message': message}
+
+
+class PayPalGateway:
+    """
+    Thin PayPal REST client that keeps one pooled HTTP session per process.
+
+    - Connections are reused through a `requests.Session` connection pool.
+    - The OAuth access token is cached and refreshed `token_margin` seconds before it expires.
+    - Every call has a connect/read timeout.
+    - `submit()` runs a call on a small background thread pool and returns a Future.
+    """
+
+    def __init__(self, base_url, client_id, client_secret, timeout=(3.05, 10),
+                 pool_size=10, token_margin=60, max_workers=4):
+        self.base_url = base_url.rstrip('/')
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.timeout = timeout
+        self.token_margin = token_margin
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self._token = None
+        self._token_expires_at = 0
+        self._token_lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='paypal')
+
+    def access_token(self):
+        """Return a cached access token, fetching a new one when it is about to expire."""
+        if self._token and time.monotonic() < self._token_expires_at:
+            return self._token
+        with self._token_lock:
+            # Another thread may have refreshed it while we were waiting for the lock
+            if self._token and time.monotonic() < self._token_expires_at:
+                return self._token
+            try:
+                resp = self.session.post(f'{self.base_url}/v1/oauth2/token',
+                                         auth=(self.client_id, self.client_secret),
+                                         data={'grant_type': 'client_credentials'},
+                                         headers={'Accept': 'application/json'},
+                                         timeout=self.timeout)
+            except requests.RequestException as e:
+                raise PaymentError(f'PayPal unreachable: {e}')
+            if not resp.ok:
+                raise PaymentError('PayPal authentication failed', _error_body(resp))
+            data = resp.json()
+            self._token = data['access_token']
+            self._token_expires_at = time.monotonic() + max(int(data.get('expires_in', 0)) - self.token_margin, 0)
+            return self._token
+
+    def invalidate_token(self):
+        with self._token_lock:
+            self._token = None
+            self._token_expires_at = 0
+
+    def request(self, method, path, json=None):
+        for attempt in range(2):
+            headers = {'Authorization': f'Bearer {self.access_token()}',
+                       'Content-Type': 'application/json'}
+            try:
+                resp = self.session.request(method, f'{self.base_url}{path}', json=json,
+                                            headers=headers, timeout=self.timeout)
+            except requests.RequestException as e:
+                raise PaymentError(f'PayPal unreachable: {e}')
+            # The token may have been revoked before its advertised expiry; refresh once
+            if resp.status_code == 401 and attempt == 0:
+                self.invalidate_token()
+                continue
+            if not resp.ok:
+                raise PaymentError('PayPal request failed', _error_body(resp))
+            return resp.json()
+
+    def create_payment(self, payment):
+        return self.request('POST', '/v1/payments/payment', json=payment)
+
+    def execute_payment(self, payment_id, payer_id):
+        return self.request('POST', f'/v1/payments/payment/{payment_id}/execute', json={'payer_id': payer_id})
+
+    def verify_webhook_signature(self, verification):
+        """Ask PayPal whether a webhook delivery is authentic; see payment_events._verify."""
+        return self.request('POST', '/v1/notifications/verify-webhook-signature', json=verification)
+
+    def submit(self, fn, *args, **kwargs):
+        """Run `fn` on the gateway's background pool and return a Future."""
+        return self._executor.submit(fn, *args, **kwargs)
+
+
+def _error_body(resp):
+    try:
+        return resp.json()
+    except ValueError:
+        return {'message': resp.text, 'status': resp.status_code}
+
+
+def get_gateway():
+    """Return the app's PayPal gateway, creating it on first use."""
+    gateway = current_app.extensions.get('paypal')
+    if gateway is None:
+        config = current_app.config
+        base_url = config.get('PAYPAL_API_BASE') or PAYPAL_API_BASES.get(config.get('PAYMENT_MODE'), PAYPAL_API_BASES['sandbox'])
+        gateway = PayPalGateway(base_url, config.get('PAYPAL_CLIENT_ID'), config.get('PAYPAL_SECRET_KEY'),
+                                timeout=(config['PAYPAL_CONNECT_TIMEOUT'], config['PAYPAL_READ_TIMEOUT']),
+                                pool_size=config['PAYPAL_POOL_SIZE'],
+                                max_workers=config['PAYPAL_BACKGROUND_WORKERS'])
+        current_app.extensions['paypal'] = gateway
+    return gateway
+
+
+def approval_url(payment):
+    for link in payment.get('links', []):
+        if link.get('rel') == 'approval_url' or link.get('method') == 'REDIRECT':
+            return link['href']
+    return None
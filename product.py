@@ -1,4 +1,4 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, Response, stream_with_context, current_app, abort
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 from http_status_code import *
@@ -6,13 +6,73 @@ import os
 
 from werkzeug.utils import secure_filename
 
-from models import User, Product, ProductImage, ProductReview, Order, OrderItem
+from models import User, Product, ProductImage, ProductReview, ProductView, Order, OrderItem, Category, primary_images
 from utils import allowed_file
 from models import db
+from catalog_import import import_products, detect_format, open_archive, IMPORT_BATCH_SIZE
+from catalog_sync import sync_products
+from catalog_cache import catalog_cache
+from fieldsets import Fieldset
+from catalog_export import export_catalog, EXPORT_MIMETYPES
+from datetime import datetime
+from autocomplete import autocomplete_index
+from recommendations import recommendations_for, build as build_recommendations, RECOMMENDATIONS_TOP_K
+from compression import flush_each_chunk
+
+import click
+import json
 
 
 product_bp = Blueprint('product', __name__, url_prefix='/api/product')
 
+# Fields each endpoint can return (`?fields=a,b`); listings leave out the description by default
+PRODUCT_FIELDS = Fieldset(Product, {
+    'id': 'id',
+    'name': 'name',
+    'description': 'description',
+    'quantity': 'quantity',
+    'price': 'price',
+    'category': 'category',
+    'category_slug': 'category_slug',
+    'brand': 'brand',
+    'rating': 'avg_rating',
+    'rating_summary': lambda product, context: product.rating_summary(),
+    'images': lambda product, context: context['images'].get(product.id, []),
+}, columns={'rating_summary': ['avg_rating', 'review_count', 'rating_histogram']}, name='product')
+
+PRODUCT_LISTING_FIELDS = Fieldset(Product, {
+    'id': 'id',
+    'name': 'name',
+    'description': 'description',
+    'price': 'price',
+    'rating': 'avg_rating',
+    'quantity': 'quantity',
+    'category': 'category',
+    'brand': 'brand',
+    'image': lambda product, context: context['images'].get(product.id),
+}, default=('id', 'name', 'price', 'rating', 'quantity', 'category', 'brand', 'image'), name='product_listing')
+
+ALL_PRODUCTS_FIELDS = Fieldset(Product, {
+    'id': 'id',
+    'name': 'name',
+    'description': 'description',
+    'image': lambda product, context: context['images'].get(product.id),
+    'quantity': 'quantity',
+    'price': 'price',
+    'category': 'category',
+    'brand': 'brand',
+    'avg_rating': 'avg_rating',
+}, default=('id', 'name', 'image', 'quantity', 'price', 'category', 'brand', 'avg_rating'), name='all_products')
+
+SEARCH_FIELDS = Fieldset(Product, {
+    'id': 'id',
+    'name': 'name',
+    'description': 'description',
+    'rating': 'avg_rating',
+    'price': 'price',
+    'image': lambda product, context: context['images'].get(product.id),
+}, default=('id', 'name', 'rating', 'price', 'image'), name='product_search')
+
 @product_bp.post('/create-product')
 @jwt_required()
 def create_product():
@@ -48,6 +108,76 @@ def create_product():
     db.session.commit()
     return jsonify({'detail': 'Product created successfully.'}), HTTP_201_CREATED
 
+@product_bp.post('/bulk-import')
+@jwt_required()
+def bulk_import():
+    email = get_jwt_identity()
+    user = User.query.filter_by(email=email).first()
+    if not user.is_admin:
+        return jsonify({'detail': 'You dont have permission to perform this command.'}), HTTP_403_FORBIDDEN
+
+    catalog = request.files.get('catalog')
+    if catalog is None:
+        return jsonify({'error': 'A catalog file (CSV or NDJSON) is required'}), HTTP_400_BAD_REQUEST
+    fmt = request.form.get('format') or detect_format(catalog.filename)
+    if fmt not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format must be csv or ndjson'}), HTTP_400_BAD_REQUEST
+    batch_size = request.form.get('batch_size', IMPORT_BATCH_SIZE, type=int)
+    archive = open_archive(request.files.get('images'))
+    base_url = request.host_url
+
+    # Stream one progress line per batch so long imports don't sit on an idle connection
+    def generate():
+        for progress in import_products(catalog.stream, fmt, archive, base_url, batch_size):
+            yield json.dumps(progress) + '\n'
+
+    return flush_each_chunk(Response(stream_with_context(generate()), mimetype='application/x-ndjson'))
+
+@product_bp.post('/bulk-sync')
+@jwt_required()
+def bulk_sync():
+    email = get_jwt_identity()
+    user = User.query.filter_by(email=email).first()
+    if not user.is_admin:
+        return jsonify({'detail': 'You dont have permission to perform this command.'}), HTTP_403_FORBIDDEN
+
+    key = request.args.get('key', 'id')
+    if key not in ('id', 'sku'):
+        return jsonify({'error': 'key must be id or sku'}), HTTP_400_BAD_REQUEST
+    updates = request.get_json(silent=True)
+    if not isinstance(updates, dict) or not updates:
+        return jsonify({'error': 'Expected a JSON object of {id|sku: {quantity, price}}'}), HTTP_400_BAD_REQUEST
+    if len(updates) > current_app.config['BULK_SYNC_MAX_ITEMS']:
+        return jsonify({'error': f"At most {current_app.config['BULK_SYNC_MAX_ITEMS']} items per request"}), HTTP_413_REQUEST_ENTITY_TOO_LARGE
+
+    return jsonify(sync_products(updates, key)), HTTP_200_OK
+
+@product_bp.get('/export')
+@jwt_required()
+def export_products():
+    email = get_jwt_identity()
+    user = User.query.filter_by(email=email).first()
+    if not user.is_admin:
+        return jsonify({'detail': 'You dont have permission to perform this command.'}), HTTP_403_FORBIDDEN
+
+    fmt = request.args.get('format', 'ndjson')
+    if fmt not in EXPORT_MIMETYPES:
+        return jsonify({'error': 'format must be ndjson, csv or xml'}), HTTP_400_BAD_REQUEST
+    since = request.args.get('since')
+    if since:
+        try:
+            since = datetime.fromisoformat(since)
+        except ValueError:
+            return jsonify({'error': 'since must be an ISO 8601 datetime'}), HTTP_400_BAD_REQUEST
+    gzip = request.args.get('gzip', '').lower() in ('1', 'true', 'yes')
+
+    # Rows are pulled from a server-side cursor while the response is being sent
+    feed = export_catalog(fmt, request.host_url, since or None, gzip)
+    filename = f'products.{fmt}' + ('.gz' if gzip else '')
+    return Response(stream_with_context(feed),
+                    mimetype='application/gzip' if gzip else EXPORT_MIMETYPES[fmt],
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
 @product_bp.delete('/delete-product/<int:id>')
 @jwt_required()
 def delete_product(id):
@@ -89,60 +219,164 @@ def edit_product(id):
 
 @product_bp.get('/get-categories')
 def get_categories():
-    # Query to get all distinct categories
-    categories_slug = db.session.query(Product.category_slug).distinct().all()
-    # Convert the result into a list of strings
-    category_slug_list = [category[0] for category in categories_slug]
+    payload = catalog_cache.get('categories')
+    if payload is None:
+        # Read the materialized category table instead of scanning products
+        categories = Category.query.filter(Category.product_count > 0).order_by(Category.slug).all()
+        payload = {
+            "categories": [category.slug for category in categories],
+            "details": [category.serialize() for category in categories]
+        }
+        catalog_cache.set('categories', payload)
+
+    return jsonify(payload), HTTP_200_OK
+
+def _all_images(product_ids):
+    images = {}
+    for product_image in ProductImage.query.filter(ProductImage.product_id.in_(product_ids)).order_by(ProductImage.id):
+        images.setdefault(product_image.product_id, []).append(product_image.image_path)
+    return images
+
+def _product_documents(ids):
+    """
+    Map product id -> its encoded product_view document: from the catalog cache, then one
+    primary-key lookup for the rest. Products whose view hasn't been built yet (e.g. before
+    `flask product rebuild-product-views` ran) are encoded on the fly.
+    """
+    ids = set(ids)
+    documents = {key[1]: value for key, value in catalog_cache.get_many(('product_view', id) for id in ids).items()}
+    missing = ids - documents.keys()
+    if missing:
+        fetched = dict(db.session.query(ProductView.product_id, ProductView.document)
+                                 .filter(ProductView.product_id.in_(missing)))
+        if len(fetched) < len(missing):
+            fetched.update(ProductView.build_documents(missing - fetched.keys()))
+        for id, document in fetched.items():
+            catalog_cache.set(('product_view', id), document)
+        documents.update(fetched)
+    return documents
+
+def _json_body(body):
+    return current_app.response_class(body + '\n', mimetype='application/json')
+
+@product_bp.get('/get-product/<int:id>')
+def get_product(id):
+    try:
+        fields = PRODUCT_FIELDS.select(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
+
+    if fields == PRODUCT_FIELDS.default:
+        # The full product is served straight from its precomputed document
+        document = _product_documents([id]).get(id)
+        if document is None:
+            abort(HTTP_404_NOT_FOUND)
+        return _json_body('{"product":' + document + '}'), HTTP_200_OK
+
+    # A sparse request loads just what it asks for
+    product = Product.query.filter_by(id=id).options(PRODUCT_FIELDS.load_options(fields)).first_or_404()
+    images = _all_images([id]) if 'images' in fields else {}
+    return jsonify(product=PRODUCT_FIELDS.serialize(product, fields, images=images)), HTTP_200_OK
+
+MULTI_GET_MAX_IDS = 300
+
+@product_bp.get('/get-products')
+def get_products():
+    """
+    Fetch many products at once: `?ids=3,1,2`.
+
+    Results come back in request order; ids that don't exist are null and listed in `not_found`.
+    Full products come from the catalog cache or product_view in one IN query; sparse
+    field selections load the products and their images with two IN queries.
+    """
+    try:
+        ids = [int(id) for id in request.args.get('ids', '').split(',') if id.strip()]
+    except ValueError:
+        return jsonify({'error': 'ids must be a comma separated list of integers'}), HTTP_400_BAD_REQUEST
+    if not ids:
+        return jsonify({'error': 'ids is required'}), HTTP_400_BAD_REQUEST
+    if len(ids) > MULTI_GET_MAX_IDS:
+        return jsonify({'error': f'At most {MULTI_GET_MAX_IDS} ids per request'}), HTTP_400_BAD_REQUEST
+    try:
+        fields = PRODUCT_FIELDS.select(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
+
+    if fields == PRODUCT_FIELDS.default:
+        documents = _product_documents(ids)
+        not_found = [id for id in dict.fromkeys(ids) if id not in documents]
+        return _json_body('{"not_found":' + current_app.json.dumps(not_found) +
+                          ',"products":[' + ','.join(documents.get(id, 'null') for id in ids) + ']}'), HTTP_200_OK
+
+    found = {}
+    images = _all_images(set(ids)) if 'images' in fields else {}
+    for product in Product.query.filter(Product.id.in_(set(ids))).options(PRODUCT_FIELDS.load_options(fields)):
+        found[product.id] = PRODUCT_FIELDS.serialize(product, fields, images=images)
 
     return jsonify({
-        "categories": category_slug_list
+        'products': [found.get(id) for id in ids],
+        'not_found': [id for id in dict.fromkeys(ids) if id not in found]
     }), HTTP_200_OK
 
-@product_bp.get('/get-product/<int:id>')
-def get_product(id):
-    product = Product.query.filter_by(id=id).first_or_404()
-    product_images = ProductImage.query.filter_by(product_id=product.id)
-    serialized_product = {
-        'id': product.id,
-        'name': product.name,
-        'description': product.description,
-        'quantity': product.quantity,
-        'price': product.price,
-        'category': product.category,
-        'brand': product.brand,
-        'rating': product.avg_rating,
-        'images': [product_image.image_path for product_image in product_images]
-    }
-    return jsonify(product=serialized_product), HTTP_200_OK
+@product_bp.get('/recommendations/<int:id>')
+def get_recommendations(id):
+    limit = min(max(request.args.get('limit', 10, type=int), 1), RECOMMENDATIONS_TOP_K)
+    return jsonify(product_id=id, recommendations=recommendations_for(id, limit)), HTTP_200_OK
+
+# Supported sort orders for category browsing; each one is backed by a
+# (category_slug, <key>) and a (category_slug, brand, <key>) index on Product
+CATEGORY_SORTS = {
+    'price_asc': (Product.price.asc(), Product.id.asc()),
+    'price_desc': (Product.price.desc(), Product.id.desc()),
+    'rating': (Product.avg_rating.desc(), Product.id.desc()),
+    'newest': (Product.created_at.desc(), Product.id.desc()),
+}
 
 @product_bp.get('/category/<string:category_slug>')
 def get_products_by_category(category_slug):
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
+    brands = [brand.strip().lower() for brand in request.args.get('brand', '').split(',') if brand.strip()]
+    min_price = request.args.get('min_price', type=float)
+    max_price = request.args.get('max_price', type=float)
+    min_rating = request.args.get('min_rating', type=float)
+    in_stock = request.args.get('in_stock', '').lower() in ('1', 'true', 'yes')
+    sort = request.args.get('sort')
+
+    if sort is not None and sort not in CATEGORY_SORTS:
+        return jsonify({'error': f'sort must be one of {", ".join(CATEGORY_SORTS)}'}), HTTP_400_BAD_REQUEST
+    try:
+        fields = PRODUCT_LISTING_FIELDS.select(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
 
     # Query the database for products in the given category and paginate the results
-    products_pagination = Product.query.filter_by(category_slug=category_slug).paginate(page=page, per_page=per_page)
+    query = Product.query.filter_by(category_slug=category_slug)
+    if brands:
+        query = query.filter(Product.brand.in_(brands))
+    if min_price is not None:
+        query = query.filter(Product.price >= min_price)
+    if max_price is not None:
+        query = query.filter(Product.price <= max_price)
+    if min_rating is not None:
+        query = query.filter(Product.avg_rating >= min_rating)
+    if in_stock:
+        query = query.filter(Product.quantity > 0)
+    query = query.order_by(*CATEGORY_SORTS[sort]) if sort else query.order_by(Product.id)
+
+    products_pagination = query.options(PRODUCT_LISTING_FIELDS.load_options(fields)).paginate(page=page, per_page=per_page)
+    images = primary_images(product.id for product in products_pagination.items) if 'image' in fields else {}
 
     # Serialize the paginated items
-    product_list = [
-        {
-            'id': product.id,
-            'name': product.name,
-            'description': product.description,
-            'price': float(product.price),
-            "rating": product.avg_rating,
-            'quantity': product.quantity,
-            'category': product.category,
-            'brand': product.brand,
-            'image': [product_image.image_path for product_image in ProductImage.query.filter_by(product_id=product.id)][0]} 
-            
-            for product in products_pagination.items]
+    product_list = PRODUCT_LISTING_FIELDS.serialize_many(products_pagination.items, fields, images=images)
 
-    
+    # Facets come from the materialized category row, not from scanning the products
+    category = Category.query.filter_by(slug=category_slug).first()
 
     # Return the paginated response
     return jsonify({
         'products': product_list,
+        'facets': category.serialize() if category else None,
         'total': products_pagination.total,
         'pages': products_pagination.pages,
         'current_page': products_pagination.page,
@@ -155,6 +389,10 @@ def get_products_by_category(category_slug):
 def get_all_products():
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
+    try:
+        fields = ALL_PRODUCTS_FIELDS.select(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
 
     # Fetch distinct categories
     categories = db.session.query(Product.category).distinct().all()
@@ -165,21 +403,10 @@ def get_all_products():
 
     for category in categories:
         # Query products for each category with pagination
-        products = Product.query.filter_by(category=category).paginate(page=page, per_page=per_page, error_out=False)
-        products_by_category[category] = [
-            {
-                "id": product.id,
-                "name": product.name,
-                "description": product.description,
-                "image": ProductImage.query.filter_by(product_id=product.id).first().image_path,
-                "quantity": product.quantity,
-                "price": float(product.price),
-                "category": product.category,
-                "brand": product.brand,
-                "avg_rating": float(product.avg_rating),
-            }
-            for product in products.items
-        ]
+        products = Product.query.filter_by(category=category).options(ALL_PRODUCTS_FIELDS.load_options(fields)) \
+                                .paginate(page=page, per_page=per_page, error_out=False)
+        images = primary_images(product.id for product in products.items) if 'image' in fields else {}
+        products_by_category[category] = ALL_PRODUCTS_FIELDS.serialize_many(products.items, fields, images=images)
 
     # Return the products grouped by category
     return jsonify({
@@ -191,19 +418,20 @@ def search_product():
     query = request.args.get('q', '')
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
+    try:
+        fields = SEARCH_FIELDS.select(request.args.get('fields'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), HTTP_400_BAD_REQUEST
 
     results = Product.query.filter(
         db.or_(
             Product.name.ilike(f'%{query}%'),
             Product.description.ilike(f'%{query}%')
         )
-    ).paginate(page=page, per_page=per_page)
+    ).options(SEARCH_FIELDS.load_options(fields)).paginate(page=page, per_page=per_page)
 
-    products = [{"id": product.id, "name": product.name, 
-                 "description": product.description, 
-                 "rating": product.avg_rating,
-                 "price": product.price,
-                 'image': [product_image.image_path for product_image in ProductImage.query.filter_by(product_id=product.id)][0]} for product in results.items]
+    images = primary_images(product.id for product in results.items) if 'image' in fields else {}
+    products = SEARCH_FIELDS.serialize_many(results.items, fields, images=images)
 
     return jsonify({
         "products": products,
@@ -214,6 +442,14 @@ def search_product():
         "has_prev": results.has_prev
     })
 
+@product_bp.get('/autocomplete')
+def autocomplete():
+    query = request.args.get('q', '')
+    limit = min(max(request.args.get('limit', 8, type=int), 1), 20)
+    # Built lazily per worker, then served from memory
+    autocomplete_index.ensure_fresh()
+    return jsonify(suggestions=autocomplete_index.search(query, limit)), HTTP_200_OK
+
 @product_bp.post('/create-product-review/<int:product_id>')
 @jwt_required()
 def create_product_review(product_id):
@@ -242,24 +478,111 @@ def create_product_review(product_id):
             product_review = ProductReview(user_id=user.id, product_id=product.id, 
                                         review=review, rating=rating)
             db.session.add(product_review)
-            db.session.flush()
-            product.calculate_avg_rating()
+            product.add_review_rating(rating)
             db.session.commit()
             return jsonify({'detail': 'Review posted.'}), HTTP_201_CREATED
         return jsonify({'detail': 'Invalid rating'}), HTTP_404_NOT_FOUND
     return jsonify({'detail': 'You need to purchase this product to leave a review.'}), HTTP_400_BAD_REQUEST
     
 
+REVIEW_SORTS = {
+    'newest': (ProductReview.created_at.desc(), ProductReview.id.desc()),
+    'rating': (ProductReview.rating.desc(), ProductReview.created_at.desc()),
+}
+
+# Serializes the joined review rows below, not ProductReview instances
+REVIEW_FIELDS = Fieldset(None, {
+    'username': 'username',
+    'rating': 'rating',
+    'review': 'review',
+    'created_at': 'created_at',
+}, name='product_review')
+
 @product_bp.get('/get-product-reviews/<int:product_id>')
 def get_product_reviews(product_id):
     page = request.args.get('page', 1, type=int)
     per_page = request.args.get('per_page', 10, type=int)
-    product_review_pagination = ProductReview.query.filter_by(product_id=product_id).paginate(page=page, per_page=per_page, error_out=False)
-    reviews = [
-        {
-        "username": review.user.username,
-        "rating": review.rating,
-        "review": review.review
-    } for review in product_review_pagination
-    ]
-    return jsonify(reviews=reviews), HTTP_200_OK
+    sort = request.args.get('sort', 'newest')
+    if sort not in REVIEW_SORTS:
+        return jsonify({'error': f'sort must be one of {", ".join(REVIEW_SORTS)}'}), HTTP_400_BAD_REQUEST
+    page, per_page = max(page, 1), min(max(per_page, 1), 100)
+
+    # The summary (and the total, so no COUNT query) comes precomputed on the product row
+    product = Product.query.filter_by(id=product_id).first_or_404()
+
+    # Authors are joined in, not lazy-loaded per review
+    rows = db.session.query(ProductReview.rating, ProductReview.review, ProductReview.created_at, User.username) \
+                     .outerjoin(User, User.id == ProductReview.user_id) \
+                     .filter(ProductReview.product_id == product_id) \
+                     .order_by(*REVIEW_SORTS[sort]) \
+                     .limit(per_page).offset((page - 1) * per_page)
+    reviews = REVIEW_FIELDS.serialize_many(rows, REVIEW_FIELDS.default)
+    total = product.review_count or 0
+    return jsonify(reviews=reviews, summary=product.rating_summary(), total=total,
+                   current_page=page, per_page=per_page, has_next=page * per_page < total,
+                   has_prev=page > 1), HTTP_200_OK
+
+
+@product_bp.cli.command('rebuild-categories')
+def rebuild_categories():
+    """Recompute the category table from the products."""
+    Category.rebuild()
+    db.session.commit()
+
+
+@product_bp.cli.command('import-products')
+@click.argument('catalog', type=click.File('rb'))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+@click.option('--images', type=click.Path(exists=True, dir_okay=False), help='Zip archive with the product images.')
+@click.option('--base-url', default='', help='Prefix for stored image URLs, e.g. https://shop.example.com/')
+@click.option('--batch-size', default=IMPORT_BATCH_SIZE, show_default=True)
+def import_products_command(catalog, fmt, images, base_url, batch_size):
+    """Bulk import products from a CSV or NDJSON file, upserting by sku."""
+    for progress in import_products(catalog, fmt or detect_format(catalog.name), open_archive(images), base_url, batch_size):
+        click.echo(f"processed {progress['processed']}, imported {progress['imported']}, failed {progress['failed']}")
+    for error in progress['errors']:
+        click.echo(f"row {error['row']} ({error['sku']}): {error['error']}", err=True)
+
+
+@product_bp.cli.command('export-catalog')
+@click.option('--format', 'fmt', type=click.Choice(list(EXPORT_MIMETYPES)), default='ndjson', show_default=True)
+@click.option('--since', type=click.DateTime(), help='Only products created or updated since this time.')
+@click.option('--gzip', is_flag=True, help='Gzip the output.')
+@click.option('--base-url', default='', help='Prefix for product links, e.g. https://shop.example.com/')
+@click.option('--output', type=click.File('wb'), default='-', help='Defaults to stdout.')
+def export_catalog_command(fmt, since, gzip, base_url, output):
+    """Write the product feed in constant memory."""
+    for chunk in export_catalog(fmt, base_url, since, gzip):
+        output.write(chunk if gzip else chunk.encode('utf-8'))
+
+
+@product_bp.cli.command('rebuild-rating-summaries')
+def rebuild_rating_summaries():
+    """Recompute every product's review count, average and histogram."""
+    for product in Product.query.yield_per(500):
+        product.calculate_avg_rating()
+    db.session.commit()
+
+
+@product_bp.cli.command('rebuild-product-views')
+@click.option('--batch-size', default=1000, show_default=True)
+def rebuild_product_views(batch_size):
+    """Rebuild every product's product_view document."""
+    last_id = 0
+    while True:
+        ids = [id for id, in db.session.query(Product.id).filter(Product.id > last_id)
+                                      .order_by(Product.id).limit(batch_size)]
+        if not ids:
+            break
+        ProductView.refresh(ids)
+        db.session.commit()
+        last_id = ids[-1]
+    catalog_cache.invalidate()
+
+
+@product_bp.cli.command('build-recommendations')
+@click.option('--top-k', default=RECOMMENDATIONS_TOP_K, show_default=True)
+def build_recommendations_command(top_k):
+    """Rebuild "frequently bought together" from the order history."""
+    products = build_recommendations(top_k)
+    click.echo(f'Recommendations built for {products} products')
@@ -0,0 +1,75 @@
+from itertools import permutations
+
+from sqlalchemy.orm import aliased
+
+from models import db, Order, OrderItem, Product, PaymentStatus, ProductCooccurrence, upsert_add
+
+RECOMMENDATIONS_TOP_K = 20
+
+
+def build(top_k=RECOMMENDATIONS_TOP_K):
+    """
+    Rebuild the co-occurrence table from order history and keep the top-K neighbours per product.
+
+    Pairs are counted, ranked and copied into the table by one INSERT ... SELECT, so the
+    database does the aggregation and nothing proportional to the order history is held
+    in Python. Returns the number of products that got recommendations.
+    """
+    item, other = aliased(OrderItem), aliased(OrderItem)
+    product, other_product = aliased(Product), aliased(Product)
+    pairs = db.select(item.product_id.label('product_id'), other.product_id.label('other_product_id'),
+                      db.func.count(db.distinct(item.order_id)).label('count')) \
+              .join(other, db.and_(other.order_id == item.order_id, other.product_id != item.product_id)) \
+              .join(Order, Order.id == item.order_id) \
+              .join(product, product.id == item.product_id) \
+              .join(other_product, other_product.id == other.product_id) \
+              .where(Order.payment_status == PaymentStatus.PAID) \
+              .group_by(item.product_id, other.product_id) \
+              .subquery()
+    ranked = db.select(pairs, db.func.row_number().over(partition_by=pairs.c.product_id,
+                                                        order_by=(pairs.c.count.desc(), pairs.c.other_product_id))
+                                                  .label('rank')) \
+               .subquery()
+    top = db.select(ranked.c.product_id, ranked.c.other_product_id, ranked.c.count).where(ranked.c.rank <= top_k)
+
+    table = ProductCooccurrence.__table__
+    db.session.execute(table.delete())
+    db.session.execute(table.insert().from_select(['product_id', 'other_product_id', 'count'], top))
+    products = db.session.scalar(db.select(db.func.count(db.distinct(table.c.product_id))))
+    db.session.commit()
+    return products
+
+
+def _trim(product_ids, top_k):
+    """Drop the neighbours of `product_ids` ranked below the top `top_k`."""
+    table = ProductCooccurrence.__table__
+    for product_id in product_ids:
+        extra = db.session.scalars(db.select(table.c.other_product_id)
+                                     .where(table.c.product_id == product_id)
+                                     .order_by(table.c.count.desc(), table.c.other_product_id)
+                                     .offset(top_k)).all()
+        if extra:
+            db.session.execute(table.delete().where(table.c.product_id == product_id,
+                                                    table.c.other_product_id.in_(extra)))
+
+
+def record_order(items, top_k=RECOMMENDATIONS_TOP_K):
+    """Count the pairs of a newly paid order; runs inside the caller's transaction."""
+    product_ids = {item.product_id for item in items if item.product_id}
+    rows = [{'product_id': product_id, 'other_product_id': other_id, 'count': 1}
+            for product_id, other_id in permutations(product_ids, 2)]
+    upsert_add(ProductCooccurrence.__table__, ('product_id', 'other_product_id'), rows, ('count',))
+    if rows:
+        # Keep each product at top-K, as build() leaves it, so the table does not grow without bound
+        _trim(sorted(product_ids), top_k)
+
+
+def recommendations_for(product_id, limit=10):
+    """The products most often bought with `product_id`, in one indexed query."""
+    rows = db.session.query(Product.id, Product.name, Product.price, Product.avg_rating, ProductCooccurrence.count) \
+                     .join(Product, Product.id == ProductCooccurrence.other_product_id) \
+                     .filter(ProductCooccurrence.product_id == product_id) \
+                     .order_by(ProductCooccurrence.count.desc()) \
+                     .limit(limit)
+    return [{'id': id, 'name': name, 'price': price, 'rating': avg_rating or 0, 'score': count}
+            for id, name, price, avg_rating, count in rows]
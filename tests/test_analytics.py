@@ -0,0 +1,66 @@
+from datetime import datetime
+
+import pytest
+from flask_jwt_extended import create_access_token
+
+from analytics import backfill
+from app import create_app
+from models import db, User, Product, Order, OrderItem, PaymentStatus, SalesRollup
+
+
+@pytest.fixture
+def app():
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SECRET_KEY': 'test', 'JWT_SECRET_KEY': 'test' * 8,
+                      'TESTING': True, 'TOUCH_FLUSH_INTERVAL': 0, 'PASSWORD_HASH_WORKERS': 0})
+    with app.app_context():
+        db.create_all()
+        user = User(username='admin', email='admin@example.com', password='x', is_active=True, is_admin=True)
+        phone = Product(name='Phone', description='A phone', quantity=5, price=100, category='Phones', brand='sony')
+        case = Product(name='Case', description='A case', quantity=5, price=10, category='Phones', brand='sony')
+        db.session.add_all([user, phone, case])
+        db.session.flush()
+        order = Order(full_name='A', street='s', city='c', state='s', zip_code='1', country='c', phone_number='1',
+                      email=user.email, user_id=user.id, total_price=110, payment_status=PaymentStatus.PAID,
+                      created_at=datetime.utcnow())
+        db.session.add(order)
+        db.session.flush()
+        db.session.add_all([OrderItem(name='Phone', order_id=order.id, product_id=phone.id, quantity=1, price=100),
+                            OrderItem(name='Case', order_id=order.id, product_id=case.id, quantity=1, price=10)])
+        db.session.commit()
+    yield app
+
+
+@pytest.fixture
+def headers(app):
+    with app.app_context():
+        return {'Authorization': 'Bearer ' + create_access_token(identity='admin@example.com')}
+
+
+def test_top_products_after_product_deleted(app, headers):
+    with app.app_context():
+        case = Product.query.filter_by(name='Case').one()
+        # SQLite does not enforce ON DELETE SET NULL without the foreign_keys pragma
+        OrderItem.query.filter_by(product_id=case.id).update({'product_id': None})
+        db.session.delete(case)
+        db.session.commit()
+        backfill()
+        assert not SalesRollup.query.filter_by(dimension='product', dimension_value='None').count()
+        total = SalesRollup.query.filter_by(granularity='day', dimension='total').one()
+        assert (total.revenue, total.units) == (110, 2)
+
+    response = app.test_client().get('/api/analytics/top-products', headers=headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert [product['product_id'] for product in response.json['products']] == [1]
+
+
+def test_top_products_skips_non_numeric_keys(app, headers):
+    with app.app_context():
+        backfill()
+        # A rollup written before deleted products were skipped
+        db.session.add(SalesRollup(granularity='day', bucket=datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0),
+                                   dimension='product', dimension_value='None', revenue=10 ** 6, units=1, orders=1))
+        db.session.commit()
+
+    response = app.test_client().get('/api/analytics/top-products', headers=headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert [product['product_id'] for product in response.json['products']] == [1, 2]
@@ -0,0 +1,64 @@
+import pytest
+from flask_jwt_extended import create_access_token
+
+from app import create_app
+from fieldsets import Fieldset
+from models import db, User, Product, ProductImage, ProductReview, Order, OrderItem, PaymentStatus
+
+
+@pytest.fixture
+def app():
+    app = create_app({'SQLALCHEMY_DATABASE_URI': 'sqlite://', 'SECRET_KEY': 'test', 'JWT_SECRET_KEY': 'test' * 8,
+                      'TESTING': True, 'TOUCH_FLUSH_INTERVAL': 0, 'PASSWORD_HASH_WORKERS': 0})
+    with app.app_context():
+        db.create_all()
+        user = User(username='admin', email='admin@example.com', password='x', is_active=True, is_admin=True)
+        product = Product(name='Phone', description='A phone', quantity=5, price=100, category='Phones', brand='sony')
+        db.session.add_all([user, product])
+        db.session.flush()
+        db.session.add(ProductImage(product_id=product.id, image_path='http://img/1.jpg'))
+        order = Order(full_name='A', street='s', city='c', state='s', zip_code='1', country='c', phone_number='1',
+                      email=user.email, user_id=user.id, total_price=100, payment_status=PaymentStatus.PAID)
+        db.session.add(order)
+        db.session.flush()
+        db.session.add(OrderItem(name='Phone', order_id=order.id, product_id=product.id, quantity=1, price=100))
+        db.session.commit()
+    yield app
+
+
+@pytest.fixture
+def headers(app):
+    with app.app_context():
+        return {'Authorization': 'Bearer ' + create_access_token(identity='admin@example.com')}
+
+
+@pytest.mark.parametrize('url, extract, expected', [
+    ('/api/product/all-products?fields=image', lambda body: body['products']['Phones'], [{'image': 'http://img/1.jpg'}]),
+    ('/api/product/get-product/1?fields=images', lambda body: body['product'], {'images': ['http://img/1.jpg']}),
+    ('/api/order/all-orders?fields=purchaes', lambda body: [list(order) for order in body['orders_list']], [['purchaes']]),
+    ('/api/account/order-history?fields=purchases', lambda body: [list(order) for order in body['orders']], [['purchases']]),
+])
+def test_only_computed_fields(app, headers, url, extract, expected):
+    # Selecting only computed fields leaves no columns for load_only; the primary key is loaded instead
+    response = app.test_client().get(url, headers=headers)
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert extract(response.json) == expected
+
+
+def test_review_fields_serialize_joined_rows(app):
+    with app.app_context():
+        user = User.query.one()
+        db.session.add(ProductReview(user_id=user.id, product_id=1, rating=4, review='Good'))
+        db.session.commit()
+    response = app.test_client().get('/api/product/get-product-reviews/1')
+    assert response.status_code == 200, response.get_data(as_text=True)
+    assert [(review['username'], review['rating']) for review in response.json['reviews']] == [('admin', 4)]
+
+    from product import REVIEW_FIELDS
+    with pytest.raises(TypeError):
+        REVIEW_FIELDS.load_options(REVIEW_FIELDS.default)
+
+
+def test_column_specs_must_exist_on_the_model():
+    with pytest.raises(ValueError, match='username'):
+        Fieldset(ProductReview, {'username': 'username', 'rating': 'rating'})
@@ -0,0 +1,128 @@
+from datetime import datetime
+from sqlalchemy import bindparam, or_
+
+import atexit
+import os
+import threading
+
+
+class TouchBuffer:
+    """
+    Per-process write-behind buffer for "last seen" timestamps (User.last_login, Cart.updated_at).
+
+    `touch()` only records the timestamp in memory; repeated touches of the same row
+    coalesce into one. A background thread writes everything pending every
+    `flush_interval` seconds as one batched UPDATE per column, in its own transaction,
+    so the request never waits on those rows' locks. Values only move forward, so an
+    older buffered timestamp never overwrites a newer one another worker wrote.
+
+    A touch is at most about `flush_interval` seconds late. The buffer is flushed
+    early once it holds `max_pending` rows, and at interpreter exit. A worker that is
+    killed outright loses its last interval of touches, which is acceptable for these
+    columns. With `flush_interval` 0 every touch is written straight away.
+    """
+
+    def __init__(self, flush_interval=5.0, max_pending=10000):
+        self.app = None
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self._pending = {}  # column -> {row id: latest timestamp}
+        self._size = 0
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._pid = None
+
+    def touch(self, column, id, at=None):
+        at = at or datetime.utcnow()
+        with self._lock:
+            if self._pid != os.getpid():
+                self._start()
+            rows = self._pending.setdefault(column, {})
+            if id not in rows:
+                self._size += 1
+            if rows.get(id) is None or rows[id] < at:
+                rows[id] = at
+            full = self._size >= self.max_pending
+        if not self.flush_interval:
+            self.flush()
+        elif full:
+            self._wake.set()
+
+    def _start(self):
+        # Called with the lock held: once per process, so a gunicorn worker forked from a
+        # master that already touched gets its own empty buffer and flusher thread
+        self._pid = os.getpid()
+        self._pending, self._size = {}, 0
+        if self.flush_interval:
+            self._thread = threading.Thread(target=self._run, name='touch-buffer', daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.flush_interval)
+            self._wake.clear()
+            try:
+                self.flush()
+            except Exception:
+                self.app.logger.exception('Touch buffer flush failed')
+
+    def flush(self):
+        """
+        Write all pending touches now. Returns how many rows were updated.
+
+        Each column is written in its own transaction. If one fails, its touches go back
+        into the buffer for the next flush, the other columns are still written, and the
+        first error is raised at the end.
+        """
+        with self._lock:
+            pending, self._pending, self._size = self._pending, {}, 0
+        if not pending:
+            return 0
+        from models import db
+        updated, error = 0, None
+        with self.app.app_context():
+            for column, rows in pending.items():
+                table = column.table
+                statement = table.update() \
+                                 .where(table.c.id == bindparam('row_id'),
+                                        or_(column.is_(None), column < bindparam('at'))) \
+                                 .values({column.key: bindparam('at')})
+                try:
+                    with db.engine.begin() as connection:
+                        result = connection.execute(statement, [{'row_id': id, 'at': at} for id, at in sorted(rows.items())])
+                    updated += result.rowcount
+                except Exception as e:
+                    error = error or e
+                    self._restore(column, rows)
+        if error is not None:
+            raise error
+        return updated
+
+    def _restore(self, column, rows):
+        with self._lock:
+            pending = self._pending.setdefault(column, {})
+            for id, at in rows.items():
+                if id not in pending:
+                    self._size += 1
+                    pending[id] = at
+                elif pending[id] < at:
+                    pending[id] = at
+
+
+touch_buffer = TouchBuffer()
+
+
+def init_app(app):
+    touch_buffer.app = app
+    touch_buffer.flush_interval = app.config['TOUCH_FLUSH_INTERVAL']
+    touch_buffer.max_pending = app.config['TOUCH_MAX_PENDING']
+
+
+@atexit.register
+def _flush_on_exit():
+    if touch_buffer.app is not None and touch_buffer._pid == os.getpid():
+        try:
+            touch_buffer.flush()
+        except Exception:
+            pass  # The database may already be gone at shutdown
@@ -1,13 +1,11 @@
 from itsdangerous import URLSafeTimedSerializer
-from flask import session
-from flask_mail import Mail, Message
-from dotenv import load_dotenv
+from flask import session, current_app
+from flask_mail import Mail
 from models import User
-import os
+from jobs import job
 import uuid
 
 mail = Mail()
-load_dotenv()
 
 ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg'}
 
@@ -18,11 +16,11 @@ def allowed_file(filename):
 
 
 def generate_token(email):
-    serializer = URLSafeTimedSerializer(os.getenv('SECRET_KEY'))
+    serializer = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
     return serializer.dumps(email, salt='python-flask')
 
 def confirm_token(token, expiration=600):
-    serializer = URLSafeTimedSerializer(os.getenv('SECRET_KEY'))
+    serializer = URLSafeTimedSerializer(current_app.config['SECRET_KEY'])
     try:
         email = serializer.loads(
             token, salt='python-flask', max_age=expiration
@@ -32,12 +30,16 @@ def confirm_token(token, expiration=600):
         return False
     
 
+@job(queue='email')
 def send_email(to, subject, body):
+    # Request handlers enqueue this with `send_email.delay(...)`; the job worker sends it.
+    # The SMTP connection is only opened here, on first send, not at app boot
+    from flask_mail import Message
     msg = Message(
         subject,
         recipients=[to],
         body=body,
-        sender=os.getenv('EMAIL_HOST_USER'),
+        sender=current_app.config['MAIL_USERNAME'],
     )
     mail.send(msg)
 